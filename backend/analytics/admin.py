@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import DailySales, DailyProductSales
 
-# Register your models here.
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'order_count', 'revenue', 'profit']
+    date_hierarchy = 'day'
+    ordering = ['-day']
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'product', 'category', 'quantity', 'revenue', 'profit', 'order_count']
+    list_filter = ['category']
+    date_hierarchy = 'day'
+    ordering = ['-day']
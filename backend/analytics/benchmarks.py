@@ -0,0 +1,174 @@
+"""
+Endpoint benchmarks: every URL of the inventory and orders apps through
+the Django test client, reporting latency percentiles, query count and
+peak Python memory per endpoint, and comparing a report with a baseline.
+"""
+import csv
+import importlib
+import io
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+import django
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Category, Product
+from orders.models import Order
+
+BENCHMARKED_URLCONFS = ('inventory.urls', 'orders.urls')
+# Row whose pk fills a URL's <pk>, by URL name
+DETAIL_MODELS = {
+    'inventory:category-detail': Category,
+    'inventory:product-detail': Product,
+    'orders:order-detail': Order,
+}
+# URLs that only accept writes, benchmarked with a POST
+POST_ONLY = ('inventory:update-stock', 'inventory:product-import')
+# Rows sent to the bulk write endpoints
+WRITE_ROWS = 100
+
+
+def _post_requests():
+    """POST requests; they rewrite current values (or add one order) so runs stay repeatable"""
+    products = list(
+        Product.objects.order_by('id')
+        .values('id', 'quantity', 'sku', 'name', 'category__name', 'cost_price')[:WRITE_ROWS]
+    )
+    catalogue = io.StringIO()
+    writer = csv.writer(catalogue)
+    writer.writerow(['sku', 'name', 'category', 'cost_price'])
+    writer.writerows([p['sku'] or '', p['name'], p['category__name'], p['cost_price']] for p in products)
+    in_stock = Product.objects.order_by(F('available_quantity').desc(), 'id').values_list('id', flat=True).first()
+
+    def post(name, data, content_type='application/json'):
+        return {'method': 'post', 'path': reverse(name), 'data': data, 'content_type': content_type}
+
+    return {
+        'POST inventory:update-stock': post('inventory:update-stock', {
+            'updates': [{'product_id': p['id'], 'quantity': p['quantity']} for p in products]
+        }),
+        'POST inventory:product-import': post('inventory:product-import', catalogue.getvalue(), 'text/csv'),
+        'POST orders:order-list': post('orders:order-list', {'order_items': [{'product': in_stock, 'quantity': 1}]}),
+    }
+
+
+def endpoint_requests():
+    """
+    One request per URL pattern, as ``{key: {'method', 'path', 'data',
+    'content_type'}}`` keyed ``'<METHOD> <app>:<url name>'``. Order
+    creation is benchmarked as well as the order list.
+    """
+    requests = {}
+    for urlconf in BENCHMARKED_URLCONFS:
+        module = importlib.import_module(urlconf)
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            if name in POST_ONLY:
+                continue
+            kwargs = {}
+            if pattern.pattern.converters:
+                kwargs['pk'] = DETAIL_MODELS[name].objects.order_by('pk').values_list('pk', flat=True).first()
+            path = reverse(name, kwargs=kwargs)
+            if name == 'inventory:product-search':
+                path += '?q=' + Product.objects.order_by('id').values_list('name', flat=True).first()[:3]
+            requests[f'GET {name}'] = {'method': 'get', 'path': path, 'data': None, 'content_type': None}
+    return {**requests, **_post_requests()}
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def measure(client, request, iterations=20, warmup=1):
+    """Latency percentiles (ms), query count and peak memory (KiB) of one request"""
+    def send():
+        kwargs = {'content_type': request['content_type']} if request.get('content_type') else {}
+        response = getattr(client, request['method'])(request['path'], request.get('data'), **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    for _ in range(warmup):
+        send()
+    # A full query log (9000 entries under DEBUG) would hide new queries
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = send()
+    query_count = len(queries)
+    tracemalloc.start()
+    try:
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(iterations):
+        began = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 95), 3),
+        'p99_ms': round(_percentile(timings, 99), 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': query_count,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(client, iterations=20, warmup=1, only=None, progress=None, meta=None):
+    """Benchmark every endpoint (or those whose key contains ``only``) and return the report"""
+    results = {}
+    for key, request in endpoint_requests().items():
+        if only and only not in key:
+            continue
+        results[key] = measure(client, request, iterations, warmup)
+        if progress:
+            progress(key, results[key])
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            **(meta or {}),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25, min_ms=1.0, min_kib=64):
+    """
+    Regressions of ``report`` against ``baseline``: a different status, any
+    extra query, and a p50 latency or peak memory more than ``tolerance``
+    above the baseline (and by at least ``min_ms`` / ``min_kib``, so noise
+    on fast endpoints does not count). The tail percentiles are reported but
+    too noisy over a few dozen requests to fail on. Endpoints new to the
+    report are skipped.
+    """
+    regressions = []
+    for key, current in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(key)
+        if before is None:
+            continue
+        if before.get('status', current['status']) != current['status']:
+            regressions.append({'endpoint': key, 'metric': 'status',
+                                'baseline': before['status'], 'current': current['status']})
+        for metric, floor in [('queries', 0), ('p50_ms', min_ms), ('peak_kib', min_kib)]:
+            was, now = before.get(metric), current[metric]
+            if was is None:
+                continue
+            limit = was if metric == 'queries' else max(was * (1 + tolerance), was + floor)
+            if now > limit:
+                regressions.append({'endpoint': key, 'metric': metric, 'baseline': was, 'current': now})
+    return regressions
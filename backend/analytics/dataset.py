@@ -0,0 +1,130 @@
+"""
+Synthetic store data for benchmarks and local load testing.
+
+Everything is written with bulk inserts, so model save() logic and
+signals do not run: order totals, product sold quantities, the stock
+ledger and the daily rollups are filled in afterwards with set-based
+queries.
+"""
+import itertools
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from backend.cache import bump_data_version
+from inventory.ledger import reconcile
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+from .rollup import rebuild
+
+CATEGORY_NAMES = [
+    'Snacks', 'Beverages', 'Dairy', 'Bakery', 'Produce', 'Frozen', 'Household', 'Personal Care',
+    'Canned Goods', 'Spices', 'Breakfast', 'Baby Care', 'Pet Supplies', 'Stationery', 'Confectionery',
+]
+ADJECTIVES = ['Classic', 'Organic', 'Spicy', 'Family', 'Mini', 'Fresh', 'Salted', 'Premium', 'Lemon', 'Golden']
+NOUNS = ['Chips', 'Cola', 'Biscuits', 'Noodles', 'Soap', 'Rice', 'Tea', 'Juice', 'Butter', 'Bread', 'Nuts', 'Oil']
+CENT = Decimal('0.01')
+
+
+def _insert_orders(orders, batch_size):
+    # bulk_create stamps every order with "now"; history needs real dates
+    dates = [order.order_date for order in orders]
+    Order.objects.bulk_create(orders)
+    if orders[0].pk is None:
+        # Backends that cannot return ids from a bulk insert (MySQL): the
+        # batch got the newest consecutive ids, in order
+        ids = Order.objects.order_by('-id').values_list('id', flat=True)[:len(orders)]
+        for order, pk in zip(orders, reversed(ids)):
+            order.pk = pk
+    for order, date in zip(orders, dates):
+        order.order_date = date
+    Order.objects.bulk_update(orders, ['order_date'], batch_size=batch_size)
+
+
+def generate_dataset(categories=15, products=2000, orders=20000, days=365, items_per_order=3,
+                     skew=1.1, seed=0, batch_size=2000, progress=None):
+    """
+    Fill the database with ``categories`` categories, ``products`` products
+    and ``orders`` orders spread over the last ``days`` days.
+
+    Product popularity follows a Zipf distribution with exponent ``skew``:
+    a handful of bestsellers account for most order lines and the long tail
+    is rarely sold. Orders carry 1 to ``2 * items_per_order - 1`` distinct
+    products. The same ``seed`` produces the same data. ``progress`` is
+    called with the number of orders written after each batch.
+
+    Returns the number of rows written per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    with transaction.atomic():
+        names = [
+            CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f'{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i}'
+            for i in range(categories)
+        ]
+        Category.objects.bulk_create([Category(name=name, description='Generated category') for name in names])
+        ids = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        category_ids = [ids[name] for name in names]
+
+        catalogue = []
+        for i in range(products):
+            cost = Decimal(str(round(rng.lognormvariate(1.5, 0.8), 2))).max(CENT)
+            selling = (cost * Decimal(str(1 + rng.uniform(0.1, 0.8)))).quantize(CENT)
+            catalogue.append(Product(
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                category_id=category_ids[i % categories],
+                cost_price=cost, selling_price=selling,
+                quantity=rng.randint(0, 300), low_stock_threshold=rng.choice([5, 10, 20]),
+                sku=f'GEN-{i:07}'
+            ))
+        Product.objects.bulk_create(catalogue, batch_size=batch_size)
+        catalogue = list(Product.objects.filter(sku__startswith='GEN-').order_by('sku')
+                         .values_list('id', 'selling_price', 'cost_price'))
+
+        # Popularity rank is independent of id, so bestsellers are spread out
+        ranked = rng.sample(catalogue, len(catalogue))
+        cum_weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, len(ranked) + 1)))
+
+        start = now - timedelta(days=days)
+        step = (now - start) / max(orders, 1)
+        written = lines = 0
+        while written < orders:
+            batch = []
+            for n in range(written, min(written + batch_size, orders)):
+                count = rng.randint(1, 2 * items_per_order - 1)
+                picked = {item[0]: item for item in rng.choices(ranked, cum_weights=cum_weights, k=count)}
+                order_lines = [(pk, rng.choices([1, 2, 3, 4, 6], [50, 25, 12, 8, 5])[0], price, cost)
+                               for pk, price, cost in picked.values()]
+                batch.append((Order(
+                    order_date=start + step * (n + rng.random()),
+                    total_amount=sum(price * qty for _, qty, price, _ in order_lines),
+                    total_profit=sum((price - cost) * qty for _, qty, price, cost in order_lines),
+                ), order_lines))
+
+            _insert_orders([order for order, _ in batch], batch_size)
+            items = [
+                OrderItem(order_id=order.pk, product_id=pk, quantity=qty, unit_price=price, unit_cost=cost)
+                for order, order_lines in batch for pk, qty, price, cost in order_lines
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=batch_size)
+            written += len(batch)
+            lines += len(items)
+            if progress:
+                progress(written)
+
+        # Stock on hand stays as generated; what was sold comes on top
+        sold = Coalesce(Subquery(
+            OrderItem.objects.filter(product=OuterRef('pk')).order_by()
+            .values('product').annotate(total=Sum('quantity')).values('total'),
+            output_field=IntegerField()
+        ), 0)
+        Product.objects.filter(sku__startswith='GEN-').update(sold_quantity=sold, quantity=sold + F('quantity'))
+        reconcile(Product.objects.filter(sku__startswith='GEN-'), note='Generated dataset')
+        rebuild()
+
+    bump_data_version()
+    return {'categories': categories, 'products': products, 'orders': orders, 'order_items': lines}
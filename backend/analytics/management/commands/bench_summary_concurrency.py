@@ -0,0 +1,163 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from wsgiref.util import setup_testing_defaults
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from django.urls import reverse
+from django.utils import timezone
+from analytics.models import DailyProductSales, DailySales
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+
+ENDPOINTS = [
+    ('orders:sales-summary', 'analytics:sales-summary'),
+    ('orders:category-sales-summary', 'analytics:category-sales-summary'),
+    ('orders:today-orders', 'analytics:today-orders'),
+    ('inventory:inventory-summary', 'analytics:inventory-summary'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the summary endpoints under concurrent load on a throwaway "
+        "test database: the sync views through backend.wsgi on a thread pool "
+        "against the async views through backend.asgi on one event loop. "
+        "Requests are driven in process and the summary cache is disabled. "
+        "--rtt-ms adds a per-query delay standing in for a networked database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per deployment')
+        parser.add_argument('--rtt-ms', type=float, default=0.0, help='Simulated round trip per query')
+        parser.add_argument('--products', type=int, default=500, help='Products to seed with a year of sales')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        rtt = options['rtt_ms'] / 1000
+
+        def add_latency(execute, sql, params, many, context):
+            time.sleep(rtt)
+            return execute(sql, params, many, context)
+
+        def install_latency(connection, **kwargs):
+            connection.execute_wrappers.append(add_latency)
+
+        if rtt:
+            connection_created.connect(install_latency)
+        try:
+            self.seed(options['products'])
+            dummy = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            with override_settings(CACHES=dummy):
+                from backend.asgi import application as asgi_app
+                from backend.wsgi import application as wsgi_app
+
+                sync_paths = [reverse(sync_name) for sync_name, _ in ENDPOINTS]
+                async_paths = [reverse(async_name) for _, async_name in ENDPOINTS]
+                total, concurrency = options['requests'], options['concurrency']
+                self.stdout.write(f"concurrency {concurrency}, {total} requests, rtt {options['rtt_ms']} ms")
+                self.stdout.write(f"{'deployment':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+                self.report('wsgi', *self.run_wsgi(wsgi_app, sync_paths, total, concurrency))
+                self.report('asgi', *asyncio.run(self.run_asgi(asgi_app, async_paths, total, concurrency)))
+        finally:
+            connection_created.disconnect(install_latency)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, count):
+        today = timezone.localdate()
+        categories = Category.objects.bulk_create([Category(name=f'Bench {i}') for i in range(10)])
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench product {i}', category=categories[i % 10], cost_price=Decimal('4.00'),
+                    selling_price=Decimal('6.50'), quantity=i % 40, sku=f'B-{i:06}')
+            for i in range(count)
+        ])
+        days = [today - timedelta(days=n) for n in range(365)]
+        DailySales.objects.bulk_create([
+            DailySales(day=day, order_count=40, revenue=Decimal('260.00'), profit=Decimal('100.00')) for day in days
+        ])
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=day, product=product, category_id=product.category_id, quantity=2,
+                              revenue=Decimal('13.00'), profit=Decimal('5.00'), order_count=1)
+            for day in days for product in products
+        ], batch_size=5000)
+        orders = Order.objects.bulk_create([
+            Order(total_amount=Decimal('13.00'), total_profit=Decimal('5.00')) for _ in range(200)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[n % count], quantity=2,
+                      unit_price=Decimal('6.50'), unit_cost=Decimal('4.00'))
+            for n, order in enumerate(orders)
+        ])
+
+    def report(self, label, elapsed, timings):
+        timings.sort()
+        p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+        self.stdout.write(
+            f"{label:>10} {len(timings) / elapsed:>8.0f} {statistics.median(timings):>8.1f} {p99:>8.1f}"
+        )
+
+    def run_wsgi(self, application, paths, total, concurrency):
+        def request(n):
+            environ = {'PATH_INFO': paths[n % len(paths)], 'REQUEST_METHOD': 'GET'}
+            setup_testing_defaults(environ)
+            began = time.perf_counter()
+            statuses = []
+            body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+            assert statuses[0].startswith('200'), body
+            return (time.perf_counter() - began) * 1000
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            timings = list(pool.map(request, range(total)))
+        return time.perf_counter() - began, timings
+
+    async def run_asgi(self, application, paths, total, concurrency):
+        pending = iter(range(total))
+        timings = []
+
+        async def request(path):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'headers': [(b'host', b'testserver')],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            messages = []
+            requested = False
+            finished = asyncio.Event()
+
+            async def receive():
+                # The body once, then nothing until the response is complete
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            began = time.perf_counter()
+            await application(scope, receive, send)
+            assert messages[0]['status'] == 200, messages
+            timings.append((time.perf_counter() - began) * 1000)
+
+        async def client():
+            for n in pending:
+                await request(paths[n % len(paths)])
+
+        began = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - began, timings
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Category, Product
+from analytics.dataset import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic catalogue and order history for "
+        "load testing: bulk inserted, with a skewed bestseller distribution, "
+        "consistent order totals, sold quantities and daily rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=15)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=365, help='Days of order history')
+        parser.add_argument('--items-per-order', type=int, default=3, help='Mean distinct products per order')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of product popularity; 0 sells every product alike')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        for name in ('categories', 'products', 'orders', 'days', 'items_per_order', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        if (Product.objects.filter(sku__startswith='GEN-').exists()
+                or Category.objects.filter(description='Generated category').exists()):
+            raise CommandError('The database already holds a generated dataset; flush it first')
+
+        def progress(written):
+            self.stdout.write(f"  {written}/{options['orders']} orders")
+
+        counts = generate_dataset(
+            categories=options['categories'], products=options['products'], orders=options['orders'],
+            days=options['days'], items_per_order=options['items_per_order'], skew=options['skew'],
+            seed=options['seed'], batch_size=options['batch_size'], progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Generated ' + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+        ))
@@ -0,0 +1,28 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from analytics.rollup import rebuild
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the order tables for a date range (default: all history)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        rows = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt daily sales from {start or 'the beginning'} to {end or 'today'}: {rows} product-day rows"
+        ))
@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from analytics.benchmarks import compare, run_benchmarks
+from analytics.dataset import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every inventory and orders endpoint through the test client "
+        "on a throwaway test database filled by the dataset generator. Records "
+        "p50/p95/p99 latency, query count and peak memory per endpoint, writes "
+        "a JSON report and fails on regressions against a baseline report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed requests per endpoint first')
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=90, help='Days of order history')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', help='Only endpoints whose key (e.g. "GET orders:sales-summary") contains this')
+        parser.add_argument('--cached', action='store_true',
+                            help='Keep the summary cache; by default every request does the full work')
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--baseline',
+                            help='Baseline report to compare with; written from this run if it does not exist')
+        parser.add_argument('--update-baseline', action='store_true', help='Overwrite --baseline with this run')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed latency and memory growth over the baseline, as a fraction')
+
+    def handle(self, *args, **options):
+        if options['update_baseline'] and not options['baseline']:
+            raise CommandError('--update-baseline needs --baseline')
+        dataset = {'products': options['products'], 'orders': options['orders'],
+                   'days': options['days'], 'seed': options['seed']}
+
+        # As under the test runner: no DEBUG query logging in the timings
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write('Generating dataset: ' + ', '.join(f'{k}={v}' for k, v in dataset.items()))
+            generate_dataset(**dataset)
+            self.stdout.write(f"{'endpoint':<42} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                              f"{'queries':>7} {'peak KiB':>9}")
+
+            def progress(key, result):
+                self.stdout.write(
+                    f"{key:<42} {result['status']:>6} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                    f"{result['p99_ms']:>8.2f} {result['queries']:>7} {result['peak_kib']:>9.1f}"
+                )
+
+            caches = {} if options['cached'] else {
+                'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            }
+            with override_settings(**caches):
+                report = run_benchmarks(
+                    Client(), iterations=options['iterations'], warmup=options['warmup'], only=options['only'],
+                    progress=progress, meta={'dataset': dataset, 'cached': options['cached']}
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Report written to {options['output']}")
+
+        baseline_path = Path(options['baseline']) if options['baseline'] else None
+        if baseline_path is None:
+            return
+        if options['update_baseline'] or not baseline_path.exists():
+            baseline_path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        regressions = compare(report, json.loads(baseline_path.read_text()), tolerance=options['tolerance'])
+        for r in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{r['endpoint']}: {r['metric']} {r['baseline']} -> {r['current']}"
+            ))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
@@ -0,0 +1,45 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.querylog import read_log, summarize
+
+
+def _top(counts, limit=3):
+    return ', '.join(f'{name} ({count})' for name, count in sorted(counts.items(), key=lambda item: -item[1])[:limit])
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow-query log: the query shapes that cost the most total time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Slow-query log to read (default: SLOW_QUERY_LOG)')
+        parser.add_argument('--limit', type=int, default=10, help='Fingerprints to show (default: 10)')
+        parser.add_argument('--no-plans', action='store_true', help='Leave out the EXPLAIN plans')
+
+    def handle(self, *args, **options):
+        path = options['file'] or getattr(settings, 'SLOW_QUERY_LOG', '')
+        if not path:
+            raise CommandError('No log file: pass --file or set SLOW_QUERY_LOG')
+        if not os.path.exists(path):
+            raise CommandError(f"'{path}' does not exist; no query has been slower than SLOW_QUERY_MS yet")
+
+        entries = summarize(read_log(path))
+        if not entries:
+            self.stdout.write('No slow queries logged')
+            return
+        calls = sum(entry['calls'] for entry in entries)
+        self.stdout.write(f'{calls} slow queries, {len(entries)} fingerprints; top {min(options["limit"], len(entries))} by total time:')
+        for rank, entry in enumerate(entries[:options['limit']], 1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n{rank}. [{entry['fingerprint']}] {entry['total_ms']:.1f} ms total, {entry['calls']} calls, "
+                f"mean {entry['mean_ms']:.1f} ms, max {entry['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"   {entry['sql']}")
+            if entry['views']:
+                self.stdout.write(f"   views: {_top(entry['views'])}")
+            if entry['call_sites']:
+                self.stdout.write(f"   called from: {_top(entry['call_sites'])}")
+            if entry['explain'] and not options['no_plans']:
+                self.stdout.write('   plan:')
+                for line in entry['explain'].splitlines():
+                    self.stdout.write(f'     {line}')
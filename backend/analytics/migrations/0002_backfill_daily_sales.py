@@ -0,0 +1,52 @@
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    """Roll up the orders that existed before the rollup tables did"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySales = apps.get_model('analytics', 'DailySales')
+    DailyProductSales = apps.get_model('analytics', 'DailyProductSales')
+
+    revenue = Sum(F('unit_price') * F('quantity'))
+    profit = Sum((F('unit_price') - F('unit_cost')) * F('quantity'))
+    items = OrderItem.objects.annotate(day=TruncDate('order__order_date'))
+
+    sales_by_day = {
+        row['day']: row
+        for row in items.values('day').annotate(total_revenue=revenue, total_profit=profit).order_by()
+    }
+    DailySales.objects.bulk_create([
+        DailySales(
+            day=row['day'],
+            order_count=row['orders'],
+            revenue=sales_by_day.get(row['day'], {}).get('total_revenue') or Decimal('0.00'),
+            profit=sales_by_day.get(row['day'], {}).get('total_profit') or Decimal('0.00'),
+        )
+        for row in Order.objects.annotate(day=TruncDate('order_date')).values('day').annotate(orders=Count('id')).order_by()
+    ], batch_size=1000)
+    DailyProductSales.objects.bulk_create([
+        DailyProductSales(
+            day=row['day'], product_id=row['product_id'], category_id=row['product__category_id'],
+            quantity=row['total_quantity'], revenue=row['total_revenue'], profit=row['total_profit'],
+            order_count=row['lines'],
+        )
+        for row in items.values('day', 'product_id', 'product__category_id').annotate(
+            total_quantity=Sum('quantity'), total_revenue=revenue, total_profit=profit, lines=Count('id')
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('orders', '0002_order_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
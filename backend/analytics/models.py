@@ -1,3 +1,38 @@
 from django.db import models
+from decimal import Decimal
+from inventory.models import Category, Product
 
-# Create your models here.
+class DailySales(models.Model):
+    """Order totals for one day, maintained as orders are created and deleted"""
+    day = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day}: {self.order_count} orders"
+
+class DailyProductSales(models.Model):
+    """Sales of one product on one day, with the category it was sold under"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    order_count = models.IntegerField(default=0, help_text="Orders containing this product")
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        ordering = ['day']
+        unique_together = ['day', 'product']
+        indexes = [
+            models.Index(fields=['day', 'category'], name='dailyproduct_day_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.product_id} x{self.quantity}"
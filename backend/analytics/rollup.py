@@ -0,0 +1,152 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from backend.dates import DateRange
+from .models import DailySales, DailyProductSales
+
+
+def _increment(model, key_fields, deltas, create_defaults=None):
+    """
+    Add ``deltas`` ({key tuple: {field: delta}}) to the rows identified by
+    ``key_fields``, creating missing rows with ``create_defaults[key]``.
+
+    Nothing is read under lock: missing rows are inserted empty (a
+    concurrent insert of the same row simply wins), then one UPDATE adds
+    every row's delta in the database with ``SET f = f + CASE ...``. A
+    basket costs the same few queries whatever its size, and concurrent
+    sales hold today's row only for that UPDATE, not a read-modify-write.
+    """
+    create_defaults = create_defaults or {}
+    value_fields = sorted({field for delta in deltas.values() for field in delta})
+    matches = {key: Q(**dict(zip(key_fields, key))) for key in deltas}
+    rows = model.objects.filter(reduce(or_, matches.values()))
+
+    missing = set(deltas) - set(rows.order_by().values_list(*key_fields))
+    if missing:
+        model.objects.bulk_create([
+            model(**dict(zip(key_fields, key)), **create_defaults.get(key, {})) for key in missing
+        ], ignore_conflicts=True)
+
+    rows.update(**{
+        field: F(field) + Case(
+            *[When(match, then=Value(deltas[key].get(field, 0))) for key, match in matches.items()],
+            default=Value(0), output_field=model._meta.get_field(field)
+        )
+        for field in value_fields
+    })
+
+
+def apply_orders(order_dates, sign=1):
+    """Count orders created (``sign=1``) or deleted (``sign=-1``) on their days"""
+    counts = defaultdict(int)
+    for order_date in order_dates:
+        counts[(timezone.localdate(order_date),)] += sign
+    if not counts:
+        return
+    with transaction.atomic(savepoint=False):
+        _increment(DailySales, ('day',), {key: {'order_count': count} for key, count in counts.items()})
+        if sign < 0:
+            DailySales.objects.filter(day__in=[key[0] for key in counts], order_count__lte=0).delete()
+
+
+def apply_lines(lines, sign=1, by_product=True):
+    """
+    Fold order lines into the daily rollups.
+
+    ``lines`` yields ``(order_date, product_id, category_id, quantity,
+    unit_price, unit_cost)``; ``sign`` is 1 when the lines were sold and -1
+    when they are removed. Order counts per day are kept by apply_orders.
+    ``by_product=False`` only touches the day totals.
+    """
+    days = defaultdict(lambda: {'revenue': Decimal('0.00'), 'profit': Decimal('0.00')})
+    products = defaultdict(lambda: {
+        'quantity': 0, 'revenue': Decimal('0.00'), 'profit': Decimal('0.00'), 'order_count': 0
+    })
+    categories = {}
+
+    for order_date, product_id, category_id, quantity, unit_price, unit_cost in lines:
+        day = timezone.localdate(order_date)
+        revenue = unit_price * quantity * sign
+        profit = (unit_price - unit_cost) * quantity * sign
+        days[(day,)]['revenue'] += revenue
+        days[(day,)]['profit'] += profit
+        product = products[(day, product_id)]
+        product['quantity'] += quantity * sign
+        product['revenue'] += revenue
+        product['profit'] += profit
+        product['order_count'] += sign
+        categories[(day, product_id)] = {'category_id': category_id}
+
+    if not days:
+        return
+    with transaction.atomic(savepoint=False):
+        _increment(DailySales, ('day',), dict(days))
+        if not by_product:
+            return
+        _increment(DailyProductSales, ('day', 'product_id'), dict(products), create_defaults=categories)
+        if sign < 0:
+            DailyProductSales.objects.filter(day__in=[key[0] for key in days], order_count__lte=0).delete()
+
+
+def rebuild(start=None, end=None):
+    """
+    Recompute the rollups from the order tables for days ``start``..``end``
+    (inclusive; either may be None for open-ended) with three grouped
+    queries. Returns the number of (day, product) rows written.
+    """
+    from orders.models import Order, OrderItem
+
+    dates = DateRange(start, end)
+    orders = Order.objects.filter(dates.filter('order_date'))
+    items = OrderItem.objects.filter(dates.filter('order__order_date'))
+    day_filter = {}
+    if start:
+        day_filter['day__gte'] = start
+    if end:
+        day_filter['day__lte'] = end
+
+    revenue = Sum(F('unit_price') * F('quantity'))
+    profit = Sum((F('unit_price') - F('unit_cost')) * F('quantity'))
+    by_product = (
+        items.annotate(day=TruncDate('order__order_date'))
+        .values('day', 'product_id', 'product__category_id')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=revenue,
+                  total_profit=profit, lines=Count('id'))
+        .order_by()
+    )
+    sales_by_day = {
+        row['day']: row for row in
+        items.annotate(day=TruncDate('order__order_date'))
+        .values('day')
+        .annotate(total_revenue=revenue, total_profit=profit)
+        .order_by()
+    }
+    orders_by_day = (
+        orders.annotate(day=TruncDate('order_date'))
+        .values('day')
+        .annotate(orders=Count('id'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailySales.objects.filter(**day_filter).delete()
+        DailyProductSales.objects.filter(**day_filter).delete()
+        DailySales.objects.bulk_create([
+            DailySales(day=row['day'], order_count=row['orders'],
+                       revenue=sales_by_day.get(row['day'], {}).get('total_revenue') or Decimal('0.00'),
+                       profit=sales_by_day.get(row['day'], {}).get('total_profit') or Decimal('0.00'))
+            for row in orders_by_day
+        ], batch_size=1000)
+        rows = DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=row['day'], product_id=row['product_id'],
+                              category_id=row['product__category_id'], quantity=row['total_quantity'],
+                              revenue=row['total_revenue'], profit=row['total_profit'],
+                              order_count=row['lines'])
+            for row in by_product
+        ], batch_size=1000)
+    return len(rows)
@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from backend.cache import bump_data_version
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+from orders.signals import order_line_deleted, order_lines_created
+from .rollup import apply_lines, apply_orders
+
+LINE_FIELDS = ('product_id', 'product__category_id', 'quantity', 'unit_price', 'unit_cost')
+
+
+@receiver(post_save, sender=Order)
+def count_new_order(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_orders([instance.order_date])
+
+
+@receiver(order_lines_created)
+def roll_up_basket(sender, order, items, **kwargs):
+    apply_lines(
+        (order.order_date, item.product_id, item.product.category_id,
+         item.quantity, item.unit_price, item.unit_cost)
+        for item in items
+    )
+
+
+@receiver(post_save, sender=OrderItem)
+def roll_up_line(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    order_date = instance.order.order_date
+    category_id = instance.product.category_id
+    # The line as it was before this save, read (and locked) by OrderItem.save
+    previous = getattr(instance, '_previous_line', None)
+    if previous:
+        previous_category_id = category_id
+        if previous['product_id'] != instance.product_id:
+            previous_category_id = Product.objects.values_list('category_id', flat=True).get(pk=previous['product_id'])
+        apply_lines([(
+            order_date, previous['product_id'], previous_category_id,
+            previous['quantity'], previous['unit_price'], previous['unit_cost']
+        )], sign=-1)
+    apply_lines([(
+        order_date, instance.product_id, category_id,
+        instance.quantity, instance.unit_price, instance.unit_cost
+    )])
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order(sender, instance, **kwargs):
+    lines = OrderItem.objects.filter(order=instance).values_list(*LINE_FIELDS)
+    apply_lines([(instance.order_date, *line) for line in lines], sign=-1)
+    apply_orders([instance.order_date], sign=-1)
+
+
+@receiver(order_line_deleted)
+def remove_line(sender, item, **kwargs):
+    line = OrderItem.objects.filter(pk=item.pk).values_list('order__order_date', *LINE_FIELDS).first()
+    if line:
+        apply_lines([line], sign=-1)
+
+
+@receiver(pre_delete, sender=Product)
+def remove_product_lines(sender, instance, **kwargs):
+    # The product's lines and its per-product rows cascade away with it,
+    # so only the day totals need adjusting
+    lines = OrderItem.objects.filter(product=instance).values_list('order__order_date', *LINE_FIELDS)
+    apply_lines(lines, sign=-1, by_product=False)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(order_lines_created)
+@receiver(order_line_deleted)
+def invalidate_summaries(sender, raw=False, **kwargs):
+    # Any write can change a dashboard summary; cached copies are dropped
+    # by moving to a new data version
+    if not raw:
+        bump_data_version()
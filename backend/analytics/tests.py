@@ -1,3 +1,655 @@
-from django.test import TestCase
+import copy
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+from django.db.models import Sum
+from backend.async_views import gather_queries
+from backend.db_router import PIN_COOKIE, ReplicaRoutingMiddleware
+from backend.cache import cache_stats, reset_cache_stats
+from backend.metrics import reset_metrics
+from backend.querylog import fingerprint, read_log, reset_explained
+from .benchmarks import compare, endpoint_requests, run_benchmarks
+from .dataset import generate_dataset
+from .models import DailySales, DailyProductSales
+from .rollup import rebuild
 
-# Create your tests here.
+
+def snapshot():
+    days = list(DailySales.objects.order_by('day').values_list('day', 'order_count', 'revenue', 'profit'))
+    products = list(
+        DailyProductSales.objects.order_by('day', 'product_id')
+        .values_list('day', 'product_id', 'category_id', 'quantity', 'revenue', 'profit', 'order_count')
+    )
+    return days, products
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        drinks = Category.objects.create(name='Drinks')
+        self.chips = Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'),
+                                            selling_price=Decimal('1.50'), quantity=100)
+        self.cola = Product.objects.create(name='Cola', category=drinks, cost_price=Decimal('0.80'),
+                                           selling_price=Decimal('1.20'), quantity=100)
+
+    def order(self, **quantities):
+        products = {'chips': self.chips, 'cola': self.cola}
+        response = self.client.post(reverse('orders:order-list'), {
+            'order_items': [{'product': products[name].id, 'quantity': qty} for name, qty in quantities.items()]
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.latest('id')
+
+    def assertMatchesRebuild(self):
+        incremental = snapshot()
+        rebuild()
+        self.assertEqual(incremental, snapshot())
+
+    def test_orders_are_rolled_up_incrementally(self):
+        self.order(chips=2, cola=1)
+        self.order(chips=3)
+
+        day = DailySales.objects.get()
+        self.assertEqual(day.order_count, 2)
+        self.assertEqual(day.revenue, Decimal('8.70'))
+        self.assertEqual(day.profit, Decimal('2.90'))
+        chips = DailyProductSales.objects.get(product=self.chips)
+        self.assertEqual((chips.quantity, chips.order_count), (5, 2))
+        self.assertMatchesRebuild()
+
+    def test_deleting_orders_and_lines(self):
+        first = self.order(chips=2, cola=1)
+        second = self.order(chips=3, cola=4)
+
+        first.delete()
+        self.assertMatchesRebuild()
+        OrderItem.objects.get(order=second, product=self.cola).delete()
+        self.assertMatchesRebuild()
+        Order.objects.all().delete()
+        self.assertEqual(snapshot(), ([], []))
+
+    def test_line_saved_directly_and_edited(self):
+        order = Order.objects.create()
+        item = OrderItem.objects.create(order=order, product=self.chips, quantity=2)
+        item.quantity = 5
+        item.save()
+
+        self.assertEqual(DailyProductSales.objects.get().quantity, 5)
+        self.assertMatchesRebuild()
+
+        # The previous line comes from OrderItem.save's locked read
+        item.product = self.cola
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        line_reads = [query['sql'] for query in ctx.captured_queries
+                      if query['sql'].startswith('SELECT') and OrderItem._meta.db_table in query['sql']]
+        self.assertEqual(len(line_reads), 1)
+        self.assertEqual(list(DailyProductSales.objects.values_list('product', 'quantity')), [(self.cola.id, 5)])
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_product_adjusts_day_totals(self):
+        self.order(chips=2, cola=1)
+        self.chips.delete()
+
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_limits_to_range(self):
+        self.order(chips=2)
+        yesterday = timezone.localdate() - timezone.timedelta(days=1)
+        DailySales.objects.create(day=yesterday, order_count=9)
+
+        call_command('rebuild_daily_sales', start=timezone.localdate(), stdout=open('/dev/null', 'w'))
+
+        self.assertTrue(DailySales.objects.filter(day=yesterday).exists())
+        self.assertEqual(DailySales.objects.get(day=timezone.localdate()).order_count, 1)
+
+
+class SummaryEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        self.products = [
+            Product.objects.create(name=f'P{i}', category=snacks, cost_price=Decimal('1.00'),
+                                   selling_price=Decimal('2.00'), quantity=1000)
+            for i in range(3)
+        ]
+
+    def add_orders(self, count):
+        for _ in range(count):
+            self.client.post(reverse('orders:order-list'), {
+                'order_items': [{'product': p.id, 'quantity': 2} for p in self.products]
+            }, format='json')
+
+    def test_sales_summary_reads_rollups(self):
+        self.add_orders(3)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:sales-summary'))
+
+        self.assertEqual(response.data['summary']['total_orders'], 3)
+        self.assertEqual(response.data['summary']['total_revenue'], Decimal('36.00'))
+        self.assertEqual(response.data['summary']['profit_margin'], Decimal('50'))
+        # 30 days back plus today, zero-filled
+        self.assertEqual(len(response.data['daily_sales']), 31)
+        self.assertEqual(response.data['daily_sales'][0]['revenue'], Decimal('0.00'))
+        self.assertEqual(response.data['daily_sales'][-1], {'date': timezone.localdate().isoformat(), 'revenue': Decimal('36.00')})
+        self.assertEqual(response.data['top_products'][0]['total_quantity'], 6)
+
+    def test_sales_summary_granularity(self):
+        self.add_orders(1)
+        last_week = timezone.localdate() - timezone.timedelta(days=7)
+        DailySales.objects.create(day=last_week, order_count=4, revenue=Decimal('10.10'), profit=Decimal('1.01'))
+
+        response = self.client.get(reverse('orders:sales-summary'), {
+            'granularity': 'month', 'start_date': '2026-01-15', 'end_date': '2026-03-02'
+        })
+        self.assertEqual([b['date'] for b in response.data['sales']], ['2026-01-01', '2026-02-01', '2026-03-01'])
+
+        response = self.client.get(reverse('orders:sales-summary'), {'granularity': 'week'})
+        self.assertTrue(all(timezone.datetime.fromisoformat(b['date']).weekday() == 0 for b in response.data['sales']))
+        self.assertEqual(sum(b['orders'] for b in response.data['sales']), 5)
+        self.assertEqual(response.data['summary']['total_revenue'], Decimal('22.10'))
+
+    @override_settings(SUMMARY_CONCURRENT_QUERIES=False)
+    def test_sales_summary_span_is_capped(self):
+        for name in ('orders:sales-summary', 'analytics:sales-summary'):
+            response = self.client.get(reverse(name), {'start_date': '0001-01-01', 'end_date': '2026-01-01'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('granularity', response.json())
+
+            # The same span fits in months, up to the last day there is
+            response = self.client.get(reverse(name), {
+                'granularity': 'month', 'start_date': '9940-01-01', 'end_date': '9999-12-31'
+            })
+            self.assertEqual(response.status_code, 200)
+            sales = response.json()['sales']
+            self.assertEqual((len(sales), sales[-1]['date']), (720, '9999-12-01'))
+
+        response = self.client.get(reverse('orders:sales-summary'), {
+            'granularity': 'week', 'start_date': '9999-12-01', 'end_date': '9999-12-31'
+        })
+        self.assertEqual(response.data['sales'][-1]['date'], '9999-12-27')
+
+    def test_category_sales_reads_rollups(self):
+        self.add_orders(2)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('orders:category-sales-summary'))
+
+        self.assertEqual(response.data['total_sold'], 12)
+        self.assertEqual(response.data['category_sales'][0]['total_revenue'], 24.0)
+
+    def test_category_sales_counts_distinct_products(self):
+        self.add_orders(2)
+        yesterday = timezone.localdate() - timezone.timedelta(days=1)
+        DailyProductSales.objects.create(day=yesterday, product=self.products[0], category=self.products[0].category,
+                                         quantity=1, revenue=Decimal('2.00'), profit=Decimal('1.00'), order_count=1)
+
+        response = self.client.get(reverse('orders:category-sales-summary'))
+        self.assertEqual(response.data['category_sales'][0]['products_sold'], 3)
+        self.assertNotIn('products', response.data)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:category-sales-summary'),
+                                       {'category': self.products[0].category_id})
+        self.assertEqual(len(response.data['category_sales']), 1)
+        first = response.data['products'][0]
+        self.assertEqual((first['product_id'], first['total_quantity'], first['order_count']),
+                         (self.products[0].id, 5, 3))
+        self.assertEqual(first['total_revenue'], 10.0)
+
+
+@override_settings(SUMMARY_CACHE_PER_PROCESS=True)
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        self.product = Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'),
+                                              selling_price=Decimal('2.00'), quantity=100)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        url = reverse('orders:sales-summary')
+        first = self.client.get(url, {'granularity': 'week', 'start_date': '2026-01-01'})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'start_date': '2026-01-01', 'granularity': 'week'})
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1, 'not_modified': 0})
+
+    def test_conditional_get_is_not_modified(self):
+        url = reverse('inventory:inventory-summary')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(cache_stats()['not_modified'], 1)
+
+    def test_writes_invalidate(self):
+        url = reverse('orders:today-orders')
+        before = self.client.get(url)
+        self.client.post(reverse('orders:order-list'), {
+            'order_items': [{'product': self.product.id, 'quantity': 2}]
+        }, format='json')
+
+        after = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after['X-Cache'], 'MISS')
+        self.assertEqual(after.data['total_orders'], 1)
+
+        etag = self.client.get(reverse('inventory:inventory-summary'))['ETag']
+        self.product.quantity = 5
+        self.product.save()
+        response = self.client.get(reverse('inventory:inventory-summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['total_quantity'], 5)
+
+    def test_etag_needs_the_cached_entry(self):
+        url = reverse('inventory:inventory-summary')
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    @override_settings(SUMMARY_CACHE_PER_PROCESS=False)
+    def test_per_process_cache_is_not_trusted(self):
+        url = reverse('inventory:inventory-summary')
+        first = self.client.get(url)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('ETag', first)
+        self.assertNotIn('X-Cache', second)
+        self.assertEqual(cache_stats(), {'hits': 0, 'misses': 0, 'not_modified': 0})
+
+
+@override_settings(SUMMARY_CACHE_PER_PROCESS=True)
+class AsyncSummaryTests(TransactionTestCase):
+    # Committed data, so the worker threads' own connections can read it
+    def setUp(self):
+        cache.clear()
+        client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        drinks = Category.objects.create(name='Drinks')
+        self.chips = Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'),
+                                            selling_price=Decimal('1.50'), quantity=100, low_stock_threshold=95)
+        cola = Product.objects.create(name='Cola', category=drinks, cost_price=Decimal('0.80'),
+                                      selling_price=Decimal('1.20'), quantity=100)
+        for quantity in (2, 5):
+            client.post(reverse('orders:order-list'), {
+                'order_items': [{'product': self.chips.id, 'quantity': quantity}, {'product': cola.id, 'quantity': 1}]
+            }, format='json')
+
+    async def test_responses_match_the_sync_endpoints(self):
+        client = AsyncClient()
+        for name, sync_name, params in [
+            ('sales-summary', 'orders:sales-summary', {'granularity': 'week'}),
+            ('category-sales-summary', 'orders:category-sales-summary', {'category': str(self.chips.category_id)}),
+            ('today-orders', 'orders:today-orders', {'view': 'compact'}),
+            ('inventory-summary', 'inventory:inventory-summary', {}),
+        ]:
+            expected = await client.get(reverse(sync_name), params)
+            response = await client.get(reverse(f'analytics:{name}'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response.content, expected.content)
+        # The worker threads' queries are timed for the request
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+    async def test_responses_are_cached(self):
+        client = AsyncClient()
+        url = reverse('analytics:sales-summary')
+        first = await client.get(url)
+        second = await client.get(url)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.content, second.content)
+
+        response = await client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = await client.post(url)
+        self.assertEqual(response.status_code, 405)
+
+    async def test_queries_run_concurrently(self):
+        # Each query waits for the other; run in sequence, the barrier breaks
+        barrier = threading.Barrier(2, timeout=5)
+
+        def query(value):
+            barrier.wait()
+            return value
+
+        results = await gather_queries({'a': lambda: query(1), 'b': lambda: query(2)})
+        self.assertEqual(results, {'a': 1, 'b': 2})
+
+
+class SequentialSummaryTests(TestCase):
+    @override_settings(SUMMARY_CONCURRENT_QUERIES=False)
+    def test_queries_share_the_request_transaction(self):
+        cache.clear()
+        snacks = Category.objects.create(name='Snacks')
+        Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'), quantity=3)
+
+        response = self.client.get(reverse('analytics:inventory-summary'))
+        self.assertEqual(response.json()['total_quantity'], 3)
+
+
+class DatasetTests(TestCase):
+    def test_generated_data_is_consistent(self):
+        counts = generate_dataset(categories=3, products=40, orders=60, days=10, batch_size=25)
+        self.assertEqual((Category.objects.count(), Product.objects.count(), Order.objects.count()), (3, 40, 60))
+        self.assertEqual(OrderItem.objects.count(), counts['order_items'])
+
+        for order in Order.objects.prefetch_related('order_items'):
+            self.assertEqual(order.total_amount, sum(item.subtotal for item in order.order_items.all()))
+            self.assertEqual(order.total_profit, sum(item.profit for item in order.order_items.all()))
+        sold = dict(OrderItem.objects.values_list('product').annotate(total=Sum('quantity')))
+        for product in Product.objects.all():
+            self.assertEqual(product.sold_quantity, sold.get(product.id, 0))
+            self.assertGreaterEqual(product.available_quantity, 0)
+
+        first = timezone.localdate() - timezone.timedelta(days=10)
+        self.assertFalse(Order.objects.filter(order_date__date__lt=first - timezone.timedelta(days=1)).exists())
+        self.assertGreaterEqual(Order.objects.dates('order_date', 'day').count(), 10)
+        self.assertEqual(DailySales.objects.aggregate(total=Sum('order_count'))['total'], 60)
+
+    def test_bestsellers_dominate(self):
+        generate_dataset(categories=2, products=100, orders=300, skew=1.2)
+        sold = sorted(Product.objects.values_list('sold_quantity', flat=True), reverse=True)
+        self.assertGreater(sum(sold[:10]), sum(sold) / 2)
+
+
+class BenchmarkRunnerTests(TestCase):
+    def test_every_endpoint_is_benchmarked(self):
+        generate_dataset(categories=2, products=20, orders=20, days=5)
+        names = {key.split(' ', 1)[1] for key in endpoint_requests()}
+        from inventory.urls import urlpatterns as inventory_urls
+        from orders.urls import urlpatterns as orders_urls
+        self.assertEqual(names, {f'inventory:{p.name}' for p in inventory_urls} | {f'orders:{p.name}' for p in orders_urls})
+
+        report = run_benchmarks(APIClient(), iterations=1, warmup=0)
+        for key, result in report['endpoints'].items():
+            self.assertLess(result['status'], 300, key)
+        self.assertEqual(report['endpoints']['GET orders:sales-summary']['queries'], 2)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'endpoints': {
+            'GET a': {'status': 200, 'p50_ms': 10.0, 'p95_ms': 12.0, 'queries': 2, 'peak_kib': 100.0},
+            'GET b': {'status': 200, 'p50_ms': 0.5, 'p95_ms': 0.6, 'queries': 1, 'peak_kib': 10.0},
+        }}
+        report = {'endpoints': {
+            'GET a': {'status': 200, 'p50_ms': 14.0, 'p95_ms': 30.0, 'queries': 3, 'peak_kib': 110.0},
+            'GET b': {'status': 500, 'p50_ms': 0.9, 'p95_ms': 0.9, 'queries': 1, 'peak_kib': 40.0},
+            'GET new': {'status': 200, 'p50_ms': 99.0, 'p95_ms': 99.0, 'queries': 9, 'peak_kib': 9.0},
+        }}
+        found = {(r['endpoint'], r['metric']) for r in compare(report, baseline)}
+        self.assertEqual(found, {('GET a', 'queries'), ('GET a', 'p50_ms'), ('GET b', 'status')})
+
+
+@override_settings(SUMMARY_CACHE_PER_PROCESS=True, METRICS_TOKEN='s3cret')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        reset_metrics()
+        snacks = Category.objects.create(name='Snacks')
+        Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'), quantity=5)
+
+    def get_metrics(self):
+        return self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+
+    def timings(self, response):
+        entries = [entry.strip().split(';') for entry in response['Server-Timing'].split(',')]
+        return {entry[0]: dict(part.split('=', 1) for part in entry[1:]) for entry in entries}
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('orders:sales-summary'))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'app', 'total'})
+        self.assertEqual(timings['db']['desc'], '"2 queries"')
+        self.assertGreater(float(timings['render']['dur']), 0)
+        self.assertGreaterEqual(float(timings['total']['dur']), float(timings['db']['dur']))
+
+        # Async view; in sequence, as worker threads cannot read the test's transaction
+        with override_settings(SUMMARY_CONCURRENT_QUERIES=False):
+            response = self.client.get(reverse('analytics:inventory-summary'))
+        self.assertEqual(self.timings(response)['db']['desc'], '"3 queries"')
+
+    def test_serializers_are_timed_apart_from_queries(self):
+        product = Product.objects.get()
+        for url in (reverse('inventory:product-list'), reverse('inventory:product-detail', args=[product.pk])):
+            timings = self.timings(self.client.get(url))
+            self.assertGreater(float(timings['serialize']['dur']), 0)
+            self.assertGreaterEqual(float(timings['total']['dur']),
+                                    float(timings['db']['dur']) + float(timings['serialize']['dur']))
+        # Summaries are plain dicts; nothing is serialized
+        self.assertEqual(self.timings(self.client.get(reverse('orders:sales-summary')))['serialize']['dur'], '0.0')
+
+    def test_metrics_endpoint_aggregates_per_route(self):
+        for _ in range(3):
+            self.client.get(reverse('orders:sales-summary'))
+        self.client.get('/no/such/page/')
+
+        response = self.get_metrics()
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{route="orders:sales-summary",method="GET"} 3', body)
+        self.assertIn('http_request_queries_bucket{route="orders:sales-summary",method="GET",le="2"} 3', body)
+        self.assertIn('http_request_serialize_seconds_count{route="orders:sales-summary",method="GET"} 3', body)
+        self.assertIn('http_responses_total{route="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('summary_cache_requests_total{result="hits"} 2', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        response = self.client.get(reverse('orders:sales-summary'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn('orders:sales-summary', self.get_metrics().content.decode())
+
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.get_metrics().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_without_a_token_need_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_explained()
+        log = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        log.close()
+        self.path = log.name
+        self.addCleanup(os.remove, self.path)
+        snacks = Category.objects.create(name='Snacks')
+        Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'), quantity=5)
+
+    def test_fingerprint_ignores_literals_and_list_length(self):
+        one, key = fingerprint('SELECT "id" FROM "t1" WHERE "id" IN (%s, %s) AND name = \'x\' LIMIT 21')
+        many, other = fingerprint('SELECT "id"  FROM "t1"\nWHERE "id" IN (%s, %s, %s, %s) AND name = \'yy\' LIMIT 5')
+        self.assertEqual(one, 'SELECT "id" FROM "t1" WHERE "id" IN (...) AND name = ? LIMIT ?')
+        self.assertEqual((one, key), (many, other))
+        self.assertNotEqual(key, fingerprint('SELECT "id" FROM "t2" WHERE "id" IN (%s)')[1])
+
+    def test_slow_queries_are_logged_with_view_call_site_and_plan(self):
+        with self.settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.path), \
+                self.assertLogs('backend.slow_queries', 'WARNING'):
+            for _ in range(2):
+                cache.clear()
+                self.client.get(reverse('orders:sales-summary'))
+        records = [record for record in read_log(self.path) if record['view'] == 'orders:sales-summary']
+        self.assertTrue(records)
+        self.assertFalse(any(record['sql'].startswith('EXPLAIN') for record in read_log(self.path)))
+        self.assertTrue(all(record['call_site'].startswith('orders/views.py') for record in records))
+
+        by_fingerprint = {}
+        for record in records:
+            by_fingerprint.setdefault(record['fingerprint'], []).append(record)
+        for same in by_fingerprint.values():
+            # Both requests ran it; only the first was explained
+            self.assertEqual(len(same), 2)
+            self.assertIn('explain', same[0])
+            self.assertNotIn('explain', same[1])
+        self.assertTrue(any(same[0]['explain'] for same in by_fingerprint.values()))
+
+    def test_failed_explain_leaves_the_transaction_usable(self):
+        # The test case runs the request inside its transaction
+        with self.settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.path), \
+                self.assertLogs('backend.slow_queries', 'WARNING'), \
+                mock.patch.object(connection.ops, 'explain_query_prefix', return_value='NOT EXPLAIN'), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('inventory:category-list')).status_code, 200)
+        self.assertFalse(connection.needs_rollback)
+        self.assertEqual(Product.objects.count(), 1)
+
+        explains = [record['explain'] for record in read_log(self.path) if 'explain' in record]
+        self.assertTrue(explains)
+        self.assertTrue(all(explain.startswith('EXPLAIN failed') for explain in explains))
+        statements = [query['sql'] for query in queries]
+        failed = statements.index(next(sql for sql in statements if sql.startswith('NOT EXPLAIN')))
+        self.assertTrue(statements[failed - 1].startswith('SAVEPOINT'))
+        self.assertTrue(statements[failed + 1].startswith('ROLLBACK TO SAVEPOINT'))
+
+    def test_fast_queries_are_not_logged(self):
+        with self.settings(SLOW_QUERY_MS=10_000, SLOW_QUERY_LOG=self.path):
+            self.client.get(reverse('inventory:category-list'))
+        self.assertEqual(list(read_log(self.path)), [])
+
+    def test_summary_command_ranks_by_total_time(self):
+        with open(self.path, 'w') as log:
+            for ms, fp, view in [(5, 'aaa', 'a:list'), (5, 'aaa', 'a:list'), (8, 'bbb', 'b:list')]:
+                log.write(json.dumps({'fingerprint': fp, 'sql': f'SELECT {fp}', 'ms': ms, 'view': view,
+                                      'call_site': 'x.py:1 in f', 'explain': None}) + '\n')
+            log.write('not json\n')
+        out = io.StringIO()
+        call_command('slow_queries', file=self.path, stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 slow queries, 2 fingerprints', output)
+        self.assertLess(output.index('[aaa] 10.0 ms total, 2 calls'), output.index('[bbb] 8.0 ms total, 1 calls'))
+        self.assertIn('views: a:list (2)', output)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, request, write=False):
+        """The databases a request reads from before and after an optional write"""
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Product))
+            if write:
+                router.db_for_write(Product)
+            seen.append(router.db_for_read(Product))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_requests_read_from_a_replica(self):
+        seen, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(seen, ['replica1', 'replica1'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.route(RequestFactory().post('/'))[0], ['default', 'default'])
+        self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+
+    def test_writes_pin_reads_to_the_primary(self):
+        seen, response = self.route(RequestFactory().get('/'), write=True)
+        self.assertEqual(seen, ['replica1', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        pinned = RequestFactory().get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.route(pinned)[0], ['default', 'default'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        seen, response = self.route(RequestFactory().get('/'), write=True)
+        self.assertEqual(seen, ['default', 'default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaDatabaseTests(TestCase):
+    """Routing between two SQLite databases, the replica deliberately out of date"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Not in settings, so the test runner leaves it alone: a file database
+        # migrated here, joined to the test case's databases before it checks them
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['replica1'] = {
+            **copy.deepcopy(connections.settings['default']), 'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'), 'OPTIONS': {},
+        }
+        call_command('migrate', database='replica1', verbosity=0)
+        cls.databases = {'default', 'replica1'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        cache.clear()
+        snacks = Category.objects.create(name='Snacks')
+        self.chips = Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.00'), quantity=5)
+        stale = Category.objects.using('replica1').create(pk=snacks.pk, name='Snacks')
+        Product.objects.using('replica1').create(pk=self.chips.pk, name='Old chips', category=stale,
+                                                 cost_price=Decimal('1.00'), quantity=5)
+
+    def test_reads_after_a_write_see_it(self):
+        url = reverse('inventory:product-detail', kwargs={'pk': self.chips.pk})
+        self.assertEqual(self.client.get(url).data['name'], 'Old chips')
+
+        response = self.client.patch(url, {'name': 'Salted chips'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        # The client sends the pin back, so it reads its own write
+        self.assertEqual(self.client.get(url).data['name'], 'Salted chips')
+
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.client.get(url).data['name'], 'Old chips')
+        self.assertEqual(Product.objects.get(pk=self.chips.pk).name, 'Salted chips')
+
+    @override_settings(SUMMARY_CACHE_PER_PROCESS=True)
+    def test_cached_summaries_keep_reads_after_a_write(self):
+        summary = reverse('inventory:inventory-summary')
+        url = reverse('inventory:product-detail', kwargs={'pk': self.chips.pk})
+        self.client.patch(url, {'quantity': 50}, content_type='application/json')
+
+        # Another client reads the lagging replica under the new data version
+        reader = self.client_class()
+        self.assertEqual(reader.get(summary).data['total_quantity'], 5)
+        self.assertEqual(reader.get(summary)['X-Cache'], 'HIT')
+        response = self.client.get(summary)
+        self.assertEqual((response['X-Cache'], response.data['total_quantity']), ('MISS', 50))
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'analytics'
+
+urlpatterns = [
+    # Async summaries; same responses as the inventory and orders endpoints
+    path('sales-summary/', views.sales_summary, name='sales-summary'),
+    path('category-sales/', views.category_sales_summary, name='category-sales-summary'),
+    path('today-orders/', views.today_orders, name='today-orders'),
+    path('inventory-summary/', views.inventory_summary, name='inventory-summary'),
+]
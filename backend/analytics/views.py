@@ -1,3 +1,49 @@
-from django.shortcuts import render
+"""
+Async versions of the summary endpoints, for ASGI deployments.
 
-# Create your views here.
+Each view runs the same queries as its synchronous counterpart in the
+inventory and orders apps, but all at once (see gather_queries), and
+returns the same JSON.
+"""
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+from backend.async_views import JSONResponse, gather_queries
+from backend.cache import cached_summary
+from inventory.views import inventory_summary_queries
+from orders.views import category_sales_queries, sales_summary_queries, today_orders_queries
+
+
+async def _summary(summary_queries, params):
+    try:
+        queries, build = summary_queries(params)
+    except ValidationError as e:
+        return JSONResponse(e.detail, status=400)
+    return JSONResponse(build(await gather_queries(queries)))
+
+
+@require_GET
+@cached_summary
+async def sales_summary(request):
+    """Get sales summary statistics"""
+    return await _summary(sales_summary_queries, request.GET)
+
+
+@require_GET
+@cached_summary
+async def category_sales_summary(request):
+    """Get sales summary by category"""
+    return await _summary(category_sales_queries, request.GET)
+
+
+@require_GET
+@cached_summary
+async def today_orders(request):
+    """Get today's orders summary"""
+    return await _summary(today_orders_queries, request.GET)
+
+
+@require_GET
+@cached_summary
+async def inventory_summary(request):
+    """Get inventory summary statistics"""
+    return await _summary(inventory_summary_queries, request.GET)
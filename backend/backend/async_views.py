@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+class JSONResponse(HttpResponse):
+    """``data`` rendered with DRF's JSONRenderer, so async views encode exactly like the API views"""
+
+    def __init__(self, data=None, status=200, headers=None):
+        content = b'' if data is None else JSONRenderer().render(data)
+        super().__init__(content, status=status, headers=headers, content_type='application/json')
+        self.data = data
+
+
+def run_queries(queries):
+    """Results of ``queries``, a dict of zero-argument callables, one after another"""
+    return {name: query() for name, query in queries.items()}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _query_executor():
+    # The event loop's default pool is sized for CPUs, not for threads that
+    # mostly wait on the database; each thread may hold a connection open
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                getattr(settings, 'SUMMARY_QUERY_THREADS', 16), thread_name_prefix='summary-query'
+            )
+        return _executor
+
+
+def _on_own_connection(query):
+    def run():
+        # Worker threads keep their connection between calls; treat each
+        # query like a request so CONN_MAX_AGE and health checks apply
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(queries):
+    """
+    Async run_queries(): every query at once, each on a worker thread with
+    its own database connection, so the slowest query rather than the sum
+    of them bounds the wait.
+
+    Separate connections cannot see uncommitted writes of the caller, so
+    with SUMMARY_CONCURRENT_QUERIES = False the queries run in sequence on
+    the thread holding the request's connection instead.
+    """
+    if len(queries) < 2 or not getattr(settings, 'SUMMARY_CONCURRENT_QUERIES', True):
+        return await sync_to_async(run_queries)(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(_on_own_connection(query), thread_sensitive=False, executor=_query_executor())()
+        for query in queries.values()
+    ))
+    return dict(zip(queries, results))
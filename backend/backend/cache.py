@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from .async_views import JSONResponse
+from .db_router import read_database
+
+VERSION_KEY = 'summary:version'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'SUMMARY_CACHE_ALIAS', 'default')]
+
+
+def caching_enabled():
+    """
+    Whether summaries may be cached. The data version must be seen by every
+    worker, so a cache local to one process (LocMemCache) only counts when
+    SUMMARY_CACHE_PER_PROCESS says the app runs in a single process.
+    Otherwise another worker's writes would go unnoticed and stale
+    summaries, or 304s, would be served.
+    """
+    if isinstance(_cache(), LocMemCache):
+        return getattr(settings, 'SUMMARY_CACHE_PER_PROCESS', False)
+    return True
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def cache_stats():
+    """Summary cache counters for this process"""
+    with _stats_lock:
+        return {'hits': _stats['hit'], 'misses': _stats['miss'], 'not_modified': _stats['not_modified']}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def data_version():
+    """
+    Token naming the current state of the data behind the summaries. It is
+    random rather than a counter, so an evicted version key can never
+    bring old entries back to life.
+    """
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_data_version():
+    """
+    Invalidate every cached summary. The bump is repeated once the current
+    transaction commits, so a summary cached from a reader that ran before
+    the commit does not outlive it.
+    """
+    def bump():
+        _cache().set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_after_update(updated):
+    """
+    Invalidate cached summaries after a queryset update or bulk write that
+    changed ``updated`` rows. Those send no model signals, so the receivers
+    in analytics.signals never see them and the caller has to say so.
+    """
+    if updated:
+        bump_data_version()
+
+
+def _summary_lookup(view, request, response_class):
+    """
+    ETag headers and cache key for a summary request, plus the response to
+    send straight away (304 or a cache hit) if there is one
+    """
+    params = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    # A lagging replica may build a summary after the version bump of a
+    # write it has not received; keyed apart, it is never served to the
+    # writer, who is pinned to the primary
+    source = repr((
+        view.__module__, view.__qualname__, params, timezone.localdate().isoformat(), data_version(),
+        read_database(),
+    ))
+    digest = hashlib.sha1(source.encode()).hexdigest()
+    etag = f'"{digest}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    key = f'summary:{digest}'
+
+    data = _cache().get(key)
+    if data is not None:
+        # The ETag only stands for data that is still cached under the
+        # current version; otherwise the summary is built afresh
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            _count('not_modified')
+            return headers, key, response_class(status=304, headers=headers)
+        _count('hit')
+        return headers, key, response_class(data, headers={**headers, 'X-Cache': 'HIT'})
+
+    _count('miss')
+    return headers, key, None
+
+
+def _summary_store(headers, key, response):
+    if response.status_code != 200:
+        return response
+    _cache().set(key, response.data, getattr(settings, 'SUMMARY_CACHE_TIMEOUT', 300))
+    for header, value in {**headers, 'X-Cache': 'MISS'}.items():
+        response[header] = value
+    return response
+
+
+def cached_summary(view):
+    """
+    Cache a read-only API view's response data, keyed by the view, its
+    normalized query params, today's date, the data version and the
+    database the request reads from (see backend.db_router).
+
+    The key doubles as the ETag, so a matching ``If-None-Match`` is answered
+    with ``304 Not Modified`` while the entry is cached. Without a shared
+    cache (see caching_enabled) the view runs on every request.
+    Place it below ``@api_view`` so it receives the DRF request; async
+    views must return a JSONResponse.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not caching_enabled():
+                return await view(request, *args, **kwargs)
+            headers, key, response = await sync_to_async(_summary_lookup)(view, request, JSONResponse)
+            if response is not None:
+                return response
+            response = await view(request, *args, **kwargs)
+            return await sync_to_async(_summary_store)(headers, key, response)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not caching_enabled():
+            return view(request, *args, **kwargs)
+        headers, key, response = _summary_lookup(view, request, Response)
+        if response is not None:
+            return response
+        return _summary_store(headers, key, view(request, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,63 @@
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def parse_date(value):
+    """``value`` as a date, or None when it is missing or not YYYY-MM-DD"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def day_start(day):
+    """Aware datetime for midnight at the start of ``day`` in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class DateRange(namedtuple('DateRange', ['start', 'end'])):
+    """
+    Inclusive range of days; either end may be None for an open range.
+
+    filter() compares the datetime column itself against half-open bounds,
+    ``start 00:00 <= field < (end + 1 day) 00:00`` in the current time zone.
+    ``field__date__range`` would wrap the column in a DATE() cast and rule
+    out any index on it.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_params(cls, params, default_days=None):
+        """
+        Read ``start_date``/``end_date`` (YYYY-MM-DD) from query params,
+        ignoring invalid values. With ``default_days`` a missing end is today
+        and a missing start is that many days before today.
+        """
+        start = parse_date(params.get('start_date'))
+        end = parse_date(params.get('end_date'))
+        if default_days is not None:
+            today = timezone.localdate()
+            end = end or today
+            start = start or today - timedelta(days=default_days)
+        return cls(start, end)
+
+    @classmethod
+    def day(cls, day):
+        return cls(day, day)
+
+    def filter(self, field):
+        """Q object limiting the datetime ``field`` to this range"""
+        condition = Q()
+        # Nothing lies outside date.min..date.max, and their bounds would
+        # not fit in a datetime (or in UTC), so those ends stay open
+        if self.start and self.start != date.min:
+            condition &= Q(**{f'{field}__gte': day_start(self.start)})
+        if self.end and self.end != date.max:
+            condition &= Q(**{f'{field}__lt': day_start(self.end + timedelta(days=1))})
+        return condition
@@ -0,0 +1,106 @@
+"""
+Read replicas. Requests with a safe method (GET, HEAD, OPTIONS), the
+dashboard summaries and CSV export among them, read from one of the
+DATABASE_REPLICAS; everything else uses ``default``, the primary.
+
+Reads follow writes: once a request writes, the rest of it reads from the
+primary, and the response sets a cookie that keeps the client's requests
+on the primary for REPLICA_PIN_SECONDS, long enough for the replicas to
+catch up. Reads outside a request (management commands, the shell) always
+use the primary.
+"""
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class _Routing:
+    """Where the current request reads from; shared with its summary query threads"""
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def read_database():
+    """The database the current request reads from; the primary outside requests"""
+    routing = _routing.get()
+    if routing is None or routing.replica is None or routing.wrote:
+        return 'default'
+    return routing.replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Pick the database the request reads from. Put it before any middleware
+    that queries the database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        replica = None
+        if replicas and request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES:
+            # One replica per request, so its reads see one snapshot
+            replica = random.choice(replicas)
+        routing = _Routing(replica)
+        return routing, _routing.set(routing)
+
+    def _finish(self, request, response, routing):
+        if routing.wrote and getattr(settings, 'DATABASE_REPLICAS', ()):
+            secure = request.is_secure()
+            # The frontend calls the API cross-site, which needs SameSite=None
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, secure=secure, samesite='None' if secure else 'Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, response, routing)
+
+    async def __acall__(self, request):
+        routing, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, response, routing)
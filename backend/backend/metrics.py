@@ -0,0 +1,288 @@
+"""
+Per-request timings as a ``Server-Timing`` header, aggregated per route
+into histograms served in the Prometheus text format at /metrics.
+
+Query time is measured by an execute wrapper on every connection that
+reports to the request in the current context. The context follows the
+request into ``sync_to_async`` threads, so the concurrent summary queries
+are counted too. Aggregates live in process memory, per worker (or
+serverless instance), and /metrics reports only the process that
+answers it. Prometheus does not add up workers behind one address, so
+run a single process, scrape every worker as its own target, or move
+the aggregates to a shared store (e.g. prometheus_client's
+multiprocess mode) before trusting the totals.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from .cache import cache_stats
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """What one sampled request spent, in seconds"""
+    __slots__ = ('started', 'db', 'queries', 'serialize', 'serializing', 'render', 'render_started', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = self.serialize = self.render = 0.0
+        self.queries = 0
+        self.serializing = False
+        self.render_started = None
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds):
+        # Concurrent summary queries report from several threads at once
+        with self._lock:
+            self.db += seconds
+            self.queries += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - began)
+
+
+@contextmanager
+def serializing():
+    """
+    Count the block towards the request's ``serialize`` phase, less the
+    queries it runs (a lazy queryset is often first evaluated there).
+    Nested blocks, such as a nested serializer, are part of the outer one.
+    """
+    timings = _current.get()
+    if timings is None or timings.serializing:
+        yield
+        return
+    timings.serializing = True
+    began, db = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.serialize += time.perf_counter() - began - (timings.db - db)
+        timings.serializing = False
+
+
+def _instrument(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.sum += value
+
+
+class _RouteMetrics:
+    __slots__ = ('duration', 'db', 'serialize', 'render', 'queries')
+
+    def __init__(self):
+        self.duration = _Histogram(LATENCY_BUCKETS)
+        self.db = _Histogram(LATENCY_BUCKETS)
+        self.serialize = _Histogram(LATENCY_BUCKETS)
+        self.render = _Histogram(LATENCY_BUCKETS)
+        self.queries = _Histogram(QUERY_BUCKETS)
+
+
+_routes = {}
+_responses = {}
+_lock = threading.Lock()
+
+
+def _observe(route, method, status, timings, total):
+    with _lock:
+        metrics = _routes.get((route, method))
+        if metrics is None:
+            metrics = _routes[(route, method)] = _RouteMetrics()
+        metrics.duration.observe(total)
+        metrics.db.observe(timings.db)
+        metrics.serialize.observe(timings.serialize)
+        metrics.render.observe(timings.render)
+        metrics.queries.observe(timings.queries)
+        _responses[(route, method, status)] = _responses.get((route, method, status), 0) + 1
+
+
+def reset_metrics():
+    with _lock:
+        _routes.clear()
+        _responses.clear()
+
+
+class ServerTimingMiddleware:
+    """
+    Time a sample of requests (METRICS_SAMPLE_RATE, 0 to 1): wall time, time
+    in the database and its query count, ``serialize``, the time
+    serializers spend turning objects into response data (see
+    backend.serializers.TimedRepresentationMixin), and ``render``, the
+    time turning that data into the body (DRF and other template
+    responses). Sampled responses carry them as ``Server-Timing``, with
+    ``app`` for the remainder of the view, and are added to the per-route
+    aggregates under the URL name. Requests that are not sampled cost one
+    random() call.
+
+    Put it first in MIDDLEWARE so the other middleware is included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        connection_created.connect(_instrument)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        # Connections opened before this middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+        return RequestTimings()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = self._start()
+        if timings is None:
+            return self.get_response(request)
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = self._start()
+        if timings is None:
+            return await self.get_response(request)
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        timings = _current.get()
+        if timings is not None:
+            timings.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: setattr(timings, 'render', time.perf_counter() - timings.render_started)
+            )
+        return response
+
+    def _finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        app = max(total - timings.db - timings.serialize - timings.render, 0.0)
+        server_timing = (
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+            f'serialize;dur={timings.serialize * 1000:.1f}, render;dur={timings.render * 1000:.1f}, app;dur={app * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            server_timing = f"{response['Server-Timing']}, {server_timing}"
+        response['Server-Timing'] = server_timing
+
+        match = getattr(request, 'resolver_match', None)
+        # Only named routes, so unmatched paths cannot grow the label set
+        route = match.view_name if match else 'unmatched'
+        _observe(route, request.method, response.status_code, timings, total)
+        return response
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _histogram_lines(name, histogram, **labels):
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, '+Inf'), histogram.counts):
+        cumulative += count
+        yield f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}'
+    yield f'{name}_sum{_labels(**labels)} {histogram.sum:.6f}'
+    yield f'{name}_count{_labels(**labels)} {cumulative}'
+
+
+def render_metrics():
+    """The aggregates in the Prometheus text exposition format"""
+    with _lock:
+        routes = sorted(_routes.items())
+        responses = sorted(_responses.items())
+        histograms = [
+            ('http_request_duration_seconds', 'duration', 'Wall time of sampled requests'),
+            ('http_request_db_seconds', 'db', 'Time in database queries per sampled request'),
+            ('http_request_serialize_seconds', 'serialize', 'Time in serializers per sampled request'),
+            ('http_request_render_seconds', 'render', 'Time rendering the response body per sampled request'),
+            ('http_request_queries', 'queries', 'Database queries per sampled request'),
+        ]
+        lines = []
+        for name, attribute, description in histograms:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for (route, method), metrics in routes:
+                lines += _histogram_lines(name, getattr(metrics, attribute), route=route, method=method)
+        lines += ['# HELP http_responses_total Sampled responses by status', '# TYPE http_responses_total counter']
+        lines += [
+            f'http_responses_total{_labels(route=route, method=method, status=status)} {count}'
+            for (route, method, status), count in responses
+        ]
+
+    lines += ['# HELP summary_cache_requests_total Summary cache lookups by result',
+              '# TYPE summary_cache_requests_total counter']
+    lines += [f'summary_cache_requests_total{_labels(result=result)} {count}'
+              for result, count in cache_stats().items()]
+    sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+    lines += ['# HELP http_request_sample_rate Fraction of requests timed',
+              '# TYPE http_request_sample_rate gauge', f'http_request_sample_rate {sample_rate}']
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape target; requires ``Authorization: Bearer
+    <METRICS_TOKEN>``. Without a token it is only served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse('Set METRICS_TOKEN to enable /metrics.\n', status=403, content_type='text/plain')
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,162 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_after(ordering, values):
+    """Q for rows strictly after the row whose ``ordering`` fields are ``values``"""
+    fields = [name.lstrip('-') for name in ordering]
+    # (a, b) after (x, y) is a > x OR (a = x AND b > y); the leading
+    # a >= x bound keeps the whole predicate a range scan on the index.
+    lookups = ['lt' if name.startswith('-') else 'gt' for name in ordering]
+    condition = Q()
+    for i, field in enumerate(fields):
+        condition |= Q(**dict(zip(fields[:i], values[:i])), **{f'{field}__{lookups[i]}': values[i]})
+    return Q(**{f'{fields[0]}__{lookups[0]}e': values[0]}) & condition
+
+
+def keyset_rows(queryset, ordering, fields, chunk_size):
+    """
+    ``values_list(*fields)`` rows of ``queryset`` in ``ordering``, fetched
+    ``chunk_size`` at a time with one keyset query per chunk. Unlike
+    iterator(), which MySQL's client library buffers whole, memory stays
+    bounded by the chunk on every backend. ``ordering`` must be unique.
+    """
+    keys = [name.lstrip('-') for name in ordering]
+    columns = [*fields, *(key for key in keys if key not in fields)]
+    positions = [columns.index(key) for key in keys]
+    queryset = queryset.order_by(*ordering).values_list(*columns)
+    condition = Q()
+    while True:
+        rows = list(queryset.filter(condition)[:chunk_size])
+        for row in rows:
+            yield row[:len(fields)]
+        if len(rows) < chunk_size:
+            return
+        condition = keyset_after(ordering, [rows[-1][position] for position in positions])
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with two opt-in shortcuts for large tables.
+
+    ``?count=false`` skips the ``COUNT(*)`` query; ``next`` is then worked out
+    by fetching one extra row. ``?pagination=cursor`` (or following a
+    ``cursor`` link) switches to keyset pagination on the view's
+    ``cursor_ordering``, e.g. ``('-order_date', '-id')``. Each page is then a
+    single indexed range scan, however deep the client scrolls. Cursor pages
+    have no count and are forward-only.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = 'page'
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_query_param in request.query_params):
+            self.mode = 'cursor'
+            return self.paginate_by_cursor(queryset, request, view)
+
+        if request.query_params.get(self.count_query_param, '').lower() == 'false':
+            self.mode = 'uncounted'
+            return self.paginate_without_count(queryset, request)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_without_count(self, queryset, request):
+        try:
+            self.page_number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            raise NotFound('Invalid page.')
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        return rows[:self.page_size]
+
+    def paginate_by_cursor(self, queryset, request, view):
+        self.ordering = tuple(view.cursor_ordering)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.after(queryset.model, self.decode_cursor(encoded)))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_position = [self.row_value(rows[-1], name.lstrip('-')) for name in self.ordering] if rows else None
+        return rows
+
+    @staticmethod
+    def row_value(row, name):
+        # Rows are model instances, or dicts on the values() read path
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def after(self, model, position):
+        """Rows strictly after ``position`` in cursor order"""
+        fields = [name.lstrip('-') for name in self.ordering]
+        if len(position) != len(fields):
+            raise NotFound('Invalid cursor.')
+        try:
+            values = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, position)]
+        except ValidationError:
+            raise NotFound('Invalid cursor.')
+
+        return keyset_after(self.ordering, values)
+
+    def encode_cursor(self, position):
+        # Full precision isoformat; DjangoJSONEncoder would drop microseconds
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps(position, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if not isinstance(position, list):
+            raise NotFound('Invalid cursor.')
+        return position
+
+    def get_next_link(self):
+        if self.mode == 'page':
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.mode == 'cursor':
+            url = remove_query_param(url, self.mode_query_param)
+            return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_position))
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.mode == 'page':
+            return super().get_previous_link()
+        if self.mode == 'cursor' or self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
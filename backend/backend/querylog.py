@@ -0,0 +1,214 @@
+"""
+Slow-query log. An execute wrapper on every connection times each query;
+one slower than SLOW_QUERY_MS is logged with its SQL fingerprint, the view
+serving the request and the project line that ran it. The first time a
+process sees a fingerprint, the query's EXPLAIN plan is captured too.
+
+Records go to the ``backend.slow_queries`` logger and, when SLOW_QUERY_LOG
+names a file, are appended to it as JSON lines for the ``slow_queries``
+management command to summarize.
+"""
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger('backend.slow_queries')
+
+_view = ContextVar('slow_query_view', default=None)
+_explaining = ContextVar('slow_query_explaining', default=False)
+_explained = set()
+_write_lock = threading.Lock()
+
+_IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_VALUES_ROWS = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+_READ = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+_PROJECT = str(Path(settings.BASE_DIR).resolve())
+# Project modules that only relay queries: the caller is the interesting line
+_RELAYS = {
+    str(Path(_PROJECT, 'backend', name)) for name in ('querylog.py', 'metrics.py', 'async_views.py')
+}
+
+
+def fingerprint(sql):
+    """
+    ``(normalized SQL, fingerprint)``: literals and placeholders become
+    ``?`` and lists of them ``(...)``, so one ORM query has one fingerprint
+    whatever its parameters or ``IN`` list length.
+    """
+    normalized = _STRING.sub('?', sql)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _IN_LIST.sub('(...)', normalized.replace('%s', '?'))
+    normalized = _VALUES_ROWS.sub(r'\1', normalized)
+    normalized = _SPACE.sub(' ', normalized).strip()
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _call_site():
+    """The innermost project line on the stack that is not query plumbing"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT) and filename not in _RELAYS and 'site-packages' not in filename:
+            return f'{Path(filename).relative_to(_PROJECT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _explain(connection, sql, params, many):
+    # Plans of reads only: slow writes wait on locks and index upkeep
+    # rather than a plan, and not every backend explains them
+    if many or not _READ.match(sql):
+        return None
+    token = _explaining.set(True)
+    try:
+        # In a savepoint: a failed EXPLAIN must not abort the caller's
+        # transaction, as any failed statement does on PostgreSQL
+        with transaction.atomic(using=connection.alias, savepoint=True), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        _explaining.reset(token)
+
+
+def _record(connection, sql, params, many, milliseconds):
+    normalized, key = fingerprint(sql)
+    record = {
+        'time': timezone.now().isoformat(),
+        'fingerprint': key,
+        'ms': round(milliseconds, 3),
+        'view': _view.get(),
+        'call_site': _call_site(),
+        'database': connection.alias,
+        'vendor': connection.vendor,
+        'sql': normalized,
+    }
+    explain_key = (connection.alias, key)
+    if explain_key not in _explained and getattr(settings, 'SLOW_QUERY_EXPLAIN', True):
+        _explained.add(explain_key)
+        record['explain'] = _explain(connection, sql, params, many)
+
+    logger.warning('Slow query %.1f ms [%s] in %s at %s: %s', milliseconds, key,
+                   record['view'], record['call_site'], normalized)
+    path = getattr(settings, 'SLOW_QUERY_LOG', '')
+    if path:
+        line = json.dumps(record) + '\n'
+        try:
+            with _write_lock, open(path, 'a', encoding='utf-8') as log:
+                log.write(line)
+        except OSError as e:
+            # The log must never fail the query it describes
+            logger.error('Cannot write the slow-query log %s: %s', path, e)
+
+
+def _time_query(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    result = execute(sql, params, many, context)
+    milliseconds = (time.perf_counter() - began) * 1000
+    threshold = getattr(settings, 'SLOW_QUERY_MS', None)
+    if threshold is not None and milliseconds >= threshold:
+        _record(context['connection'], sql, params, many, milliseconds)
+    return result
+
+
+def _instrument(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def reset_explained():
+    """Forget which fingerprints were explained, so each is explained again"""
+    _explained.clear()
+
+
+def read_log(path):
+    """Records from a SLOW_QUERY_LOG file, skipping lines that are not JSON"""
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(records):
+    """
+    Per-fingerprint totals, slowest total time first: calls, total, mean
+    and max ms, the views and call sites seen, and one SQL text and plan
+    """
+    summary = {}
+    for record in records:
+        entry = summary.get(record['fingerprint'])
+        if entry is None:
+            entry = summary[record['fingerprint']] = {
+                'fingerprint': record['fingerprint'], 'sql': record['sql'], 'calls': 0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'views': {}, 'call_sites': {}, 'explain': None,
+            }
+        entry['calls'] += 1
+        entry['total_ms'] += record['ms']
+        entry['max_ms'] = max(entry['max_ms'], record['ms'])
+        for field, counts in (('view', entry['views']), ('call_site', entry['call_sites'])):
+            if record.get(field):
+                counts[record[field]] = counts.get(record[field], 0) + 1
+        if record.get('explain') and not entry['explain']:
+            entry['explain'] = record['explain']
+    for entry in summary.values():
+        entry['mean_ms'] = entry['total_ms'] / entry['calls']
+    return sorted(summary.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+
+class SlowQueryLogMiddleware:
+    """
+    Time every query against SLOW_QUERY_MS (None turns the log off) and
+    tag slow ones with the URL name of the view being served.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(_instrument)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        # Connections opened before this middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+        return _view.set(request.path)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view.set(request.resolver_match.view_name)
@@ -0,0 +1,219 @@
+import decimal
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import serializing
+
+
+class TimedRepresentationMixin:
+    """
+    Serializer mixin reporting to_representation() as the ``serialize``
+    phase of the request's Server-Timing and /metrics (see backend.metrics).
+    Put it on serializers whose output is a response body.
+    """
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+class AnnotatedSerializerMixin:
+    """
+    Serializer mixin for aggregates that should come from the queryset.
+
+    Subclasses declare ``annotations = {'field_name': Count(...)}`` alongside a
+    matching read-only field, and views pass their queryset through
+    ``annotate_queryset`` so every row arrives with the value already
+    computed. Serializing a page then costs one query instead of one per row.
+    """
+    annotations = {}
+
+    @classmethod
+    def annotate_queryset(cls, queryset, fields=None):
+        """Add the annotations, or only those named in ``fields`` when given"""
+        annotated = queryset.annotate(**{
+            name: annotation for name, annotation in cls.annotations.items()
+            if fields is None or name in fields
+        })
+        # An aggregate makes the query a GROUP BY, and Django drops
+        # Meta.ordering from those, so restore it unless one was chosen
+        if not queryset.query.order_by and queryset.query.default_ordering:
+            annotated = annotated.order_by(*queryset.model._meta.ordering)
+        return annotated
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ``?fields=id,name`` and ``?view=<name>`` on GET
+    requests, narrowing both the output and the columns loaded.
+
+    Subclasses may declare ``views = {'compact': [...]}`` as preset field
+    lists and ``field_sources`` for fields that read model fields other than
+    their own name, e.g. ``{'category_name': ('category__name',)}``. Unknown
+    names are ignored; when none are left the full representation is used.
+    Views pass their queryset through ``narrow_queryset`` so only the
+    columns behind the requested fields are selected.
+    """
+    views = {}
+    field_sources = {}
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Field names asked for by ``request``, or None for all of them"""
+        if request is None or request.method != 'GET':
+            return None
+        return cls.requested_fields_from_params(request.query_params)
+
+    @classmethod
+    def requested_fields_from_params(cls, params):
+        """requested_fields() for a plain query dict"""
+        if params.get('fields'):
+            names = [name.strip() for name in params['fields'].split(',')]
+        elif params.get('view') in cls.views:
+            names = cls.views[params['view']]
+        else:
+            return None
+        names = [name for name in dict.fromkeys(names) if name in cls.Meta.fields]
+        return names or None
+
+    @classmethod
+    def narrow_queryset(cls, queryset, fields, keep=()):
+        """
+        Load only what ``fields`` needs, plus ``keep`` (e.g. the fields a
+        cursor is built from). Relations are joined only when a requested
+        field reads through them.
+        """
+        if not fields:
+            return queryset
+        columns = {'pk', *keep}
+        for name in fields:
+            if name not in getattr(cls, 'annotations', {}):
+                columns.update(cls.field_sources.get(name, (name,)))
+        related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def _fast_decimal(field):
+    """DecimalField.to_representation with its context and quantum built once"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def represent(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+    return represent
+
+
+def _fast_datetime(field):
+    """
+    DateTimeField.to_representation as a factory called once per response:
+    the active timezone is looked up there instead of for every value
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return None
+
+    def bind():
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if zone is None:
+            return field.to_representation
+
+        def represent(value):
+            if isinstance(value, str) or timezone.is_naive(value):
+                return field.to_representation(value)
+            value = value.astimezone(zone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return represent
+    return bind
+
+
+class ValuesRepresentationMixin:
+    """
+    Read-only fast path for list endpoints: rows come from ``.values()``
+    and are turned into the serializer's exact output without building
+    model instances or walking fields one attribute at a time.
+
+    The row layout is compiled from the serializer's own declared fields,
+    so the JSON stays byte-identical to ``Serializer(many=True).data``. A
+    field whose source is not a column (a model property) must be listed in
+    ``computed_fields`` as ``{'name': (columns it reads, function(row))}``.
+    """
+    computed_fields = {}
+    # Field types whose to_representation is the identity for values() data
+    _plain_fields = (
+        serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    @classmethod
+    def _values_plan(cls, fields):
+        cache = cls.__dict__.get('_values_plan_cache')
+        if cache is None:
+            cache = {}
+            setattr(cls, '_values_plan_cache', cache)
+        key = tuple(fields) if fields else None
+        if key not in cache:
+            plan = []
+            for name, field in cls().fields.items():
+                if fields and name not in fields:
+                    continue
+                if name in cls.computed_fields:
+                    columns, compute = cls.computed_fields[name]
+                    plan.append((name, columns, compute, None, None))
+                    continue
+                column = field.source.replace('.', '__')
+                convert = bind = None
+                if isinstance(field, serializers.DecimalField):
+                    convert = _fast_decimal(field)
+                elif isinstance(field, serializers.DateTimeField):
+                    bind = _fast_datetime(field)
+                if not (convert or bind or isinstance(field, cls._plain_fields)):
+                    convert = field.to_representation
+                plan.append((name, (column,), None, convert, bind))
+            cache[key] = plan
+        return cache[key]
+
+    @classmethod
+    def values_queryset(cls, queryset, fields=None, keep=()):
+        """``queryset.values()`` with the columns the (requested) fields read, plus ``keep``"""
+        columns = dict.fromkeys(keep)
+        for _, needed, _, _, _ in cls._values_plan(fields):
+            columns.update(dict.fromkeys(needed))
+        return queryset.values(*columns)
+
+    @classmethod
+    def represent_values(cls, rows, fields=None):
+        """Serializer output for rows from values_queryset()"""
+        with serializing():
+            plan = [
+                (name, columns, compute, bind() if bind else convert)
+                for name, columns, compute, convert, bind in cls._values_plan(fields)
+            ]
+            data = []
+            for row in rows:
+                item = {}
+                for name, columns, compute, convert in plan:
+                    if compute is not None:
+                        item[name] = compute(row)
+                        continue
+                    value = row[columns[0]]
+                    item[name] = value if value is None or convert is None else convert(value)
+                data.append(item)
+        return data
@@ -47,9 +47,13 @@ INSTALLED_APPS = [
     'corsheaders',
     'inventory',
     'orders',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.ServerTimingMiddleware',
+    'backend.querylog.SlowQueryLogMiddleware',
+    'backend.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,6 +112,61 @@ else:
         }
     }
 
+# Read replicas: comma-separated database URLs, added as replica1, replica2...
+# Safe-method requests read from them (see backend.db_router); a client
+# that has just written reads from the primary for REPLICA_PIN_SECONDS
+REPLICA_DATABASE_URLS = [url for url in config('REPLICA_DATABASE_URLS', default='').split(',') if url]
+DATABASE_REPLICAS = [f'replica{i}' for i in range(1, len(REPLICA_DATABASE_URLS) + 1)]
+DATABASES.update(
+    (alias, dj_database_url.parse(url)) for alias, url in zip(DATABASE_REPLICAS, REPLICA_DATABASE_URLS)
+)
+DATABASE_ROUTERS = ['backend.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='inventory-manager'),
+    }
+}
+
+# Seconds a cached dashboard summary may be served; writes invalidate sooner
+SUMMARY_CACHE_TIMEOUT = config('SUMMARY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Summaries are only cached in a cache every worker shares (Redis,
+# Memcached, the database cache). Allow the per-process LocMemCache only
+# when one process serves every request, as the development server does.
+# The default follows DEBUG as set here, so settings modules that turn
+# DEBUG off set this again
+SUMMARY_CACHE_PER_PROCESS = config('SUMMARY_CACHE_PER_PROCESS', default=DEBUG, cast=bool)
+
+# Async summary views (api/analytics/) run their independent queries at once,
+# each on its own connection; set False to run them in sequence
+SUMMARY_CONCURRENT_QUERIES = config('SUMMARY_CONCURRENT_QUERIES', default=True, cast=bool)
+# Worker threads (and so at most this many extra connections) per process
+SUMMARY_QUERY_THREADS = config('SUMMARY_QUERY_THREADS', default=16, cast=int)
+
+# Fraction of requests timed for Server-Timing and /metrics (0 turns it off);
+# /metrics wants "Authorization: Bearer <METRICS_TOKEN>" and is refused
+# without a token unless DEBUG is on
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Queries slower than SLOW_QUERY_MS (empty turns the log off) are logged to
+# the backend.slow_queries logger and, when SLOW_QUERY_LOG names a file,
+# appended to it as JSON lines; summarize them with "manage.py slow_queries"
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default='200', cast=lambda value: float(value) if value else None)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default='')
+# Capture the EXPLAIN plan of each slow query shape once per process
+SLOW_QUERY_EXPLAIN = config('SLOW_QUERY_EXPLAIN', default=True, cast=bool)
+
+# Product search strategy: 'auto' picks pg_trgm on PostgreSQL, FULLTEXT on
+# MySQL and indexed prefix matching elsewhere (see inventory.search)
+PRODUCT_SEARCH_BACKEND = config('PRODUCT_SEARCH_BACKEND', default='auto')
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -19,6 +19,12 @@ DATABASES = {
         conn_health_checks=True,
     )
 }
+DATABASES.update(
+    (alias, dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True))
+    for alias, url in zip(DATABASE_REPLICAS, REPLICA_DATABASE_URLS)
+)
+
+SUMMARY_CACHE_PER_PROCESS = config('SUMMARY_CACHE_PER_PROCESS', default=False, cast=bool)
 
 # Static files configuration
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -12,6 +12,9 @@ ALLOWED_HOSTS = [
 
 # Add WhiteNoise to middleware for static files
 MIDDLEWARE = [
+    'backend.metrics.ServerTimingMiddleware',
+    'backend.querylog.SlowQueryLogMiddleware',
+    'backend.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise
@@ -31,6 +34,15 @@ DATABASES = {
         conn_health_checks=True,
     )
 }
+DATABASES.update(
+    (alias, dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True))
+    for alias, url in zip(DATABASE_REPLICAS, REPLICA_DATABASE_URLS)
+)
+
+SUMMARY_CACHE_PER_PROCESS = config('SUMMARY_CACHE_PER_PROCESS', default=False, cast=bool)
+
+# Supabase PostgreSQL has pg_trgm; migration 0006 adds the trigram indexes
+PRODUCT_SEARCH_BACKEND = 'trigram'
 
 # Static files for Vercel - simplified approach
 STATIC_URL = '/static/'
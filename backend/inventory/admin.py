@@ -1,17 +1,31 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, Product, StockMovement
+
+
+class StockCascadeMixin:
+    """
+    Deleting products (or their category) deletes their stock movements
+    too. StockMovementAdmin refuses every delete of its own, which would
+    otherwise make the admin refuse these cascades as well.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        perms_needed.discard(StockMovement._meta.verbose_name)
+        return deleted, model_count, perms_needed, protected
+
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(StockCascadeMixin, admin.ModelAdmin):
     list_display = ['name', 'description', 'created_at']
     search_fields = ['name']
     ordering = ['name']
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(StockCascadeMixin, admin.ModelAdmin):
     list_display = [
         'name', 'category', 'cost_price', 'selling_price', 
-        'quantity', 'is_low_stock', 'profit_per_unit'
+        'quantity', 'available_quantity', 'is_low_stock', 'profit_per_unit', 'profit_margin'
     ]
     list_filter = ['category', 'created_at']
     search_fields = ['name', 'sku']
@@ -22,3 +36,23 @@ class ProductAdmin(admin.ModelAdmin):
         return obj.is_low_stock
     is_low_stock.boolean = True
     is_low_stock.short_description = 'Low Stock'
+    is_low_stock.admin_order_field = 'available_quantity'
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """The ledger is append-only: browse it, never edit it"""
+    list_display = ['created_at', 'product', 'kind', 'quantity', 'sold', 'note']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__name', 'product__sku']
+    list_select_related = ['product__category']
+    ordering = ['-id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Never on their own; see StockCascadeMixin for deleted products
+        return False
@@ -0,0 +1,250 @@
+import codecs
+import csv
+import json
+import time
+from collections import defaultdict
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+from backend.cache import bump_data_version
+from .ledger import reconcile
+from .models import Category, Product
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_FIELDS = (
+    'name', 'cost_price', 'selling_price', 'quantity', 'sold_quantity',
+    'low_stock_threshold', 'description', 'sku'
+)
+REQUIRED_FIELDS = ('name', 'category', 'cost_price')
+# Per-row errors kept in the report; the count covers the rest
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(Exception):
+    """The upload cannot be read as the requested format at all"""
+
+
+def import_format(filename, default=None):
+    """Import format implied by a file name's extension"""
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    return {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension, default)
+
+
+def read_rows(lines, format):
+    """
+    Yield ``(line_number, row dict)`` from ``lines``, an iterable of encoded
+    lines (an open binary file, an upload or the request body) holding CSV
+    with a header row or NDJSON. Nothing is read ahead of the current row.
+    A line that is not a JSON object is yielded as ``None`` so it can be
+    reported.
+    """
+    if format not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Unsupported format '{format}', expected one of {', '.join(IMPORT_FORMATS)}")
+    text = codecs.iterdecode(lines, 'utf-8-sig')
+    try:
+        if format == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    except UnicodeDecodeError:
+        raise ImportFormatError('File is not valid UTF-8')
+    except csv.Error as e:
+        raise ImportFormatError(f'Malformed CSV: {e}')
+
+
+class ProductImporter:
+    """
+    Upsert products from parsed rows in fixed-size chunks.
+
+    Rows are validated with the model fields' own clean(), categories are
+    resolved by name from a map loaded once, and each chunk is written with
+    ``bulk_create(update_conflicts=True)``: rows with a ``sku`` upsert on
+    ``sku``, the rest on ``(name, category)``. Only the columns a row
+    carries are updated on existing products, so a catalogue without
+    stock columns leaves stock alone.
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, create_categories=False):
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.fields = {name: Product._meta.get_field(name) for name in IMPORT_FIELDS}
+        self.rows = self.created = self.updated = self.error_count = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def run(self, rows, progress=None):
+        """Import every row and return the report; ``progress`` is called after each chunk"""
+        began = time.perf_counter()
+        chunk = []
+        for line_number, row in rows:
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+                if progress:
+                    progress(self)
+        if chunk:
+            self.import_chunk(chunk)
+            if progress:
+                progress(self)
+        self.seconds = time.perf_counter() - began
+        if self.created or self.updated:
+            bump_data_version()
+        return self.report()
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows / self.seconds) if self.seconds else None,
+        }
+
+    def add_error(self, line_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def clean_row(self, row):
+        """Model-ready values for ``row`` and the columns it set, or raise ValidationError"""
+        # CSV has no null, so an empty cell means "not given"
+        row = {key: value for key, value in row.items()
+               if key and value is not None and value != ''}
+        errors = {}
+        for name in REQUIRED_FIELDS:
+            if name not in row:
+                errors[name] = ['This field is required.']
+
+        values = {}
+        for name, field in self.fields.items():
+            if name in row:
+                value = row[name].strip() if isinstance(row[name], str) else row[name]
+                try:
+                    values[name] = field.clean(value, None)
+                except ValidationError as e:
+                    errors[name] = e.messages
+
+        category = row.get('category')
+        if category is not None:
+            category = str(category).strip()
+            if category not in self.categories:
+                if self.create_categories and category:
+                    self.categories[category] = Category.objects.get_or_create(name=category)[0].id
+                else:
+                    errors['category'] = [f"Unknown category '{category}'."]
+            if category in self.categories:
+                values['category_id'] = self.categories[category]
+
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def import_chunk(self, chunk):
+        # Group by conflict target and the set of columns given, so each
+        # bulk_create updates exactly the columns its rows carry
+        groups = defaultdict(dict)
+        for line_number, row in chunk:
+            self.rows += 1
+            if row is None:
+                self.add_error(line_number, {'non_field_errors': ['Expected a JSON object.']})
+                continue
+            try:
+                values = self.clean_row(row)
+            except ValidationError as e:
+                self.add_error(line_number, e.message_dict)
+                continue
+            key = (values['sku'],) if values.get('sku') else (values['name'], values['category_id'])
+            target = ('sku',) if values.get('sku') else ('name', 'category')
+            rows = groups[(target, frozenset(values))]
+            if key in rows:
+                # Later lines win; reporting the earlier one keeps the count honest
+                self.add_error(rows[key][0], {'non_field_errors': [f'Superseded by line {line_number}.']})
+            rows[key] = (line_number, values)
+
+        for (target, columns), rows in groups.items():
+            self.write(target, columns, list(rows.values()))
+
+    def write(self, target, columns, rows):
+        field_names = ['category' if column == 'category_id' else column for column in sorted(columns)]
+        update_fields = [name for name in field_names if name not in target] + ['updated_at']
+        existing = self.existing_ids(target, [values for _, values in rows])
+        now = timezone.now()
+        upsert_on_target = connections[router.db_for_write(Product)].features.supports_update_conflicts_with_target
+
+        def upsert(batch):
+            with transaction.atomic():
+                if upsert_on_target:
+                    Product.objects.bulk_create(
+                        [Product(**values, updated_at=now) for values in batch],
+                        update_conflicts=True, unique_fields=list(target), update_fields=update_fields
+                    )
+                    return
+                # MySQL's ON DUPLICATE KEY UPDATE cannot be aimed at one
+                # unique key, so insert the new rows and update the known ones
+                Product.objects.bulk_create([
+                    Product(**values, updated_at=now) for values in batch
+                    if self.key(target, values) not in existing
+                ])
+                Product.objects.bulk_update([
+                    Product(pk=existing[self.key(target, values)], **values, updated_at=now) for values in batch
+                    if self.key(target, values) in existing
+                ], update_fields)
+
+        try:
+            upsert([values for _, values in rows])
+            written = rows
+        except IntegrityError:
+            # Another unique constraint (e.g. a sku row colliding on name and
+            # category) failed the batch, or a concurrent import created one
+            # of the rows; retry row by row to find the culprits
+            existing = self.existing_ids(target, [values for _, values in rows])
+            written = []
+            for line_number, values in rows:
+                try:
+                    upsert([values])
+                    written.append((line_number, values))
+                except IntegrityError as e:
+                    self.add_error(line_number, {'non_field_errors': [f'Conflicts with an existing product: {e}']})
+
+        if written and {'quantity', 'sold_quantity'} & columns:
+            # bulk_create sends no post_save; record the stock it set here
+            reconcile(self.matching(target, [values for _, values in written]), note='Product import')
+
+        for _, values in written:
+            if self.key(target, values) in existing:
+                self.updated += 1
+            else:
+                self.created += 1
+
+    @staticmethod
+    def key(target, values):
+        return (values['sku'],) if target == ('sku',) else (values['name'], values['category_id'])
+
+    @staticmethod
+    def matching(target, rows):
+        """Products with the rows' keys (by name and category: a superset of them)"""
+        if target == ('sku',):
+            return Product.objects.filter(sku__in=[values['sku'] for values in rows])
+        return Product.objects.filter(
+            name__in={values['name'] for values in rows},
+            category_id__in={values['category_id'] for values in rows}
+        )
+
+    def existing_ids(self, target, rows):
+        """``{key: product id}`` for the rows' keys that already exist"""
+        fields = ('sku',) if target == ('sku',) else ('name', 'category_id')
+        return {tuple(key): pk for pk, *key in self.matching(target, rows).values_list('pk', *fields)}
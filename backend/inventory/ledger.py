@@ -0,0 +1,153 @@
+"""
+Stock movement ledger.
+
+Changes to a product's stock are appended as StockMovements: restocks
+and adjustments by apply_stock_updates(), and edits of the product row
+itself (admin, API, imports) by reconcile(). A product's ledger balance
+is its StockSnapshot plus the movements since; compact() folds old
+movements into the snapshots so the ledger stays short.
+
+The Product row remains the balance that is read (in O(1)) and the one
+that guards against overselling. Checkouts only write that row, with
+reserve_stock()'s guarded UPDATE, and add nothing to the ledger, so a
+bestseller's row lock is held no longer than without one. A sale moves
+stock from ``quantity`` to ``sold_quantity`` and leaves their sum alone,
+so sales since the ledger was last brought up to date show as a pure
+change of ``sold_quantity``; record_sales() appends them per product in
+aggregate (the compaction job does so on every run). The individual
+sales are the order lines. drift(), behind check_stock_ledger, reports
+the products whose row disagrees with the ledger beyond such sales.
+"""
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Product, StockMovement, StockSnapshot
+
+
+def movements(kind, quantities, sold=(), note=''):
+    """
+    Unsaved movements, one per product: ``quantities`` and ``sold`` map
+    product ids to the signed change of Product.quantity and
+    Product.sold_quantity. Products that did not change are skipped.
+    """
+    sold = dict(sold)
+    return [
+        StockMovement(product_id=product_id, kind=kind, quantity=quantities.get(product_id, 0),
+                      sold=sold.get(product_id, 0), note=note)
+        for product_id in dict.fromkeys([*quantities, *sold])
+        if quantities.get(product_id, 0) or sold.get(product_id, 0)
+    ]
+
+
+def record_movements(kind, quantities, sold=(), note=''):
+    """Append movements() to the ledger with one INSERT"""
+    return StockMovement.objects.bulk_create(movements(kind, quantities, sold, note))
+
+
+def ledger_balances(products=None):
+    """``products`` (default all) annotated with ``ledger_quantity`` and ``ledger_sold``"""
+    if products is None:
+        products = Product.objects.all()
+    per_product = StockMovement.objects.filter(product=OuterRef('pk')).order_by().values('product')
+
+    def since_snapshot(field):
+        return Coalesce(
+            Subquery(per_product.annotate(total=Sum(field)).values('total'), output_field=IntegerField()),
+            Value(0)
+        )
+
+    return products.annotate(
+        ledger_quantity=Coalesce('stock_snapshot__quantity', Value(0)) + since_snapshot('quantity'),
+        ledger_sold=Coalesce('stock_snapshot__sold', Value(0)) + since_snapshot('sold'),
+    )
+
+
+def _differences(products):
+    """ledger_balances() of the products whose row and ledger differ"""
+    return ledger_balances(products).exclude(ledger_quantity=F('quantity'), ledger_sold=F('sold_quantity'))
+
+
+def _rows(products):
+    """``(product id, name, quantity, sold_quantity, ledger quantity, ledger sold)`` tuples"""
+    return list(
+        products.order_by('pk')
+        .values_list('pk', 'name', 'quantity', 'sold_quantity', 'ledger_quantity', 'ledger_sold')
+    )
+
+
+def drift(products=None):
+    """_rows() where row and ledger differ by more than sales the ledger has not recorded yet"""
+    return _rows(
+        _differences(products)
+        .alias(stock=F('quantity') + F('sold_quantity'), ledger_stock=F('ledger_quantity') + F('ledger_sold'))
+        .exclude(stock=F('ledger_stock'))
+    )
+
+
+def _sales(differences, note='Sales'):
+    """Movements for the change of sold_quantity the ledger has not seen: sales, or voids where it fell"""
+    sold = {pk: sold - ledger_sold for pk, _, _, sold, _, ledger_sold in differences if sold != ledger_sold}
+    sales = {pk: change for pk, change in sold.items() if change > 0}
+    voids = {pk: change for pk, change in sold.items() if change < 0}
+    return [
+        *movements(StockMovement.SALE, {pk: -change for pk, change in sales.items()}, sales, note=note),
+        *movements(StockMovement.VOID, {pk: -change for pk, change in voids.items()}, voids, note=note),
+    ]
+
+
+def record_sales(products=None):
+    """
+    Append the sales (and voids) of ``products`` (default all) since the
+    ledger last saw them, one movement per product. Returns the movements.
+    """
+    return StockMovement.objects.bulk_create(_sales(_rows(_differences(products))))
+
+
+def reconcile(products=None, kind=StockMovement.ADJUSTMENT, note='Product edited'):
+    """
+    Bring the ledger up to date with each product row, for writes that set
+    the row directly: unrecorded sales as by record_sales(), and any other
+    difference as a ``kind`` movement. Returns the movements recorded.
+    """
+    differences = _rows(_differences(products))
+    received = {
+        pk: quantity + sold - ledger_quantity - ledger_sold
+        for pk, _, quantity, sold, ledger_quantity, ledger_sold in differences
+    }
+    return StockMovement.objects.bulk_create([*_sales(differences), *movements(kind, received, note=note)])
+
+
+@transaction.atomic
+def compact(before):
+    """
+    Fold the movements created before ``before`` into the products'
+    snapshots and delete them, in one transaction. Returns the number of
+    movements folded.
+
+    ``before`` should lie well in the past (the command keeps 30 days), so
+    no transaction still writing movements can be older than it.
+    """
+    old = StockMovement.objects.filter(created_at__lt=before)
+    totals = {
+        row['product']: row
+        for row in old.values('product').annotate(quantity=Sum('quantity'), sold=Sum('sold')).order_by()
+    }
+    if not totals:
+        return 0
+
+    # Snapshots are locked and rewritten rather than upserted, which MySQL
+    # cannot aim at one unique key
+    snapshots = StockSnapshot.objects.select_for_update().in_bulk(list(totals))
+    new = []
+    for product_id, row in totals.items():
+        snapshot = snapshots.get(product_id)
+        if snapshot is None:
+            new.append(StockSnapshot(product_id=product_id, quantity=row['quantity'], sold=row['sold'], taken_at=before))
+            continue
+        snapshot.quantity += row['quantity']
+        snapshot.sold += row['sold']
+        snapshot.taken_at = max(snapshot.taken_at, before)
+    StockSnapshot.objects.bulk_update(snapshots.values(), ['quantity', 'sold', 'taken_at'])
+    StockSnapshot.objects.bulk_create(new)
+    deleted, _ = old.delete()
+    return deleted
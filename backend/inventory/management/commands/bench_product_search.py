@@ -0,0 +1,68 @@
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from inventory.models import Category, Product
+from inventory.search import search_backend, search_products
+
+WORDS = ['chips', 'cola', 'nuts', 'salted', 'choco', 'mint', 'spicy', 'lemon', 'family', 'pack']
+TERMS = ['c', 'ch', 'chi', 'chips sal', 'lemon', 'SKU-000042', 'zzz']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark product search latency on a throwaway test database at "
+        "growing catalogue sizes. Compares the old unanchored icontains "
+        "filter with ranked search and prefix typeahead (first 20 rows)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help='Comma separated product counts')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per term')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(n) for n in options['sizes'].split(','))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            category = Category.objects.create(name='Bench')
+            self.stdout.write(f"search backend: {search_backend(connection)}")
+            self.stdout.write(f"{'products':>9} {'strategy':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            seeded = 0
+            for size in sizes:
+                self.seed(category, seeded, size)
+                seeded = size
+                for strategy in ('icontains', 'ranked', 'prefix'):
+                    p50, p95, worst = self.time(strategy, options['repeat'])
+                    self.stdout.write(f"{size:>9} {strategy:>10} {p50:>8.2f} {p95:>8.2f} {worst:>8.2f}")
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, category, start, end):
+        for offset in range(start, end, 10000):
+            Product.objects.bulk_create([
+                Product(name=f'{WORDS[i % 10].title()} {WORDS[i // 10 % 10]} {i}', category=category,
+                        cost_price=Decimal('1.00'), sku=f'SKU-{i:06}')
+                for i in range(offset, min(offset + 10000, end))
+            ])
+
+    def query(self, strategy, term):
+        products = Product.objects.all()
+        if strategy == 'icontains':
+            return products.filter(Q(name__icontains=term) | Q(sku__icontains=term))
+        return search_products(products, term, mode=strategy)
+
+    def time(self, strategy, repeat):
+        timings = []
+        for term in TERMS:
+            for _ in range(repeat):
+                began = time.perf_counter()
+                list(self.query(strategy, term)[:20])
+                timings.append((time.perf_counter() - began) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], timings[-1]
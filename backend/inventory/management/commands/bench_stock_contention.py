@@ -0,0 +1,113 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from inventory.ledger import record_movements
+from inventory.models import Category, Product, StockMovement
+from inventory.stock import reserve_stock
+
+
+def row_update(product_id):
+    """The checkout write: the guarded UPDATE alone; sales reach the ledger later, in aggregate"""
+    reserve_stock({product_id: 1})
+
+
+def row_and_ledger(product_id):
+    """The guarded UPDATE plus a ledger INSERT per sale, inside the row lock"""
+    reserve_stock({product_id: 1})
+    record_movements(StockMovement.SALE, {product_id: -1}, {product_id: 1})
+
+
+def ledger_only(product_id):
+    """Append-only: no product row to wait for, but nothing stops overselling"""
+    record_movements(StockMovement.SALE, {product_id: -1}, {product_id: 1})
+
+
+STRATEGIES = {'row': row_update, 'row+ledger': row_and_ledger, 'ledger': ledger_only}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent sales of one bestseller on a throwaway test database: "
+        "the guarded product row UPDATE that checkouts run, the same plus a stock "
+        "ledger INSERT per sale, which checkouts avoid by leaving sales to "
+        "record_sales, and ledger INSERTs alone, which would avoid the row lock but "
+        "cannot stop overselling. --work-ms keeps each "
+        "transaction open a little longer, standing in for the rest of a checkout "
+        "while the row lock is held. SQLite locks the whole database for every "
+        "write, so run against PostgreSQL or MySQL to see row-lock contention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent tills')
+        parser.add_argument('--sales', type=int, default=100, help='Sales per till per strategy')
+        parser.add_argument('--work-ms', type=float, default=1.0, help='Time each transaction stays open')
+        parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                            help=f"Comma separated, from {', '.join(STRATEGIES)}")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        database = connection.settings_dict
+        scratch = None
+        if connection.vendor == 'sqlite':
+            # Threads need a file to share, and writers must queue for the
+            # lock at BEGIN rather than fail to upgrade it mid-transaction
+            scratch = tempfile.mkdtemp()
+            database['TEST']['NAME'] = os.path.join(scratch, 'bench.sqlite3')
+            database['OPTIONS'] = {**database['OPTIONS'], 'transaction_mode': 'IMMEDIATE', 'timeout': 60}
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            category = Category.objects.create(name='Bench')
+            product = Product.objects.create(
+                name='Bestseller', category=category, cost_price=Decimal('4.00'), selling_price=Decimal('6.50'),
+                quantity=10 ** 9
+            )
+            threads, sales, work = options['threads'], options['sales'], options['work_ms'] / 1000
+            self.stdout.write(f"{threads} tills x {sales} sales of one product, {options['work_ms']} ms of work each")
+            self.stdout.write(f"{'strategy':>12} {'sales/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for name in options['strategies'].split(','):
+                self.stdout.write(self.run(STRATEGIES[name], name, product.pk, threads, sales, work))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            if scratch:
+                shutil.rmtree(scratch)
+
+    def run(self, strategy, name, product_id, threads, sales, work):
+        latencies = []
+        lock = threading.Lock()
+        start = threading.Barrier(threads + 1)
+
+        def till():
+            own = []
+            start.wait()
+            try:
+                for _ in range(sales):
+                    began = time.perf_counter()
+                    with transaction.atomic():
+                        strategy(product_id)
+                        time.sleep(work)
+                    own.append((time.perf_counter() - began) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(own)
+
+        workers = [threading.Thread(target=till) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        began = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+
+        latencies.sort()
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        return f"{name:>12} {len(latencies) / elapsed:>9.0f} {statistics.median(latencies):>8.2f} {p99:>8.2f}"
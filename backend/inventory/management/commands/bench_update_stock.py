@@ -0,0 +1,58 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+from inventory.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the bulk update-stock endpoint on a throwaway test database. "
+        "Reports rows/sec and query count per batch size; the query count "
+        "should grow with batch_size chunks, not with rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-sizes', default='100,1000,5000,20000',
+                            help='Comma separated numbers of rows per request')
+        parser.add_argument('--mode', choices=['quantity', 'delta'], default='quantity',
+                            help='Send absolute quantities or relative deltas')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(n) for n in options['batch_sizes'].split(','))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            product_ids = self.seed(sizes[-1])
+            self.stdout.write(f"{'rows':>8} {'queries':>8} {'seconds':>9} {'rows/s':>10}")
+            for size in sizes:
+                self.stdout.write(self.run(product_ids[:size], options['mode']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, count):
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create([
+            Product(name=f'Bench product {i}', category=category, cost_price=Decimal('4.00'), quantity=100)
+            for i in range(count)
+        ], batch_size=1000)
+        return list(Product.objects.order_by('pk').values_list('pk', flat=True))
+
+    def run(self, product_ids, mode):
+        updates = [{'product_id': pk, mode: 1 + n % 7} for n, pk in enumerate(product_ids)]
+        client = APIClient()
+
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            response = client.post(reverse('inventory:update-stock'), {'updates': updates}, format='json')
+            elapsed = time.perf_counter() - began
+        assert response.status_code == 200, response.content
+
+        rows = len(product_ids)
+        return f"{rows:>8} {len(queries):>8} {elapsed:>9.3f} {rows / elapsed:>10.0f}"
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from inventory.ledger import drift, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Report products whose stock disagrees with the stock ledger (snapshot plus movements) "
+        "by more than the sales it has not recorded yet"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Record the differences, and pending sales, taking the product rows as correct')
+
+    def handle(self, *args, **options):
+        differences = drift()
+        if not differences:
+            self.stdout.write(self.style.SUCCESS('Every product matches the stock ledger'))
+            return
+
+        self.stdout.write(f"{'product':>8}  {'stock':>14}  {'ledger':>14}  name")
+        for pk, name, quantity, sold, ledger_quantity, ledger_sold in differences:
+            self.stdout.write(f"{pk:>8}  {quantity:>6} / {sold:<6}  {ledger_quantity:>6} / {ledger_sold:<6}  {name}")
+
+        if options['fix']:
+            recorded = reconcile(note='Ledger check')
+            self.stdout.write(self.style.SUCCESS(f'Recorded {len(recorded)} movements'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(differences)} products differ; --fix records adjustments'))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.ledger import compact, record_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Record the sales since the last run in the stock ledger, then fold movements "
+        "older than --days into the per-product snapshots and delete them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Movements to keep, in days (default: 30)')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1, so no movement still being written is folded')
+
+        recorded = record_sales()
+        before = timezone.now() - timedelta(days=options['days'])
+        folded = compact(before)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded sales of {len(recorded)} products; "
+            f"folded {folded} movements from before {before:%Y-%m-%d %H:%M} into snapshots"
+        ))
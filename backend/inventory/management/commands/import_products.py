@@ -0,0 +1,49 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from inventory.importer import (
+    IMPORT_CHUNK_SIZE, IMPORT_FORMATS, ImportFormatError, ProductImporter, import_format, read_rows
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert products from a CSV (with a header row) or NDJSON file. Rows "
+        "with a sku match on sku, the rest on name and category."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='Defaults to the file extension (.csv, .ndjson or .jsonl)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Create categories that do not exist yet instead of rejecting the row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or import_format(path)
+        if not format:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        importer = ProductImporter(chunk_size=options['chunk_size'], create_categories=options['create_categories'])
+        source = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = importer.run(read_rows(source, format), progress=self.progress)
+        except ImportFormatError as e:
+            raise CommandError(f"{e} (after {importer.rows} rows)")
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f"... and {report['error_count'] - len(report['errors'])} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['rows']} rows in {report['seconds']:.2f}s ({report['rows_per_second'] or 0} rows/s): "
+            f"{report['created']} created, {report['updated']} updated, {report['error_count']} errors"
+        ))
+
+    def progress(self, importer):
+        self.stdout.write(f"{importer.rows} rows: {importer.created} created, {importer.updated} updated, "
+                          f"{importer.error_count} errors")
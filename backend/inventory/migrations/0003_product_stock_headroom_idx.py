@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:42
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_product_sold_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('sold_quantity')), '-', models.F('low_stock_threshold')), name='product_stock_headroom_idx'),
+        ),
+    ]
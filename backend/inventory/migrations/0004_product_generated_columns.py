@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:44
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_product_stock_headroom_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='available_quantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Greatest(django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('sold_quantity')), models.Value(0)), help_text='Total minus sold, never below zero', output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='profit_margin',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(selling_price__gt=0, then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('selling_price'), '-', models.F('cost_price')), models.FloatField()), '*', models.Value(100.0)), '/', django.db.models.functions.comparison.Cast('selling_price', models.FloatField()))), default=models.Value(0.0), output_field=models.DecimalField(decimal_places=2, max_digits=12)), help_text='Profit as a percentage of the selling price', output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='profit_per_unit',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(selling_price__isnull=False, then=django.db.models.expressions.CombinedExpression(models.F('selling_price'), '-', models.F('cost_price'))), default=models.Value(Decimal('0.00'))), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_sold_value',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(selling_price__isnull=False, then=django.db.models.expressions.CombinedExpression(models.F('selling_price'), '*', models.F('sold_quantity'))), default=models.Value(Decimal('0.00'))), help_text='Selling price * sold quantity', output_field=models.DecimalField(decimal_places=2, max_digits=15)),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('cost_price'), '*', django.db.models.functions.comparison.Greatest(django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('sold_quantity')), models.Value(0))), help_text='Cost price * available quantity', output_field=models.DecimalField(decimal_places=2, max_digits=15)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['profit_margin'], name='product_profit_margin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['total_value'], name='product_total_value_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:59
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def add_vendor_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute('CREATE INDEX product_name_trgm_idx ON inventory_product USING gin (name gin_trgm_ops)')
+        schema_editor.execute('CREATE INDEX product_sku_trgm_idx ON inventory_product USING gin (sku gin_trgm_ops)')
+    elif vendor == 'mysql':
+        schema_editor.execute('CREATE FULLTEXT INDEX product_name_sku_ft ON inventory_product (name, sku)')
+
+
+def drop_vendor_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS product_sku_trgm_idx')
+    elif vendor == 'mysql':
+        schema_editor.execute('DROP INDEX product_name_sku_ft ON inventory_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_product_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='product_name_lower_idx'),
+        ),
+        migrations.RunPython(add_vendor_search_indexes, drop_vendor_search_indexes),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def snapshot_current_stock(apps, schema_editor):
+    """The stock on hand when the ledger starts is every product's opening balance"""
+    Product = apps.get_model('inventory', 'Product')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=pk, quantity=quantity, sold=sold, taken_at=now)
+        for pk, quantity, sold in Product.objects.values_list('pk', 'quantity', 'sold_quantity').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(snapshot_current_stock, migrations.RunPython.noop),
+    ]
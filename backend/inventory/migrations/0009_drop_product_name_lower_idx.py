@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_opening_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_lower_idx',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:01
+
+import django.db.models.expressions
+import inventory.models
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_drop_product_name_lower_idx'),
+    ]
+
+    # A generated column cannot be altered, only dropped and added again
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_profit_margin_idx',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='profit_margin',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='profit_margin',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(selling_price__gt=0, then=inventory.models.DecimalDivide(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('selling_price'), '-', models.F('cost_price')), '*', models.Value(100)), models.F('selling_price'), output_field=models.DecimalField(decimal_places=2, max_digits=12))), default=models.Value(Decimal('0.00')), output_field=models.DecimalField(decimal_places=2, max_digits=12)), help_text='Profit as a percentage of the selling price', output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['profit_margin'], name='product_profit_margin_idx'),
+        ),
+    ]
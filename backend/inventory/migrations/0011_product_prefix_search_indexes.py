@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def add_prefix_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # istartswith compiles to UPPER(column::text) LIKE UPPER(%s)
+        schema_editor.execute(
+            'CREATE INDEX product_name_prefix_idx ON inventory_product (UPPER(name) varchar_pattern_ops)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX product_sku_prefix_idx ON inventory_product (UPPER(sku) varchar_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        # LIKE is case-insensitive and only uses an index in the NOCASE collation
+        schema_editor.execute('CREATE INDEX product_name_prefix_idx ON inventory_product (name COLLATE NOCASE)')
+        schema_editor.execute('CREATE INDEX product_sku_prefix_idx ON inventory_product (sku COLLATE NOCASE)')
+    # MySQL's case-insensitive collation serves LIKE from the plain name and sku indexes
+
+
+def drop_prefix_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute('DROP INDEX IF EXISTS product_name_prefix_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS product_sku_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_exact_profit_margin'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_search_indexes, drop_prefix_search_indexes),
+    ]
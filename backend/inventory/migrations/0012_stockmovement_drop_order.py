@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_product_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='stockmovement',
+            name='order',
+        ),
+    ]
@@ -1,7 +1,52 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import Case, DecimalField, F, Func, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import LessThanOrEqual
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+# Generated column expressions. Postgres does not allow a generated column to
+# reference another one, so AVAILABLE_QUANTITY is repeated inside TOTAL_VALUE.
+AVAILABLE_QUANTITY = Greatest(F('quantity') - F('sold_quantity'), Value(0))
+PROFIT_PER_UNIT = Case(
+    When(selling_price__isnull=False, then=F('selling_price') - F('cost_price')),
+    default=Value(Decimal('0.00'))
+)
+
+
+class DecimalDivide(Func):
+    """
+    ``dividend / divisor`` in exact decimal arithmetic. SQLite has none and
+    stores whole-valued decimals as integers, which would truncate the
+    quotient, so there alone the division is done in floating point.
+    """
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        dividend, divisor = (compiler.compile(expression) for expression in self.get_source_expressions())
+        return f'(CAST({dividend[0]} AS REAL) / {divisor[0]})', (*dividend[1], *divisor[1])
+
+
+# The column rounds the quotient to 2 places
+PROFIT_MARGIN = Case(
+    When(selling_price__gt=0, then=DecimalDivide(
+        (F('selling_price') - F('cost_price')) * Value(100), F('selling_price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )),
+    default=Value(Decimal('0.00')),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+TOTAL_VALUE = F('cost_price') * AVAILABLE_QUANTITY
+TOTAL_SOLD_VALUE = Case(
+    When(selling_price__isnull=False, then=F('selling_price') * F('sold_quantity')),
+    default=Value(Decimal('0.00'))
+)
+
+# Low stock predicate, kept in step with Product.is_low_stock
+STOCK_HEADROOM = F('quantity') - F('sold_quantity') - F('low_stock_threshold')
+LOW_STOCK = Q(LessThanOrEqual(STOCK_HEADROOM, 0), low_stock_threshold__gte=0)
+
 class Category(models.Model):
     """Product categories like 'Snacks', 'Beverages', etc."""
     name = models.CharField(max_length=100, unique=True)
@@ -16,6 +61,11 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def low_stock(self):
+        """Products whose available quantity is at or below their threshold (see is_low_stock)"""
+        return self.filter(LOW_STOCK)
+
 class Product(models.Model):
     """Individual products in the inventory"""
     name = models.CharField(max_length=200)
@@ -47,45 +97,112 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Computed by the database on every write, so they can be sorted,
+    # filtered and aggregated without loading rows into Python
+    available_quantity = models.GeneratedField(
+        expression=AVAILABLE_QUANTITY,
+        output_field=models.IntegerField(),
+        db_persist=True,
+        help_text="Total minus sold, never below zero"
+    )
+    profit_per_unit = models.GeneratedField(
+        expression=PROFIT_PER_UNIT,
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True
+    )
+    profit_margin = models.GeneratedField(
+        expression=PROFIT_MARGIN,
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+        help_text="Profit as a percentage of the selling price"
+    )
+    total_value = models.GeneratedField(
+        expression=TOTAL_VALUE,
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        db_persist=True,
+        help_text="Cost price * available quantity"
+    )
+    total_sold_value = models.GeneratedField(
+        expression=TOTAL_SOLD_VALUE,
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        db_persist=True,
+        help_text="Selling price * sold quantity"
+    )
+
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         unique_together = ['name', 'category']
+        indexes = [
+            # Serves ProductQuerySet.low_stock(); must match STOCK_HEADROOM
+            models.Index(STOCK_HEADROOM, name='product_stock_headroom_idx'),
+            models.Index(fields=['profit_margin'], name='product_profit_margin_idx'),
+            models.Index(fields=['total_value'], name='product_total_value_idx'),
+            # Keyset pagination order for the product list
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category.name})"
 
-    @property
-    def available_quantity(self):
-        """Calculate available quantity (total - sold)"""
-        return max(0, self.quantity - self.sold_quantity)
-
-    @property
-    def profit_per_unit(self):
-        """Calculate profit per unit"""
-        if self.selling_price:
-            return self.selling_price - self.cost_price
-        return Decimal('0.00')
-
-    @property
-    def profit_margin(self):
-        """Calculate profit margin percentage"""
-        if self.selling_price and self.selling_price > 0:
-            return ((self.selling_price - self.cost_price) / self.selling_price) * 100
-        return Decimal('0.00')
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # The database recomputed the generated columns; an INSERT returns
+        # them where the backend supports RETURNING, an UPDATE never does
+        if not adding or not connections[self._state.db].features.can_return_columns_from_insert:
+            self.refresh_from_db(fields=[field.name for field in self._meta.concrete_fields if field.generated])
 
     @property
     def is_low_stock(self):
         """Check if available quantity is below low stock threshold"""
         return self.available_quantity <= self.low_stock_threshold
 
-    @property
-    def total_value(self):
-        """Calculate total inventory value (cost price * available quantity)"""
-        return self.cost_price * self.available_quantity
 
-    @property
-    def total_sold_value(self):
-        """Calculate total value of sold items (selling price * sold quantity)"""
-        if self.selling_price:
-            return self.selling_price * self.sold_quantity
-        return Decimal('0.00')
+class StockMovement(models.Model):
+    """
+    One change to a product's stock, appended and never edited. Balances
+    are the product's StockSnapshot plus the movements since; see
+    inventory.ledger. ``quantity`` and ``sold`` are the signed changes to
+    Product.quantity and Product.sold_quantity. Sales are recorded per
+    product in aggregate; the order lines are the individual sales.
+    """
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    VOID = 'void'
+    KIND_CHOICES = [
+        (SALE, 'Sale'),
+        (RESTOCK, 'Restock'),
+        (ADJUSTMENT, 'Adjustment'),
+        (VOID, 'Void'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.IntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Compaction folds everything older than a cutoff
+            models.Index(fields=['created_at'], name='stockmovement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.product_id}: {self.quantity:+d} / sold {self.sold:+d}"
+
+
+class StockSnapshot(models.Model):
+    """A product's stock with every movement before ``taken_at`` folded in"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stock_snapshot')
+    quantity = models.IntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    taken_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity} / sold {self.sold}"
@@ -0,0 +1,117 @@
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Case, F, FloatField, Func, IntegerField, Q, Value, When
+
+SEARCH_BACKENDS = ('trigram', 'fulltext', 'prefix')
+SEARCH_MODES = ('ranked', 'prefix')
+# MySQL's default innodb_ft_min_token_size; shorter words are not indexed
+FULLTEXT_MIN_WORD = 3
+
+
+class _Operator(Func):
+    """``lhs <operator> rhs`` as a boolean expression usable in filter()"""
+    output_field = BooleanField()
+    template = '%(expressions)s'
+
+    def __init__(self, lhs, operator, rhs):
+        super().__init__(lhs, rhs)
+        # The SQL is %-formatted once more with the query params
+        self.arg_joiner = f" {operator.replace('%', '%%')} "
+
+
+class _MatchAgainst(Func):
+    """Boolean-mode MATCH ... AGAINST over the FULLTEXT index on (name, sku)"""
+    output_field = FloatField()
+    template = 'MATCH (%(expressions)s) AGAINST (%(query)s IN BOOLEAN MODE)'
+
+    def __init__(self, query):
+        super().__init__(F('name'), F('sku'))
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, query='%s', **extra_context)
+        return sql, (*params, self.query)
+
+
+def search_backend(connection):
+    """Search strategy for ``connection``, unless PRODUCT_SEARCH_BACKEND picks one"""
+    configured = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')
+    if configured in SEARCH_BACKENDS:
+        return configured
+    return {'postgresql': 'trigram', 'mysql': 'fulltext'}.get(connection.vendor, 'prefix')
+
+
+def _like_escape(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix_search(queryset, term):
+    """
+    Name or SKU prefix, case-insensitively; works everywhere. istartswith
+    escapes LIKE wildcards in ``term`` and, unlike a hand-made range,
+    matches whatever the column collation sorts between the prefixes.
+    Migration 0011 adds the indexes its LIKE can use on each backend.
+    """
+    return (
+        queryset.filter(Q(name__istartswith=term) | Q(sku__istartswith=term))
+        .alias(search_rank=Case(
+            When(name__iexact=term, then=Value(0)),
+            When(name__istartswith=term, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField()
+        ))
+        .order_by('search_rank', 'name', 'id')
+    )
+
+
+def _trigram_search(queryset, term):
+    """Substring and fuzzy word matches on the pg_trgm GIN indexes, best word similarity first"""
+    pattern = Value(f'%{_like_escape(term)}%')
+    return (
+        queryset.filter(
+            Q(_Operator(F('name'), 'ILIKE', pattern))
+            | Q(_Operator(F('sku'), 'ILIKE', pattern))
+            | Q(_Operator(Value(term), '<%', F('name')))
+        )
+        .alias(search_rank=Func(Value(term), F('name'), function='word_similarity', output_field=FloatField()))
+        .order_by('-search_rank', 'name', 'id')
+    )
+
+
+def _fulltext_search(queryset, term):
+    """Every word as a prefix against the FULLTEXT index, most relevant first"""
+    words = re.sub(r'[+\-<>()~*"@]+', ' ', term).split()
+    if not words or min(len(word) for word in words) < FULLTEXT_MIN_WORD:
+        # Typeahead's first keystrokes are below the indexed word length
+        return _prefix_search(queryset, term)
+    relevance = _MatchAgainst(' '.join(f'+{word}*' for word in words))
+    return (
+        queryset.alias(search_rank=relevance)
+        .filter(search_rank__gt=0)
+        .order_by('-search_rank', 'name', 'id')
+    )
+
+
+def search_products(queryset, term, mode='ranked'):
+    """
+    Filter ``queryset`` to products matching ``term``, best match first.
+
+    An exact SKU is answered from the unique sku index alone. Otherwise
+    ``mode='ranked'`` uses the backend's search index (see search_backend)
+    and ``mode='prefix'`` is typeahead: name or SKU prefix, on any backend.
+    """
+    term = ' '.join(term.split())
+    if not term:
+        return queryset
+
+    exact = queryset.filter(sku=term)
+    if ' ' not in term and exact.exists():
+        return exact
+
+    backend = 'prefix' if mode == 'prefix' else search_backend(connections[queryset.db])
+    if backend == 'trigram':
+        return _trigram_search(queryset, term)
+    if backend == 'fulltext':
+        return _fulltext_search(queryset, term)
+    return _prefix_search(queryset, term)
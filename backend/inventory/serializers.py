@@ -1,18 +1,22 @@
 from rest_framework import serializers
+from django.db.models import Count
+from backend.serializers import (
+    AnnotatedSerializerMixin, SparseFieldsetMixin, TimedRepresentationMixin, ValuesRepresentationMixin
+)
 from .models import Category, Product
 
-class CategorySerializer(serializers.ModelSerializer):
-    product_count = serializers.SerializerMethodField()
+class CategorySerializer(TimedRepresentationMixin, AnnotatedSerializerMixin, serializers.ModelSerializer):
+    # Unannotated instances (e.g. just created) have no products yet
+    product_count = serializers.IntegerField(read_only=True, default=0)
+    annotations = {'product_count': Count('products')}
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'product_count', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
-    
-    def get_product_count(self, obj):
-        return obj.products.count()
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(TimedRepresentationMixin, SparseFieldsetMixin, ValuesRepresentationMixin,
+                            serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     profit_per_unit = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     profit_margin = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
@@ -29,8 +33,22 @@ class ProductListSerializer(serializers.ModelSerializer):
             'profit_per_unit', 'profit_margin', 'is_low_stock', 'total_value', 'total_sold_value',
             'created_at', 'updated_at'
         ]
+    
+    # What the POS product picker needs
+    views = {'compact': ['id', 'name', 'sku', 'selling_price', 'available_quantity']}
+    field_sources = {
+        'category_name': ('category__name',),
+        'is_low_stock': ('available_quantity', 'low_stock_threshold'),
+    }
+    # Mirrors Product.is_low_stock for the values() read path
+    computed_fields = {
+        'is_low_stock': (
+            ('available_quantity', 'low_stock_threshold'),
+            lambda row: row['available_quantity'] <= row['low_stock_threshold']
+        ),
+    }
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     profit_per_unit = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     profit_margin = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
@@ -44,7 +62,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
 
-class ProductCreateSerializer(serializers.ModelSerializer):
+class ProductCreateSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
@@ -62,7 +80,7 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Cost price must be greater than 0.")
         return value
 
-class ProductUpdateSerializer(serializers.ModelSerializer):
+class ProductUpdateSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
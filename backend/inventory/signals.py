@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .ledger import reconcile
+from .models import Product, StockMovement
+
+STOCK_FIELDS = {'quantity', 'sold_quantity'}
+
+
+@receiver(post_save, sender=Product)
+def record_stock_edit(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Stock set on the row itself (admin, API, fixtures) enters the ledger
+    # as the difference from the ledger balance
+    if raw or (update_fields is not None and not STOCK_FIELDS & set(update_fields)):
+        return
+    if created:
+        reconcile(Product.objects.filter(pk=instance.pk), StockMovement.RESTOCK, 'Opening stock')
+    else:
+        reconcile(Product.objects.filter(pk=instance.pk))
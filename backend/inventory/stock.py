@@ -0,0 +1,199 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from backend.cache import invalidate_after_update
+from .ledger import movements
+from .models import Product, StockMovement
+
+# Rows per UPDATE; each row costs up to three query parameters
+STOCK_UPDATE_BATCH_SIZE = 300
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more products cannot cover the requested quantity"""
+
+    def __init__(self, shortages):
+        # shortages maps product id -> (product name, available, requested)
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f"{name}: available {available}, requested {requested}"
+            for name, available, requested in shortages.values()
+        ))
+
+
+class _PartialReservation(Exception):
+    """Internal signal used to roll back a reservation that missed a line"""
+
+
+def per_product(quantities):
+    """CASE expression mapping each product id to its requested quantity"""
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def reserve_stock(quantities, attempts=3):
+    """
+    Atomically take stock for a basket of ``{product_id: quantity}``.
+
+    All products are decremented by one guarded UPDATE whose WHERE clause only
+    matches rows that still hold at least the requested quantity, so
+    concurrent checkouts can never oversell or lose an update. If any line
+    does not match, the update is rolled back and InsufficientStock reports
+    the lines that are short.
+
+    The UPDATE is the checkout's only stock write: sales reach the stock
+    ledger later, in aggregate (see inventory.ledger.record_sales).
+    """
+    if not quantities:
+        return
+
+    guard = Q()
+    for product_id, quantity in quantities.items():
+        guard |= Q(pk=product_id, quantity__gte=quantity)
+
+    shortages = {}
+    for _ in range(attempts):
+        try:
+            with transaction.atomic():
+                updated = Product.objects.filter(guard).update(
+                    quantity=F('quantity') - per_product(quantities),
+                    sold_quantity=F('sold_quantity') + per_product(quantities),
+                    updated_at=timezone.now()
+                )
+                if updated != len(quantities):
+                    raise _PartialReservation
+            return
+        except _PartialReservation:
+            pass
+
+        current = Product.objects.filter(pk__in=quantities).values_list('id', 'name', 'quantity')
+        found = {product_id: (name, quantity) for product_id, name, quantity in current}
+        shortages = {}
+        for product_id, requested in quantities.items():
+            name, available = found.get(product_id, (str(product_id), 0))
+            if available < requested:
+                shortages[product_id] = (name, available, requested)
+        if shortages:
+            break
+        # Stock was replenished between the UPDATE and the check; try again
+
+    raise InsufficientStock(shortages)
+
+
+def release_stock(quantities):
+    """Put ``{product_id: quantity}`` back on the shelf, undoing reserve_stock()"""
+    if not quantities:
+        return
+    Product.objects.filter(pk__in=quantities).update(
+        quantity=F('quantity') + per_product(quantities),
+        sold_quantity=F('sold_quantity') - per_product(quantities),
+        updated_at=timezone.now()
+    )
+
+
+def _as_int(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    return int(value)
+
+
+def _write_quantities(quantities, batch_size):
+    """
+    Set ``{product_id: quantity}`` with one CASE UPDATE per batch. Rows are
+    grouped by their new value, so a stock count where many products share
+    a quantity needs one WHEN per distinct value rather than one per row.
+    """
+    now = timezone.now()
+    product_ids = sorted(quantities)
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        by_value = defaultdict(list)
+        for product_id in batch:
+            by_value[quantities[product_id]].append(product_id)
+        Product.objects.filter(pk__in=batch).update(
+            quantity=Case(
+                *[When(pk__in=ids, then=Value(quantity)) for quantity, ids in by_value.items()],
+                output_field=IntegerField()
+            ),
+            updated_at=now
+        )
+
+
+def apply_stock_updates(updates, batch_size=STOCK_UPDATE_BATCH_SIZE):
+    """
+    Apply a batch of stock counts in one transaction.
+
+    Each update is ``{'product_id': ..., 'quantity': n}`` to set the stock or
+    ``{'product_id': ..., 'delta': n}`` to adjust it. Rows apply in order, so
+    later rows for the same product build on earlier ones. The products are
+    locked and read with one query and written back in batched CASE
+    UPDATEs, so a sync costs one query per few hundred rows. Each product's
+    net change goes to the stock ledger: a restock when it only received
+    deltas that added stock, an adjustment otherwise.
+
+    Returns one report per input row with a ``status`` of ``updated``,
+    ``not_found`` or ``invalid``.
+    """
+    results = [None] * len(updates)
+    parsed = []
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict):
+            results[index] = {'product_id': None, 'status': 'invalid', 'error': 'Expected an object'}
+            continue
+        product_id = update.get('product_id')
+        try:
+            if ('quantity' in update) == ('delta' in update):
+                raise KeyError
+            mode = 'quantity' if 'quantity' in update else 'delta'
+            parsed.append((index, _as_int(product_id), mode, _as_int(update[mode])))
+        except KeyError:
+            results[index] = {'product_id': product_id, 'status': 'invalid',
+                              'error': 'Provide exactly one of quantity or delta'}
+        except (TypeError, ValueError):
+            results[index] = {'product_id': product_id, 'status': 'invalid',
+                              'error': 'product_id, quantity and delta must be integers'}
+
+    with transaction.atomic():
+        products = (
+            Product.objects.select_for_update().only('id', 'name', 'quantity').order_by('pk')
+            .in_bulk({product_id for _, product_id, _, _ in parsed})
+        )
+        original = {product_id: product.quantity for product_id, product in products.items()}
+        changed = {}
+        counted = set()
+        for index, product_id, mode, value in parsed:
+            product = products.get(product_id)
+            if product is None:
+                results[index] = {'product_id': product_id, 'status': 'not_found'}
+                continue
+            quantity = value if mode == 'quantity' else product.quantity + value
+            if quantity < 0:
+                results[index] = {'product_id': product_id, 'status': 'invalid',
+                                  'error': f'Quantity cannot go below zero (currently {product.quantity})'}
+                continue
+            product.quantity = quantity
+            changed[product_id] = product
+            if mode == 'quantity' or value < 0:
+                counted.add(product_id)
+            results[index] = {'product_id': product_id, 'status': 'updated',
+                              'name': product.name, 'quantity': quantity}
+
+        _write_quantities({product_id: product.quantity for product_id, product in changed.items()}, batch_size)
+        differences = {
+            product_id: product.quantity - original[product_id] for product_id, product in changed.items()
+        }
+        StockMovement.objects.bulk_create([
+            *movements(StockMovement.RESTOCK, {
+                product_id: difference for product_id, difference in differences.items() if product_id not in counted
+            }),
+            *movements(StockMovement.ADJUSTMENT, {
+                product_id: difference for product_id, difference in differences.items() if product_id in counted
+            }),
+        ])
+        invalidate_after_update(len(changed))
+
+    return results
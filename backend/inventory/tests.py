@@ -1,3 +1,525 @@
-from django.test import TestCase
+import math
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from .ledger import compact, drift, ledger_balances, record_sales
+from .models import Category, Product, StockMovement, StockSnapshot
+from .search import search_products
+from .stock import apply_stock_updates, release_stock, reserve_stock
+from .serializers import ProductListSerializer
 
-# Create your tests here.
+
+class InventorySummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        drinks = Category.objects.create(name='Drinks')
+        Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.50'),
+                               selling_price=Decimal('2.00'), quantity=40, sold_quantity=35)
+        Product.objects.create(name='Cola', category=drinks, cost_price=Decimal('0.75'),
+                               selling_price=Decimal('1.25'), quantity=100, sold_quantity=10)
+        Product.objects.create(name='Nuts', category=snacks, cost_price=Decimal('3.00'),
+                               quantity=5, sold_quantity=8, low_stock_threshold=2)
+        Product.objects.create(name='Gum', category=snacks, cost_price=Decimal('0.20'),
+                               quantity=0, low_stock_threshold=-1)
+
+    def test_totals_match_product_properties(self):
+        products = list(Product.objects.all())
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('inventory:inventory-summary'))
+
+        data = response.data
+        low_stock = [p for p in products if p.is_low_stock]
+        self.assertEqual(data['total_products'], 4)
+        self.assertEqual(data['total_categories'], 2)
+        self.assertEqual(data['low_stock_count'], len(low_stock))
+        self.assertEqual(data['total_inventory_value'], sum(p.total_value for p in products))
+        self.assertEqual(data['total_sold_value'], sum(p.total_sold_value for p in products))
+        self.assertEqual(data['total_available_quantity'], sum(p.available_quantity for p in products))
+        self.assertEqual(data['total_quantity'], 145)
+        self.assertEqual(data['total_sold_quantity'], 53)
+        self.assertEqual(
+            [(p['name'], p['available_quantity']) for p in data['low_stock_products']],
+            [('Nuts', 0), ('Chips', 5)]
+        )
+
+    def test_low_stock_list_is_bounded(self):
+        response = self.client.get(reverse('inventory:inventory-summary'), {'low_stock_limit': 1})
+
+        self.assertEqual(response.data['low_stock_count'], 2)
+        self.assertEqual(len(response.data['low_stock_products']), 1)
+
+    @override_settings(SUMMARY_CONCURRENT_QUERIES=False)
+    def test_out_of_range_and_invalid_limits(self):
+        for name in ('inventory:inventory-summary', 'analytics:inventory-summary'):
+            for limit, expected in [('-1', 0), ('9999', 2), ('abc', 2), ('1.5', 2)]:
+                response = self.client.get(reverse(name), {'low_stock_limit': limit})
+                self.assertEqual(response.status_code, 200, (name, limit))
+                self.assertEqual(len(response.data['low_stock_products']), expected, (name, limit))
+
+    def test_empty_inventory(self):
+        Product.objects.all().delete()
+        response = self.client.get(reverse('inventory:inventory-summary'))
+
+        self.assertEqual(response.data['total_inventory_value'], Decimal('0.00'))
+        self.assertEqual(response.data['total_quantity'], 0)
+        self.assertEqual(response.data['low_stock_products'], [])
+
+
+class ProductListFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.snacks = Category.objects.create(name='Snacks')
+        drinks = Category.objects.create(name='Drinks')
+        for i in range(25):
+            Product.objects.create(name=f'Chips {i:02}', category=self.snacks, cost_price=Decimal('1.00'),
+                                   quantity=5, sku=f'CH-{i:02}')
+        Product.objects.create(name='Chips Deluxe', category=self.snacks, cost_price=Decimal('1.00'),
+                               quantity=500)
+        Product.objects.create(name='Cola', category=drinks, cost_price=Decimal('1.00'), quantity=3)
+
+    def test_low_stock_composes_with_search_and_paginates(self):
+        response = self.client.get(reverse('inventory:product-list'), {
+            'low_stock': 'true', 'search': 'chips', 'category': self.snacks.id
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertTrue(all(p['is_low_stock'] for p in response.data['results']))
+
+    def test_low_stock_matches_property(self):
+        expected = sorted(p.id for p in Product.objects.all() if p.is_low_stock)
+        self.assertEqual(sorted(Product.objects.low_stock().values_list('id', flat=True)), expected)
+
+    def test_low_stock_predicate_uses_expression_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan text is backend specific')
+        plan = Product.objects.low_stock().order_by().explain()
+        self.assertIn('product_stock_headroom_idx', plan)
+
+
+class ProductGeneratedColumnTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Snacks')
+
+    def test_columns_follow_writes(self):
+        product = Product.objects.create(name='Chips', category=self.category, cost_price=Decimal('2.00'),
+                                         selling_price=Decimal('3.00'), quantity=10, sold_quantity=4)
+        self.assertEqual(product.available_quantity, 6)
+        self.assertEqual(product.profit_per_unit, Decimal('1.00'))
+        self.assertEqual(product.profit_margin, Decimal('33.33'))
+        self.assertEqual(product.total_value, Decimal('12.00'))
+        self.assertEqual(product.total_sold_value, Decimal('12.00'))
+
+        # Read back by save() itself, without a refresh
+        product.sold_quantity = 6
+        product.selling_price = Decimal('6.00')
+        product.save()
+        self.assertEqual((product.available_quantity, product.profit_margin), (4, Decimal('66.67')))
+
+        product.sold_quantity = 15
+        product.selling_price = None
+        product.save()
+        self.assertEqual(product.available_quantity, 0)
+        self.assertEqual(product.profit_margin, Decimal('0.00'))
+        self.assertEqual(product.total_sold_value, Decimal('0.00'))
+
+    def test_product_list_sorts_by_margin(self):
+        for name, price in [('Low', '2.10'), ('High', '9.00'), ('Mid', '4.00')]:
+            Product.objects.create(name=name, category=self.category, cost_price=Decimal('2.00'),
+                                   selling_price=Decimal(price))
+
+        response = APIClient().get(reverse('inventory:product-list'), {'ordering': '-profit_margin'})
+
+        self.assertEqual([p['name'] for p in response.data['results']], ['High', 'Mid', 'Low'])
+        self.assertEqual(response.data['results'][0]['profit_margin'], '77.78')
+
+
+class CategoryListTests(TestCase):
+    def test_product_count_is_annotated(self):
+        for i in range(5):
+            category = Category.objects.create(name=f'Category {i}')
+            for j in range(i):
+                Product.objects.create(name=f'P{j}', category=category, cost_price=Decimal('1.00'))
+
+        with self.assertNumQueries(2):
+            response = APIClient().get(reverse('inventory:category-list'))
+
+        self.assertEqual([c['product_count'] for c in response.data['results']], [0, 1, 2, 3, 4])
+
+    def test_created_category_reports_zero_products(self):
+        response = APIClient().post(reverse('inventory:category-list'), {'name': 'New'}, format='json')
+        self.assertEqual(response.data['product_count'], 0)
+
+
+class UpdateStockTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Snacks')
+        self.products = [
+            Product.objects.create(name=f'P{i}', category=category, cost_price=Decimal('1.00'), quantity=10)
+            for i in range(3)
+        ]
+
+    def post(self, updates):
+        return self.client.post(reverse('inventory:update-stock'), {'updates': updates}, format='json')
+
+    def test_absolute_and_relative_updates_report_every_row(self):
+        a, b, c = self.products
+        response = self.post([
+            {'product_id': a.id, 'quantity': 50},
+            {'product_id': b.id, 'delta': -4},
+            {'product_id': 999999, 'quantity': 1},
+            {'product_id': c.id, 'delta': -11},
+            {'product_id': a.id, 'delta': 5},
+            {'product_id': c.id, 'quantity': 1, 'delta': 1},
+            {'product_id': 'x', 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['updated', 'updated', 'not_found', 'invalid', 'updated', 'invalid', 'invalid'])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(response.data['updated_products'], [
+            {'id': a.id, 'name': 'P0', 'quantity': 55},
+            {'id': b.id, 'name': 'P1', 'quantity': 6},
+        ])
+        self.assertEqual(
+            dict(Product.objects.values_list('id', 'quantity')),
+            {a.id: 55, b.id: 6, c.id: 10}
+        )
+
+    def test_query_count_does_not_grow_with_batch(self):
+        category = self.products[0].category
+        products = Product.objects.bulk_create([
+            Product(name=f'Bulk {i}', category=category, cost_price=Decimal('1.00')) for i in range(200)
+        ])
+        updates = [{'product_id': p.id, 'delta': 3} for p in products]
+
+        # SAVEPOINT, lock and read, one bulk UPDATE, the ledger INSERT (split
+        # where the backend caps query parameters), RELEASE
+        fields = [field for field in StockMovement._meta.concrete_fields if not field.primary_key]
+        inserts = math.ceil(len(products) / connection.ops.bulk_batch_size(fields, products))
+        with self.assertNumQueries(4 + inserts):
+            response = self.post(updates)
+        self.assertEqual(len(response.data['updated_products']), 200)
+        self.assertFalse(Product.objects.filter(pk__in=[p.id for p in products]).exclude(quantity=3).exists())
+
+    def test_empty_request_is_rejected(self):
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.snacks = Category.objects.create(name='Snacks')
+        self.existing = Product.objects.create(name='Chips', category=self.snacks, cost_price=Decimal('1.00'),
+                                               quantity=40, sku='CH-1')
+
+    def post(self, body, content_type, **params):
+        url = reverse('inventory:product-import')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.generic('POST', url, body, content_type=content_type)
+
+    def test_csv_upserts_by_sku_and_name(self):
+        body = (
+            'sku,name,category,cost_price,selling_price\n'
+            'CH-1,Chips Large,Snacks,1.20,2.00\n'
+            ',Nuts,Snacks,3.00,\n'
+            'CO-1,Cola,Drinks,0.50,1.00\n'
+            'BAD,Bad,Snacks,-1,\n'
+        )
+        response = self.post(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+        self.assertEqual((report['rows'], report['created'], report['updated'], report['error_count']), (4, 1, 1, 2))
+        self.assertEqual([e['line'] for e in report['errors']], [4, 5])
+        self.assertIn('category', report['errors'][0]['errors'])
+        self.assertIn('cost_price', report['errors'][1]['errors'])
+
+        self.existing.refresh_from_db()
+        # Stock columns were not in the file, so they are left alone
+        self.assertEqual((self.existing.name, self.existing.cost_price, self.existing.quantity),
+                         ('Chips Large', Decimal('1.20'), 40))
+        self.assertEqual(Product.objects.get(name='Nuts').selling_price, None)
+
+        response = self.post('name,category,cost_price\nNuts,Snacks,3.50\n', 'text/csv')
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        self.assertEqual(Product.objects.get(name='Nuts').cost_price, Decimal('3.50'))
+
+    def test_ndjson_in_chunks_with_new_categories(self):
+        lines = [f'{{"name": "Gum {i}", "category": "Sweets", "cost_price": 0.25, "quantity": {i}}}' for i in range(5)]
+        lines.insert(2, 'not json')
+        response = self.post('\n'.join(lines), 'application/x-ndjson', create_categories='true')
+
+        self.assertEqual((response.data['created'], response.data['error_count']), (5, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertEqual(Product.objects.filter(category__name='Sweets').count(), 5)
+
+    def test_conflicting_row_is_reported_not_fatal(self):
+        body = 'sku,name,category,cost_price\nNEW-1,Chips,Snacks,1.00\nNEW-2,Pretzels,Snacks,1.00\n'
+        response = self.post(body, 'text/csv')
+
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertTrue(Product.objects.filter(sku='NEW-2').exists())
+
+    def test_upserts_where_conflicts_cannot_name_a_key(self):
+        # As on MySQL, whose ON DUPLICATE KEY UPDATE fires on any unique key
+        connection.features.supports_update_conflicts_with_target = False
+        self.addCleanup(delattr, connection.features, 'supports_update_conflicts_with_target')
+        body = (
+            'sku,name,category,cost_price,quantity\n'
+            'CH-1,Chips Large,Snacks,1.20,30\n'
+            'NEW-1,Pretzels,Snacks,1.00,5\n'
+            'NEW-2,Chips Large,Snacks,1.00,1\n'
+        )
+        response = self.post(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (1, 1, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 4)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.quantity), ('Chips Large', 30))
+        self.assertEqual(Product.objects.get(sku='NEW-1').quantity, 5)
+
+        response = self.post('name,category,cost_price\nPretzels,Snacks,1.50\nNuts,Snacks,3.00\n', 'text/csv')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(Product.objects.get(sku='NEW-1').cost_price, Decimal('1.50'))
+
+    def test_command_reports_throughput(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as source:
+            source.write('name,category,cost_price,quantity\n')
+            source.writelines(f'Bar {i},Snacks,1.00,{i}\n' for i in range(25))
+            source.flush()
+            out = StringIO()
+            call_command('import_products', source.name, chunk_size=10, stdout=out, stderr=StringIO())
+
+        self.assertIn('25 created, 0 updated, 0 errors', out.getvalue())
+        self.assertEqual(out.getvalue().count('rows:'), 3)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        snacks = Category.objects.create(name='Snacks')
+        for name, sku in [('Chips', 'CH-1'), ('Chips Deluxe', 'CH-10'), ('Choco Chips', 'CC-1'),
+                          ('Cola', 'CO-1'), ('Salted chips', None)]:
+            Product.objects.create(name=name, category=snacks, cost_price=Decimal('1.00'), sku=sku)
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('inventory:product-list'), {'search': term, **params})
+        return [p['name'] for p in response.data['results']]
+
+    def test_exact_sku_is_a_single_lookup(self):
+        self.assertEqual(self.search('CH-1'), ['Chips'])
+
+    def test_prefix_matches_are_ranked(self):
+        self.assertEqual(self.search('chips'), ['Chips', 'Chips Deluxe'])
+        self.assertEqual(self.search('ch'), ['Chips', 'Chips Deluxe', 'Choco Chips'])
+        self.assertEqual(self.search('c', ordering='-name'), ['Cola', 'Choco Chips', 'Chips Deluxe', 'Chips'])
+
+    def test_typeahead_endpoint(self):
+        response = self.client.get(reverse('inventory:product-search'), {'q': 'c', 'limit': 2})
+        self.assertEqual([p['name'] for p in response.data['results']], ['Chips', 'Chips Deluxe'])
+        self.assertEqual(response.data['results'][0]['sku'], 'CH-1')
+        self.assertEqual(self.client.get(reverse('inventory:product-search')).data, {'results': []})
+
+    def test_prefix_search_escapes_wildcards(self):
+        snacks = Category.objects.get(name='Snacks')
+        for name in ('50% Off', '5_0 Bar', '500 Mints'):
+            Product.objects.create(name=name, category=snacks, cost_price=Decimal('1.00'))
+
+        self.assertEqual(self.search('50%', search_mode='prefix'), ['50% Off'])
+        self.assertEqual(self.search('5_', search_mode='prefix'), ['5_0 Bar'])
+        self.assertEqual(self.search('CHIPS d', search_mode='prefix'), ['Chips Deluxe'])
+
+    def test_prefix_search_uses_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan text is backend specific')
+        plan = search_products(Product.objects.all(), 'ch', mode='prefix').explain()
+        self.assertIn('product_name_prefix_idx', plan)
+        self.assertIn('product_sku_prefix_idx', plan)
+        self.assertNotIn('SCAN inventory_product', plan)
+
+
+class ProductSparseFieldsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Snacks')
+        for i in range(3):
+            Product.objects.create(name=f'P{i}', category=category, cost_price=Decimal('1.00'),
+                                   selling_price=Decimal('1.50'), quantity=10, sku=f'P-{i}')
+
+    def test_compact_view_narrows_output_and_columns(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('inventory:product-list'), {'view': 'compact'})
+
+        self.assertEqual(response.data['results'][0],
+                         {'id': response.data['results'][0]['id'], 'name': 'P0', 'sku': 'P-0',
+                          'selling_price': '1.50', 'available_quantity': 10})
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('description', select)
+        self.assertNotIn('inventory_category', select)
+
+    def test_fields_param(self):
+        response = APIClient().get(reverse('inventory:product-list'),
+                                   {'fields': 'name,category_name,is_low_stock,bogus', 'pagination': 'cursor'})
+        self.assertEqual(response.data['results'][0], {'name': 'P0', 'category_name': 'Snacks', 'is_low_stock': True})
+
+        full = APIClient().get(reverse('inventory:product-list'), {'fields': 'bogus'})
+        self.assertEqual(len(full.data['results'][0]), 19)
+
+
+class ProductValuesRepresentationTests(TestCase):
+    def setUp(self):
+        snacks = Category.objects.create(name='Snacks')
+        Product.objects.create(name='Chips', category=snacks, cost_price=Decimal('1.5'),
+                               selling_price=Decimal('2.25'), quantity=40, sold_quantity=35,
+                               description='Salted', sku='CH-1')
+        Product.objects.create(name='Nuts', category=snacks, cost_price=Decimal('3.00'), quantity=5)
+        Product.objects.create(name='Gum', category=snacks, cost_price=Decimal('0.01'),
+                               selling_price=Decimal('99999.99'), quantity=0, low_stock_threshold=-1)
+
+    def test_output_is_byte_identical_to_the_serializer(self):
+        products = Product.objects.select_related('category').order_by('name')
+        for fields in [None, ['id', 'name', 'sku', 'selling_price', 'available_quantity'],
+                       ['is_low_stock', 'category_name', 'profit_margin', 'updated_at']]:
+            request = APIRequestFactory().get('/', {'fields': ','.join(fields)} if fields else {})
+            expected = ProductListSerializer(products, many=True, context={'request': Request(request)}).data
+            fast = ProductListSerializer.represent_values(ProductListSerializer.values_queryset(products, fields), fields)
+            self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(expected))
+
+    def test_datetimes_follow_the_active_timezone(self):
+        products = Product.objects.select_related('category').order_by('name')
+        for zone in ['UTC', 'Asia/Kolkata']:
+            with timezone.override(zone):
+                expected = ProductListSerializer(products, many=True).data
+                fast = ProductListSerializer.represent_values(ProductListSerializer.values_queryset(products))
+                self.assertEqual([row['created_at'] for row in fast], [row['created_at'] for row in expected])
+
+    def test_list_endpoint_uses_values_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(reverse('inventory:product-list'))
+        self.assertEqual(len(queries), 2)
+        expected = ProductListSerializer(Product.objects.select_related('category'), many=True).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.snacks = Category.objects.create(name='Snacks')
+        self.chips = Product.objects.create(name='Chips', category=self.snacks, cost_price=Decimal('1.00'),
+                                            quantity=10)
+
+    def kinds(self):
+        return list(StockMovement.objects.filter(product=self.chips).values_list('kind', 'quantity', 'sold'))
+
+    def test_every_stock_change_is_recorded(self):
+        apply_stock_updates([{'product_id': self.chips.pk, 'delta': 5}])
+        apply_stock_updates([{'product_id': self.chips.pk, 'quantity': 12}])
+        reserve_stock({self.chips.pk: 3})
+        release_stock({self.chips.pk: 1})
+        # Sales are not drift, only not recorded yet
+        self.assertEqual(drift(), [])
+        self.chips.refresh_from_db()
+        self.chips.quantity = 20
+        self.chips.save()
+        self.chips.name = 'Salted chips'
+        self.chips.save()
+
+        self.assertEqual(self.kinds(), [
+            ('restock', 10, 0), ('restock', 5, 0), ('adjustment', -3, 0), ('sale', -2, 2), ('adjustment', 10, 0),
+        ])
+        self.assertEqual(drift(), [])
+        balance = ledger_balances().get(pk=self.chips.pk)
+        self.assertEqual((balance.ledger_quantity, balance.ledger_sold), (20, 2))
+
+    def test_checkouts_leave_sales_to_be_recorded_in_aggregate(self):
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock({self.chips.pk: 2})
+            reserve_stock({self.chips.pk: 3})
+            release_stock({self.chips.pk: 1})
+        self.assertFalse([query for query in queries if StockMovement._meta.db_table in query['sql']])
+        self.assertEqual(drift(), [])
+
+        self.assertEqual(len(record_sales()), 1)
+        self.assertEqual(self.kinds(), [('restock', 10, 0), ('sale', -4, 4)])
+        self.assertEqual(record_sales(), [])
+
+        Product.objects.filter(pk=self.chips.pk).update(sold_quantity=F('sold_quantity') - 1,
+                                                        quantity=F('quantity') + 1)
+        record_sales()
+        self.assertEqual(self.kinds()[-1], ('void', 1, -1))
+
+    def test_compaction_folds_old_movements_into_snapshots(self):
+        reserve_stock({self.chips.pk: 2})
+        record_sales()
+        StockMovement.objects.update(created_at=timezone.now() - timedelta(days=40))
+        reserve_stock({self.chips.pk: 1})
+
+        self.assertEqual(compact(timezone.now() - timedelta(days=30)), 2)
+        snapshot = StockSnapshot.objects.get(product=self.chips)
+        self.assertEqual((snapshot.quantity, snapshot.sold), (8, 2))
+        self.assertEqual(self.kinds(), [])
+        self.assertEqual(drift(), [])
+
+        # The job records the sales since, which a later pass adds to the snapshot
+        call_command('compact_stock_ledger', stdout=StringIO())
+        self.assertEqual(self.kinds(), [('sale', -1, 1)])
+        self.assertEqual(compact(timezone.now()), 1)
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.quantity, snapshot.sold), (7, 3))
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(compact(timezone.now()), 0)
+
+    def test_admin_deletes_products_but_not_movements(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        movement = StockMovement.objects.get(product=self.chips)
+        nuts = Product.objects.create(name='Nuts', category=Category.objects.create(name='Nuts'),
+                                      cost_price=Decimal('1.00'), quantity=3)
+
+        self.assertEqual(self.client.get(
+            reverse('admin:inventory_stockmovement_delete', args=[movement.pk])).status_code, 403)
+        changelist = self.client.get(reverse('admin:inventory_stockmovement_changelist'))
+        # No actions at all, delete_selected included
+        self.assertIsNone(changelist.context['action_form'])
+
+        response = self.client.post(reverse('admin:inventory_product_delete', args=[self.chips.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('admin:inventory_category_changelist'), {
+            'action': 'delete_selected', '_selected_action': [nuts.category_id], 'post': 'yes'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_imports_are_recorded_and_the_check_finds_untracked_writes(self):
+        response = self.client.generic(
+            'POST', reverse('inventory:product-import'),
+            'name,category,cost_price,quantity\nChips,Snacks,1.00,30\nNuts,Snacks,2.00,7\n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(drift(), [])
+
+        Product.objects.filter(pk=self.chips.pk).update(quantity=F('quantity') + 1)
+        out = StringIO()
+        call_command('check_stock_ledger', stdout=out)
+        self.assertIn('1 products differ', out.getvalue())
+        call_command('check_stock_ledger', fix=True, stdout=StringIO())
+        self.assertEqual(drift(), [])
@@ -11,6 +11,8 @@ urlpatterns = [
     # Products
     path('products/', views.ProductListCreateView.as_view(), name='product-list'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('products/import/', views.import_products, name='product-import'),
+    path('products/search/', views.product_search, name='product-search'),
     
     # Inventory management
     path('summary/', views.inventory_summary, name='inventory-summary'),
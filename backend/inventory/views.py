@@ -1,23 +1,38 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Category, Product
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from decimal import Decimal
+from functools import partial
+from backend.async_views import run_queries
+from backend.cache import cached_summary
+from backend.pagination import KeysetPagination
+from .models import LOW_STOCK, Category, Product
+from .importer import ImportFormatError, ProductImporter, import_format, read_rows
+from .search import search_products
+from .stock import apply_stock_updates
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
     ProductCreateSerializer, ProductUpdateSerializer
 )
 
 class CategoryListCreateView(generics.ListCreateAPIView):
-    queryset = Category.objects.all()
+    queryset = CategorySerializer.annotate_queryset(Category.objects.all())
     serializer_class = CategorySerializer
 
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Category.objects.all()
+    queryset = CategorySerializer.annotate_queryset(Category.objects.all())
     serializer_class = CategorySerializer
 
 class ProductListCreateView(generics.ListCreateAPIView):
     queryset = Product.objects.select_related('category')
+    pagination_class = KeysetPagination
+    cursor_ordering = ('name', 'id')
+    ordering_fields = [
+        'name', 'selling_price', 'quantity', 'available_quantity',
+        'profit_margin', 'total_value', 'total_sold_value', 'created_at'
+    ]
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -35,16 +50,39 @@ class ProductListCreateView(generics.ListCreateAPIView):
         # Filter by low stock
         low_stock = self.request.query_params.get('low_stock')
         if low_stock and low_stock.lower() == 'true':
-            queryset = [product for product in queryset if product.is_low_stock]
+            queryset = queryset.low_stock()
         
-        # Search by name
+        # Search by name or SKU, best match first (see inventory.search)
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(sku__icontains=search)
-            )
+            queryset = search_products(queryset, search, mode=self.request.query_params.get('search_mode', 'ranked'))
+        
+        # ?fields= / ?view=compact load only the columns that are shown
+        queryset = ProductListSerializer.narrow_queryset(
+            queryset, ProductListSerializer.requested_fields(self.request),
+            keep=[name.lstrip('-') for name in self.cursor_ordering]
+        )
+        
+        # Sort by a column, e.g. ordering=-profit_margin (page mode only;
+        # cursor pages always follow cursor_ordering)
+        ordering = self.request.query_params.get('ordering')
+        if ordering and ordering.lstrip('-') in self.ordering_fields:
+            queryset = queryset.order_by(ordering, 'id')
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Read path straight from values() rows into ProductListSerializer's
+        # exact output, without model instances (see ValuesRepresentationMixin)
+        fields = ProductListSerializer.requested_fields(request)
+        rows = ProductListSerializer.values_queryset(
+            self.filter_queryset(self.get_queryset()), fields,
+            keep=[name.lstrip('-') for name in self.cursor_ordering]
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(ProductListSerializer.represent_values(rows, fields))
+        return self.get_paginated_response(ProductListSerializer.represent_values(page, fields))
 
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.select_related('category')
@@ -54,79 +92,155 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
             return ProductUpdateSerializer
         return ProductDetailSerializer
 
-@api_view(['GET'])
-def inventory_summary(request):
-    """Get inventory summary statistics"""
-    products = Product.objects.select_related('category')
+def inventory_summary_queries(params):
+    """
+    The independent queries behind the inventory summary, as zero-argument
+    callables, and the function assembling their results into the response
+    data. The analytics app runs the same queries concurrently.
+    """
+    try:
+        low_stock_limit = max(min(int(params.get('low_stock_limit', 50)), 500), 0)
+    except (TypeError, ValueError):
+        low_stock_limit = 50
     
-    total_products = products.count()
-    total_categories = Category.objects.count()
-    low_stock_products = [p for p in products if p.is_low_stock]
+    # Every total comes from a single aggregate query over the generated columns
+    zero = Value(Decimal('0.00'))
+    totals = partial(
+        Product.objects.aggregate,
+        total_products=Count('id'),
+        low_stock_count=Count('id', filter=LOW_STOCK),
+        total_inventory_value=Coalesce(Sum('total_value'), zero),
+        total_sold_value=Coalesce(Sum('total_sold_value'), zero),
+        total_quantity=Coalesce(Sum('quantity'), 0),
+        total_sold_quantity=Coalesce(Sum('sold_quantity'), 0),
+        total_available_quantity=Coalesce(Sum('available_quantity'), 0),
+    )
     
-    # Calculate inventory values
-    total_inventory_value = sum(product.total_value for product in products)
-    total_sold_value = sum(product.total_sold_value for product in products)
+    low_stock_products = (
+        Product.objects.low_stock()
+        .order_by('available_quantity', 'name')
+        .values('id', 'name', 'available_quantity', 'low_stock_threshold')[:low_stock_limit]
+    )
     
-    # Calculate quantities
-    total_quantity = sum(product.quantity for product in products)
-    total_sold_quantity = sum(product.sold_quantity for product in products)
-    total_available_quantity = sum(product.available_quantity for product in products)
+    def build(results):
+        totals = results['totals']
+        total_quantity = totals['total_quantity']
+        total_sold_quantity = totals['total_sold_quantity']
+        
+        return {
+            'total_products': totals['total_products'],
+            'total_categories': results['total_categories'],
+            'low_stock_count': totals['low_stock_count'],
+            'total_inventory_value': totals['total_inventory_value'],
+            'total_sold_value': totals['total_sold_value'],
+            'total_quantity': total_quantity,
+            'total_sold_quantity': total_sold_quantity,
+            'total_available_quantity': totals['total_available_quantity'],
+            'inventory_turnover_percentage': (total_sold_quantity / total_quantity * 100) if total_quantity > 0 else 0,
+            'low_stock_products': [
+                {
+                    'id': p['id'],
+                    'name': p['name'],
+                    'available_quantity': p['available_quantity'],
+                    'threshold': p['low_stock_threshold']
+                } for p in results['low_stock_products']
+            ]
+        }
     
+    return {
+        'totals': totals,
+        'total_categories': Category.objects.count,
+        'low_stock_products': partial(list, low_stock_products),
+    }, build
+
+@api_view(['GET'])
+@cached_summary
+def inventory_summary(request):
+    """Get inventory summary statistics"""
+    queries, build = inventory_summary_queries(request.query_params)
+    return Response(build(run_queries(queries)))
+
+@api_view(['GET'])
+def product_search(request):
+    """Typeahead: the best few products for ``?q=``, by exact SKU or name/SKU prefix"""
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    term = request.query_params.get('q', '')
+    if not term.strip():
+        return Response({'results': []})
+    
+    products = search_products(Product.objects.all(), term, mode=request.query_params.get('mode', 'prefix'))
     return Response({
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'low_stock_count': len(low_stock_products),
-        'total_inventory_value': total_inventory_value,
-        'total_sold_value': total_sold_value,
-        'total_quantity': total_quantity,
-        'total_sold_quantity': total_sold_quantity,
-        'total_available_quantity': total_available_quantity,
-        'inventory_turnover_percentage': (total_sold_quantity / total_quantity * 100) if total_quantity > 0 else 0,
-        'low_stock_products': [
-            {
-                'id': p.id,
-                'name': p.name,
-                'available_quantity': p.available_quantity,
-                'threshold': p.low_stock_threshold
-            } for p in low_stock_products
-        ]
+        'results': list(
+            products.values('id', 'name', 'sku', 'category_id', 'selling_price', 'available_quantity')[:limit]
+        )
     })
 
 @api_view(['POST'])
 def update_stock(request):
-    """Bulk update stock quantities"""
+    """Bulk update stock quantities (absolute ``quantity`` or relative ``delta``)"""
     updates = request.data.get('updates', [])
     
-    if not updates:
+    if not updates or not isinstance(updates, list):
         return Response(
             {'error': 'No updates provided'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    updated_products = []
+    results = apply_stock_updates(updates)
     
-    for update in updates:
-        try:
-            product_id = update.get('product_id')
-            new_quantity = update.get('quantity')
-            
-            if product_id is None or new_quantity is None:
-                continue
-                
-            product = Product.objects.get(id=product_id)
-            product.quantity = new_quantity
-            product.save()
-            
-            updated_products.append({
-                'id': product.id,
-                'name': product.name,
-                'quantity': product.quantity
-            })
-            
-        except Product.DoesNotExist:
-            continue
+    # Final state per product, in first-seen order
+    updated_products = {}
+    for result in results:
+        if result['status'] == 'updated':
+            updated_products[result['product_id']] = {
+                'id': result['product_id'],
+                'name': result['name'],
+                'quantity': result['quantity']
+            }
     
     return Response({
         'message': f'Updated {len(updated_products)} products',
-        'updated_products': updated_products
-    })
\ No newline at end of file
+        'updated_products': list(updated_products.values()),
+        'not_found': [r['product_id'] for r in results if r['status'] == 'not_found'],
+        'results': results
+    })
+
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+@api_view(['POST'])
+def import_products(request):
+    """
+    Upsert products from a CSV or NDJSON catalogue, sent as the request body
+    (``Content-Type: text/csv`` or ``application/x-ndjson``) or as a
+    multipart ``file``. ``?format=`` overrides the detected format and
+    ``?create_categories=true`` creates categories that do not exist yet.
+    The body is parsed as it streams in and written in chunks, so chunks
+    before a fatal format error stay imported.
+    """
+    if request.content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        lines, detected = upload, import_format(upload.name)
+    else:
+        lines = request.stream
+        detected = IMPORT_CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if lines is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    importer = ProductImporter(
+        create_categories=request.query_params.get('create_categories', '').lower() == 'true'
+    )
+    try:
+        report = importer.run(read_rows(lines, request.query_params.get('format', detected)))
+    except ImportFormatError as e:
+        return Response({'error': str(e), **importer.report()}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(report)
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import Order, OrderItem
 
 class OrderItemInline(admin.TabularInline):
@@ -22,3 +23,9 @@ class OrderItemAdmin(admin.ModelAdmin):
     ]
     list_filter = ['order__order_date', 'product__category']
     readonly_fields = ['subtotal', 'profit']
+
+    def delete_queryset(self, request, queryset):
+        # One by one, so each line leaves its order's totals (see OrderItem.delete)
+        with transaction.atomic():
+            for item in queryset:
+                item.delete()
@@ -0,0 +1,71 @@
+import resource
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the streaming sales CSV export on a throwaway test database. "
+        "Reports rows/sec and peak memory for growing date ranges; peak traced "
+        "memory should stay flat as the row count grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', default='30,90,365',
+                            help='Comma separated date range lengths to export')
+        parser.add_argument('--orders-per-day', type=int, default=40)
+        parser.add_argument('--items-per-order', type=int, default=5)
+
+    def handle(self, *args, **options):
+        days = sorted(int(d) for d in options['days'].split(','))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(days[-1], options['orders_per_day'], options['items_per_order'])
+            self.stdout.write(f"{'days':>6} {'rows':>9} {'seconds':>9} {'rows/s':>10} {'peak traced KiB':>16} {'max RSS KiB':>12}")
+            for span in days:
+                self.stdout.write(self.run(span))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, days, orders_per_day, items_per_order):
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench product {i}', category=category, cost_price=Decimal('4.00'),
+                    selling_price=Decimal('6.50'), quantity=10 ** 6)
+            for i in range(items_per_order * 4)
+        ])
+        now = timezone.now()
+        for day in range(days):
+            orders = Order.objects.bulk_create([Order(notes='bench') for _ in range(orders_per_day)])
+            Order.objects.filter(pk__in=[o.pk for o in orders]).update(order_date=now - timedelta(days=day))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=products[(n + i) % len(products)], quantity=1 + i,
+                          unit_price=Decimal('6.50'), unit_cost=Decimal('4.00'))
+                for n, order in enumerate(orders) for i in range(items_per_order)
+            ])
+
+    def run(self, span):
+        end = timezone.now().date()
+        start = end - timedelta(days=span - 1)
+
+        tracemalloc.start()
+        began = time.perf_counter()
+        response = Client().get(reverse('orders:export-csv'), {'start_date': start, 'end_date': end})
+        lines = sum(1 for _ in response.streaming_content) - 1
+        elapsed = time.perf_counter() - began
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return f"{span:>6} {lines:>9} {elapsed:>9.3f} {lines / elapsed:>10.0f} {peak / 1024:>16.0f} {max_rss:>12}"
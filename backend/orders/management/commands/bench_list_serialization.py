@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from inventory.models import Category, Product
+from inventory.serializers import ProductListSerializer
+from orders.models import Order, OrderItem
+from orders.serializers import OrderListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark list serialization on a throwaway test database: "
+        "ProductListSerializer and OrderListSerializer over model instances "
+        "against the values() read path, including JSON rendering. Fails if "
+        "the two outputs are not byte-identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Products and orders to seed')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per path; the best is reported')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(options['rows'])
+            products = Product.objects.select_related('category')
+            orders = OrderListSerializer.annotate_queryset(Order.objects.all())
+            self.stdout.write(f"{'list':>9} {'path':>11} {'rows':>8} {'seconds':>9} {'rows/s':>10} {'speedup':>8}")
+            for label, serializer, queryset in [('products', ProductListSerializer, products),
+                                                ('orders', OrderListSerializer, orders)]:
+                self.compare(label, serializer, queryset, options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, rows):
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench product {i}', category=category, cost_price=Decimal('4.00'),
+                    selling_price=Decimal('6.50') if i % 5 else None, quantity=i % 90, sold_quantity=i % 7,
+                    sku=f'B-{i:07}', description='Seeded for the serialization benchmark' if i % 3 else None)
+            for i in range(rows)
+        ], batch_size=1000)
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(total_amount=Decimal('19.50'), total_profit=Decimal('7.50'), notes='bench' if i % 2 else None)
+            for i in range(rows)
+        ], batch_size=1000)
+        Order.objects.update(order_date=now - timedelta(minutes=1))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[n % len(products)], quantity=3,
+                      unit_price=Decimal('6.50'), unit_cost=Decimal('4.00'))
+            for n, order in enumerate(orders)
+        ], batch_size=1000)
+
+    def best(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            content = run()
+            timings.append(time.perf_counter() - began)
+        return min(timings), content
+
+    def compare(self, label, serializer, queryset, repeat):
+        rows = queryset.count()
+        baseline, expected = self.best(
+            lambda: JSONRenderer().render(serializer(queryset, many=True).data), repeat
+        )
+        fast, content = self.best(
+            lambda: JSONRenderer().render(serializer.represent_values(serializer.values_queryset(queryset))), repeat
+        )
+        if content != expected:
+            raise CommandError(f'{label}: values() output differs from {serializer.__name__}')
+        self.stdout.write(f"{label:>9} {'serializer':>11} {rows:>8} {baseline:>9.3f} {rows / baseline:>10.0f} {'':>8}")
+        self.stdout.write(f"{label:>9} {'values':>11} {rows:>8} {fast:>9.3f} {rows / fast:>10.0f} "
+                          f"{baseline / fast:>7.1f}x")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import Order, recompute_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute order totals from their items in one query (default: every order)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_ids', nargs='*', type=int, help='Orders to repair (default: all)')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['order_ids']:
+            orders = orders.filter(pk__in=options['order_ids'])
+            missing = set(options['order_ids']) - set(orders.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"No such orders: {', '.join(map(str, sorted(missing)))}")
+
+        updated = recompute_totals(orders)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed the totals of {updated} orders"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_product_name_id_idx'),
+        ('orders', '0002_order_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'product', 'quantity', 'unit_price', 'unit_cost'], name='orderitem_order_cover_idx'),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from backend.cache import invalidate_after_update
 from inventory.models import Product
+from inventory.stock import release_stock, reserve_stock
 
 class Order(models.Model):
     """Main order/transaction record"""
@@ -20,19 +24,58 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-order_date']
+        indexes = [
+            # Keyset pagination order for the order list
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.order_date.strftime('%Y-%m-%d %H:%M')}"
 
     def calculate_totals(self):
-        """Calculate total amount and profit for this order"""
-        order_items = self.order_items.all()
-        total_amount = sum(item.subtotal for item in order_items)
-        total_profit = sum(item.profit for item in order_items)
-        
-        self.total_amount = total_amount
-        self.total_profit = total_profit
-        self.save()
+        """Recompute total amount and profit for this order from its items"""
+        recompute_totals(Order.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=['total_amount', 'total_profit'])
+
+    @staticmethod
+    def add_to_totals(order_id, amount, profit):
+        """
+        Add ``amount`` and ``profit`` (negative to subtract) to an order's
+        totals. The database does the arithmetic, so concurrent item edits
+        each land instead of overwriting one another.
+        """
+        if amount or profit:
+            Order.objects.filter(pk=order_id).update(
+                total_amount=F('total_amount') + Value(amount),
+                total_profit=F('total_profit') + Value(profit)
+            )
+
+
+def recompute_totals(orders=None):
+    """
+    Set the totals of ``orders`` (a queryset, default all orders) from their
+    items in one UPDATE with grouped subqueries, for repairing totals that
+    drifted (bulk loads, manual SQL). Orders without items get zero.
+
+    Returns the number of orders updated.
+    """
+    if orders is None:
+        orders = Order.objects.all()
+    lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    money = DecimalField(max_digits=10, decimal_places=2)
+
+    def total(expression):
+        return Coalesce(
+            Subquery(lines.annotate(total=Sum(expression)).values('total'), output_field=money),
+            Value(Decimal('0.00')), output_field=money
+        )
+
+    updated = orders.order_by().update(
+        total_amount=total(F('unit_price') * F('quantity')),
+        total_profit=total((F('unit_price') - F('unit_cost')) * F('quantity'))
+    )
+    invalidate_after_update(updated)
+    return updated
 
 class OrderItem(models.Model):
     """Individual items within an order"""
@@ -52,6 +95,12 @@ class OrderItem(models.Model):
     
     class Meta:
         unique_together = ['order', 'product']
+        indexes = [
+            # Covers the line columns read per order by the export and the
+            # rollup rebuild, so those joins never touch the table rows
+            models.Index(fields=['order', 'product', 'quantity', 'unit_price', 'unit_cost'],
+                         name='orderitem_order_cover_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} x{self.quantity}"
@@ -66,19 +115,71 @@ class OrderItem(models.Model):
         """Calculate profit for this order item"""
         return (self.unit_price - self.unit_cost) * self.quantity
 
+    @transaction.atomic
     def save(self, *args, **kwargs):
         # Store current prices if not set
         if not self.unit_price:
             self.unit_price = self.product.selling_price or self.product.cost_price
         if not self.unit_cost:
             self.unit_cost = self.product.cost_price
-            
+
+        previous = None
+        if self.pk is not None:
+            # Locked, so concurrent edits of this line apply their changes
+            # one after the other, each from the value the last one left
+            previous = (
+                OrderItem.objects.select_for_update().filter(pk=self.pk)
+                .values('order_id', 'product_id', 'quantity', 'unit_price', 'unit_cost').first()
+            )
+        # post_save receivers (the sales rollups) undo the line as it was
+        self._previous_line = previous
+
         super().save(*args, **kwargs)
-        
-        # Update product quantity and sold quantity
-        self.product.quantity -= self.quantity
-        self.product.sold_quantity += self.quantity
-        self.product.save()
-        
-        # Update order totals
-        self.order.calculate_totals()
+
+        # Move stock by what changed, with guarded UPDATEs
+        if previous is None:
+            reserve_stock({self.product_id: self.quantity})
+        elif previous['product_id'] != self.product_id:
+            release_stock({previous['product_id']: previous['quantity']})
+            reserve_stock({self.product_id: self.quantity})
+        elif self.quantity > previous['quantity']:
+            reserve_stock({self.product_id: self.quantity - previous['quantity']})
+        elif self.quantity < previous['quantity']:
+            release_stock({self.product_id: previous['quantity'] - self.quantity})
+
+        # Update order totals by the difference the line makes
+        amount, profit = self.subtotal, self.profit
+        if previous is not None:
+            old_amount = previous['unit_price'] * previous['quantity']
+            old_profit = (previous['unit_price'] - previous['unit_cost']) * previous['quantity']
+            if previous['order_id'] == self.order_id:
+                amount, profit = amount - old_amount, profit - old_profit
+            else:
+                Order.add_to_totals(previous['order_id'], -old_amount, -old_profit)
+        Order.add_to_totals(self.order_id, amount, profit)
+        if OrderItem.order.is_cached(self):
+            # Keep the loaded order in step, so saving it later keeps the change
+            self.order.total_amount += amount
+            self.order.total_profit += profit
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        """
+        Delete the line and take it out of its order's totals and the sales
+        rollups. Queryset deletes skip this, as queryset updates skip save();
+        recompute_totals repairs totals after those.
+        """
+        from .signals import order_line_deleted
+
+        # The stored line, locked, rather than a possibly stale instance
+        line = (
+            OrderItem.objects.select_for_update().filter(pk=self.pk)
+            .values_list('order_id', 'quantity', 'unit_price', 'unit_cost').first()
+        )
+        if line:
+            order_line_deleted.send(sender=OrderItem, item=self)
+        result = super().delete(*args, **kwargs)
+        if line:
+            order_id, quantity, unit_price, unit_cost = line
+            Order.add_to_totals(order_id, -unit_price * quantity, -(unit_price - unit_cost) * quantity)
+        return result
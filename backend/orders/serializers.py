@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from django.db import transaction
+from django.db.models import Count
+from backend.serializers import (
+    AnnotatedSerializerMixin, SparseFieldsetMixin, TimedRepresentationMixin, ValuesRepresentationMixin
+)
 from .models import Order, OrderItem
+from .services import create_order
 from inventory.models import Product
+from inventory.stock import InsufficientStock
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -16,8 +21,11 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['unit_price', 'unit_cost']
 
-class OrderListSerializer(serializers.ModelSerializer):
-    items_count = serializers.SerializerMethodField()
+class OrderListSerializer(TimedRepresentationMixin, AnnotatedSerializerMixin, SparseFieldsetMixin,
+                          ValuesRepresentationMixin, serializers.ModelSerializer):
+    items_count = serializers.IntegerField(read_only=True, default=0)
+    annotations = {'items_count': Count('order_items')}
+    views = {'compact': ['id', 'order_date', 'total_amount', 'items_count']}
     
     class Meta:
         model = Order
@@ -25,11 +33,8 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'order_date', 'total_amount', 'total_profit', 
             'items_count', 'notes'
         ]
-    
-    def get_items_count(self, obj):
-        return obj.order_items.count()
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True, read_only=True)
     
     class Meta:
@@ -39,7 +44,22 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'notes', 'order_items'
         ]
 
+class BasketProductField(serializers.PrimaryKeyRelatedField):
+    """Resolves products from the basket-wide lookup built by OrderCreateSerializer"""
+
+    def to_internal_value(self, data):
+        products = self.context.get('basket_products')
+        if products is not None and not isinstance(data, bool):
+            try:
+                return products[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        # Unknown or malformed ids fall through to the standard lookup and errors
+        return super().to_internal_value(data)
+
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    product = BasketProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
@@ -54,46 +74,63 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Product must have a selling price set.")
         return value
 
-class OrderCreateSerializer(serializers.ModelSerializer):
+class OrderCreateSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     order_items = OrderItemCreateSerializer(many=True, write_only=True)
     
     class Meta:
         model = Order
         fields = ['notes', 'order_items']
     
+    def to_internal_value(self, data):
+        # Fetch every product in the basket with one query instead of one per line
+        items = data.get('order_items') if hasattr(data, 'get') else None
+        if isinstance(items, list):
+            product_ids = set()
+            for item in items:
+                try:
+                    product_ids.add(int(item['product']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.context['basket_products'] = Product.objects.in_bulk(product_ids)
+        return super().to_internal_value(data)
+    
     def validate_order_items(self, value):
         if not value:
             raise serializers.ValidationError("Order must have at least one item.")
         
-        # Check stock availability
-        for item_data in value:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            if product.quantity < quantity:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for {product.name}. "
-                    f"Available: {product.quantity}, Requested: {quantity}"
-                )
+        product_ids = [item_data['product'].id for item_data in value]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Each product can only appear once per order.")
+        
+        # Check stock availability; the reservation in create() re-checks atomically
+        errors = [
+            self.stock_error(item_data['product'].name, item_data['product'].quantity, item_data['quantity'])
+            if item_data['product'].quantity < item_data['quantity'] else {}
+            for item_data in value
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
         
         return value
     
-    @transaction.atomic
+    @staticmethod
+    def stock_error(name, available, requested):
+        return {
+            'quantity': [
+                f"Insufficient stock for {name}. "
+                f"Available: {available}, Requested: {requested}"
+            ]
+        }
+    
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items')
-        order = Order.objects.create(**validated_data)
-        
-        for item_data in order_items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            # Create order item with current prices
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=product.selling_price,
-                unit_cost=product.cost_price
-            )
-        
-        return order
\ No newline at end of file
+        try:
+            return create_order(order_items_data, **validated_data)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({
+                'order_items': [
+                    self.stock_error(*exc.shortages[item_data['product'].id])
+                    if item_data['product'].id in exc.shortages else {}
+                    for item_data in order_items_data
+                ]
+            })
@@ -0,0 +1,31 @@
+from django.db.models import DecimalField, F, OuterRef, Subquery
+from django.db.models.signals import pre_delete
+from django.dispatch import Signal, receiver
+from inventory.models import Product
+from .models import Order, OrderItem
+
+# Sent by orders.services.create_order once a basket's lines are bulk
+# inserted, since bulk_create does not send post_save for each OrderItem.
+# Receivers get ``order`` and ``items`` (the saved OrderItem instances).
+order_lines_created = Signal()
+
+# Sent by OrderItem.delete() before the line is deleted, with ``item``.
+# OrderItem has no pre_delete or post_delete receivers, so the lines of a
+# deleted order, product or category are cascaded in a single DELETE.
+order_line_deleted = Signal()
+
+
+@receiver(pre_delete, sender=Product)
+def subtract_product_lines(sender, instance, **kwargs):
+    # The product's lines cascade away with it; take them out of their
+    # orders' totals in one UPDATE (an order has one line per product)
+    money = DecimalField(max_digits=10, decimal_places=2)
+    line = OrderItem.objects.filter(order=OuterRef('pk'), product=instance).order_by()
+    Order.objects.filter(order_items__product=instance).update(
+        total_amount=F('total_amount') - Subquery(
+            line.values(amount=F('unit_price') * F('quantity')), output_field=money
+        ),
+        total_profit=F('total_profit') - Subquery(
+            line.values(profit=(F('unit_price') - F('unit_cost')) * F('quantity')), output_field=money
+        )
+    )
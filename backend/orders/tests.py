@@ -1,3 +1,488 @@
-from django.test import TestCase
+import io
+import logging
+import threading
+import time
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from backend.dates import DateRange
+from backend.pagination import keyset_rows
+from inventory.ledger import record_sales
+from inventory.models import Category, Product, StockMovement
+from inventory.stock import InsufficientStock, reserve_stock
+from .models import Order, OrderItem, recompute_totals
+from .serializers import OrderListSerializer
 
-# Create your tests here.
+logger = logging.getLogger(__name__)
+
+
+def make_products(count, quantity=100):
+    category = Category.objects.create(name='Snacks')
+    return [
+        Product.objects.create(
+            name=f'Product {i}',
+            category=category,
+            cost_price=Decimal('5.00'),
+            selling_price=Decimal('8.50'),
+            quantity=quantity
+        )
+        for i in range(count)
+    ]
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('orders:order-list')
+
+    def post_basket(self, products, quantity=2):
+        return self.client.post(self.url, {
+            'notes': 'till 1',
+            'order_items': [{'product': p.id, 'quantity': quantity} for p in products]
+        }, format='json')
+
+    def test_creates_items_totals_and_moves_stock(self):
+        products = make_products(3)
+        response = self.post_basket(products, quantity=4)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'notes': 'till 1'})
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('102.00'))
+        self.assertEqual(order.total_profit, Decimal('42.00'))
+        for item in OrderItem.objects.filter(order=order):
+            self.assertEqual(item.unit_price, Decimal('8.50'))
+            self.assertEqual(item.unit_cost, Decimal('5.00'))
+        for product in Product.objects.all():
+            self.assertEqual(product.quantity, 96)
+            self.assertEqual(product.sold_quantity, 4)
+
+    def test_sales_reach_the_ledger_in_aggregate(self):
+        products = make_products(2)
+        self.post_basket(products, quantity=3)
+        self.post_basket(products, quantity=1)
+        self.assertFalse(StockMovement.objects.filter(kind='sale').exists())
+
+        record_sales()
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind='sale').values_list('product', 'quantity', 'sold')),
+            sorted((p.id, -4, 4) for p in products)
+        )
+
+    def test_query_count_does_not_grow_with_basket_size(self):
+        products = make_products(56)
+        small, large = products[1:6], products[6:]
+        # Today's sales row exists from here on; each basket still adds
+        # per-product rows, as a first sale of the day does
+        self.post_basket(products[:1])
+
+        with self.assertNumQueries(15) as small_ctx:
+            self.post_basket(small)
+        with self.assertNumQueries(len(small_ctx.captured_queries)):
+            self.post_basket(large)
+
+    def test_unknown_product_keeps_field_level_error(self):
+        products = make_products(1)
+        response = self.client.post(self.url, {
+            'order_items': [
+                {'product': products[0].id, 'quantity': 1},
+                {'product': 9999, 'quantity': 1}
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('product', response.data['order_items'][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_duplicate_lines_are_rejected(self):
+        product = make_products(1)[0]
+        response = self.post_basket([product, product])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_insufficient_stock_is_reported_per_line(self):
+        products = make_products(2, quantity=3)
+        response = self.client.post(self.url, {
+            'order_items': [
+                {'product': products[0].id, 'quantity': 2},
+                {'product': products[1].id, 'quantity': 5}
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['order_items'][0], {})
+        self.assertIn('Available: 3, Requested: 5', response.data['order_items'][1]['quantity'][0])
+
+
+class ReserveStockTests(TestCase):
+    def test_failed_line_rolls_back_the_whole_basket(self):
+        first, second = make_products(2, quantity=3)
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_stock({first.id: 2, second.id: 4})
+
+        self.assertEqual(ctx.exception.shortages, {second.id: ('Product 1', 3, 4)})
+        first.refresh_from_db()
+        self.assertEqual((first.quantity, first.sold_quantity), (3, 0))
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.chips, self.cola = make_products(2, quantity=10)
+        self.order = Order.objects.create()
+
+    def assertTotals(self, order, amount, profit):
+        order.refresh_from_db()
+        self.assertEqual((order.total_amount, order.total_profit), (Decimal(amount), Decimal(profit)))
+
+    def assertStock(self, product, quantity, sold):
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.sold_quantity), (quantity, sold))
+
+    def test_item_writes_apply_deltas(self):
+        item = OrderItem.objects.create(order=self.order, product=self.chips, quantity=2)
+        self.assertEqual(self.order.total_amount, Decimal('17.00'))
+        self.assertTotals(self.order, '17.00', '7.00')
+        self.assertStock(self.chips, 8, 2)
+
+        item.quantity = 5
+        item.save()
+        self.assertTotals(self.order, '42.50', '17.50')
+        self.assertStock(self.chips, 5, 5)
+
+        item.quantity = 1
+        item.product = self.cola
+        item.save()
+        self.assertTotals(self.order, '8.50', '3.50')
+        self.assertStock(self.chips, 10, 0)
+        self.assertStock(self.cola, 9, 1)
+
+        OrderItem.objects.create(order=self.order, product=self.chips, quantity=1)
+        item.delete()
+        self.assertTotals(self.order, '8.50', '3.50')
+
+    def test_edits_through_stale_instances_are_not_lost(self):
+        item = OrderItem.objects.create(order=self.order, product=self.chips, quantity=2)
+        first, second = OrderItem.objects.get(pk=item.pk), OrderItem.objects.get(pk=item.pk)
+        first.quantity = 3
+        first.save()
+        # second still thinks the line holds 2; its change applies to the stored 3
+        second.quantity = 4
+        second.save()
+        self.assertTotals(self.order, '34.00', '14.00')
+        self.assertStock(self.chips, 6, 4)
+
+        OrderItem.objects.get(pk=item.pk).delete()
+        self.assertTotals(self.order, '0.00', '0.00')
+
+    def test_product_delete_cascades_in_constant_queries(self):
+        def delete_product_sold_in(orders):
+            product = Product.objects.create(name='Gum', category=self.chips.category, cost_price=Decimal('1.00'),
+                                             selling_price=Decimal('2.00'), quantity=100)
+            for _ in range(orders):
+                order = Order.objects.create()
+                OrderItem.objects.create(order=order, product=self.chips, quantity=1)
+                OrderItem.objects.create(order=order, product=product, quantity=2)
+            with CaptureQueriesContext(connection) as queries:
+                product.delete()
+            return len(queries)
+
+        self.assertEqual(delete_product_sold_in(2), delete_product_sold_in(6))
+        # Only the chips lines are left in the totals
+        self.assertEqual(set(Order.objects.exclude(pk=self.order.pk).values_list('total_amount', 'total_profit')),
+                         {(Decimal('8.50'), Decimal('3.50'))})
+
+    def test_recompute_repairs_drifted_totals(self):
+        OrderItem.objects.create(order=self.order, product=self.chips, quantity=2)
+        OrderItem.objects.create(order=self.order, product=self.cola, quantity=1)
+        empty = Order.objects.create()
+        Order.objects.update(total_amount=Decimal('99.99'), total_profit=Decimal('-1.00'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(recompute_totals(), 2)
+        self.assertTotals(self.order, '25.50', '10.50')
+        self.assertTotals(empty, '0.00', '0.00')
+
+        Order.objects.update(total_amount=Decimal('0.00'))
+        call_command('recompute_order_totals', self.order.pk, stdout=io.StringIO())
+        self.assertTotals(self.order, '25.50', '10.50')
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Several tills hammering the same bestseller must never oversell"""
+
+    tills = 8
+    attempts_per_till = 10
+    stock = 50
+
+    def test_no_lost_updates_under_contention(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('threads need a file-backed or server database to contend on row locks')
+
+        product = make_products(1, quantity=self.stock)[0]
+        url = reverse('orders:order-list')
+        results = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.tills)
+
+        def till():
+            client = APIClient()
+            start.wait()
+            try:
+                for _ in range(self.attempts_per_till):
+                    response = client.post(url, {
+                        'order_items': [{'product': product.id, 'quantity': 1}]
+                    }, format='json')
+                    with lock:
+                        results.append(response.status_code)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        began = time.perf_counter()
+        threads = [threading.Thread(target=till) for _ in range(self.tills)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        product.refresh_from_db()
+        sold = results.count(201)
+        self.assertEqual(len(results), self.tills * self.attempts_per_till)
+        self.assertEqual(set(results) - {201, 400}, set())
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(product.sold_quantity, self.stock)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), self.stock)
+        logger.info(
+            'contended checkout: %d attempts by %d tills in %.3fs (%.0f checkouts/s)',
+            len(results), self.tills, elapsed, len(results) / elapsed
+        )
+
+
+class OrderListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('orders:order-list')
+        Order.objects.bulk_create([Order(notes=str(i)) for i in range(45)])
+        # Force ties on order_date so the id tiebreaker matters
+        first = Order.objects.order_by('id')[:10].values_list('id', flat=True)
+        Order.objects.filter(id__in=list(first)).update(order_date=Order.objects.order_by('id').first().order_date)
+
+    def test_cursor_pages_walk_every_order_once(self):
+        seen = []
+        response = self.client.get(self.url, {'pagination': 'cursor'})
+        while True:
+            self.assertNotIn('count', response.data)
+            seen.extend(order['id'] for order in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Order.objects.order_by('-order_date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_count_can_be_skipped(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'count': 'false', 'page': 3})
+
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertIn('page=2', response.data['previous'])
+
+    def test_default_page_mode_is_unchanged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_page_numbers_keep_newest_first_across_pages(self):
+        now = timezone.now()
+        for i, order in enumerate(Order.objects.order_by('id')):
+            Order.objects.filter(pk=order.pk).update(order_date=now - timezone.timedelta(minutes=(i * 7) % 45))
+
+        seen = []
+        for page in (1, 2, 3):
+            response = self.client.get(self.url, {'page': page})
+            seen.extend(order['id'] for order in response.data['results'])
+
+        expected = list(Order.objects.order_by('-order_date').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class OrderListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.products = make_products(3)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            self.client.post(reverse('orders:order-list'), {
+                'order_items': [{'product': p.id, 'quantity': 1} for p in self.products]
+            }, format='json')
+
+    def test_items_count_is_annotated(self):
+        self.add_orders(2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:order-list'))
+        self.assertEqual([o['items_count'] for o in response.data['results']], [3, 3])
+
+        self.add_orders(8)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('orders:order-list'))
+
+    def test_today_orders_is_constant(self):
+        self.add_orders(2)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('orders:today-orders'))
+
+        self.add_orders(8)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('orders:today-orders'))
+        self.assertEqual(len(response.data['orders']), 10)
+        self.assertEqual(response.data['orders'][0]['items_count'], 3)
+
+    def test_sparse_fields_skip_the_items_join(self):
+        self.add_orders(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:order-list'), {'fields': 'id,total_amount'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'total_amount'})
+        self.assertNotIn('orders_orderitem', queries.captured_queries[-1]['sql'])
+        self.assertNotIn('notes', queries.captured_queries[-1]['sql'])
+
+        response = self.client.get(reverse('orders:today-orders'), {'view': 'compact'})
+        self.assertEqual(list(response.data['orders'][0]), ['id', 'order_date', 'total_amount', 'items_count'])
+        self.assertEqual(response.data['orders'][0]['items_count'], 3)
+
+        response = self.client.get(reverse('orders:order-list'), {'view': 'compact', 'pagination': 'cursor'})
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class ExportSalesCsvTests(TestCase):
+    def test_streams_rows_without_model_instances(self):
+        products = make_products(2)
+        client = APIClient()
+        client.post(reverse('orders:order-list'), {
+            'order_items': [{'product': p.id, 'quantity': 3} for p in products]
+        }, format='json')
+
+        response = client.get(reverse('orders:export-csv'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(lines[0], 'Order ID,Date,Product,Category,Quantity,Unit Price,Unit Cost,Subtotal,Profit')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith(',Product 0,Snacks,3,8.50,5.00,25.50,10.50'))
+
+    def test_keyset_chunks_walk_every_row_once(self):
+        products = make_products(3)
+        order_date = timezone.now()
+        orders = Order.objects.bulk_create([Order(order_date=order_date) for _ in range(3)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=product.selling_price,
+                      unit_cost=product.cost_price)
+            for order in orders for product in products
+        ])
+        ordering = ('-order__order_date', '-order_id', 'id')
+        expected = list(OrderItem.objects.order_by(*ordering).values_list('order_id', 'product__name'))
+
+        # 9 rows in chunks of 2: four full chunks and a short last one
+        with self.assertNumQueries(5):
+            rows = list(keyset_rows(OrderItem.objects.all(), ordering, ('order_id', 'product__name'), 2))
+
+        self.assertEqual(rows, expected)
+
+
+class DateRangeFilterTests(TestCase):
+    def place_order_at(self, when):
+        order = Order.objects.create()
+        Order.objects.filter(pk=order.pk).update(order_date=when)
+        return order.pk
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_bounds_are_half_open_local_days(self):
+        day = timezone.datetime(2026, 3, 8).date()
+        tz = timezone.get_current_timezone()
+        inside = [
+            self.place_order_at(timezone.datetime(2026, 3, 8, 0, 0, tzinfo=tz)),
+            self.place_order_at(timezone.datetime(2026, 3, 8, 23, 59, 59, 999999, tzinfo=tz)),
+        ]
+        self.place_order_at(timezone.datetime(2026, 3, 7, 23, 59, 59, tzinfo=tz))
+        self.place_order_at(timezone.datetime(2026, 3, 9, 0, 0, tzinfo=tz))
+
+        matched = Order.objects.filter(DateRange.day(day).filter('order_date'))
+        self.assertEqual(sorted(matched.values_list('pk', flat=True)), inside)
+        self.assertEqual(
+            sorted(Order.objects.filter(order_date__date=day).values_list('pk', flat=True)), inside
+        )
+
+    def test_invalid_and_missing_params(self):
+        today = timezone.localdate()
+        self.assertEqual(DateRange.from_params({'start_date': '2026-02-30'}), (None, None))
+        self.assertEqual(DateRange.from_params({}, default_days=30), (today - timezone.timedelta(days=30), today))
+        self.assertFalse(DateRange(None, None).filter('order_date'))
+
+    @override_settings(TIME_ZONE='Asia/Tokyo')
+    def test_extreme_dates_leave_the_range_open(self):
+        pk = self.place_order_at(timezone.now())
+        self.assertFalse(DateRange(timezone.datetime.min.date(), timezone.datetime.max.date()).filter('order_date'))
+
+        params = {'start_date': '0001-01-01', 'end_date': '9999-12-31'}
+        response = self.client.get(reverse('orders:order-list'), params)
+        self.assertEqual([order['id'] for order in response.data['results']], [pk])
+        response = self.client.get(reverse('orders:export-csv'), params)
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+    def test_order_list_filters_by_range(self):
+        now = timezone.now()
+        recent = self.place_order_at(now)
+        self.place_order_at(now - timezone.timedelta(days=3))
+
+        response = APIClient().get(reverse('orders:order-list'), {'start_date': timezone.localdate().isoformat()})
+        self.assertEqual([o['id'] for o in response.data['results']], [recent])
+
+    def test_range_filters_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan text is backend specific')
+        dates = DateRange.day(timezone.localdate())
+
+        plan = Order.objects.filter(dates.filter('order_date')).order_by().explain()
+        self.assertIn('USING INDEX order_date_id_idx', plan)
+
+        plan = (
+            OrderItem.objects.filter(dates.filter('order__order_date')).order_by()
+            .values_list('order_id', 'product_id', 'quantity', 'unit_price', 'unit_cost').explain()
+        )
+        self.assertIn('order_date_id_idx', plan)
+        self.assertIn('COVERING INDEX orderitem_order_cover_idx', plan)
+
+
+class OrderValuesRepresentationTests(TestCase):
+    def test_output_is_byte_identical_to_the_serializer(self):
+        client = APIClient()
+        for product in make_products(2):
+            client.post(reverse('orders:order-list'), {
+                'notes': None if product.name.endswith('0') else 'till 2',
+                'order_items': [{'product': product.id, 'quantity': 3}]
+            }, format='json')
+
+        orders = OrderListSerializer.annotate_queryset(Order.objects.all())
+        expected = JSONRenderer().render(OrderListSerializer(orders, many=True).data)
+        fast = OrderListSerializer.represent_values(OrderListSerializer.values_queryset(orders))
+        self.assertEqual(JSONRenderer().render(fast), expected)
+
+        response = client.get(reverse('orders:order-list'))
+        self.assertEqual(JSONRenderer().render(response.data['results']), expected)
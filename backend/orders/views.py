@@ -1,18 +1,32 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.http import HttpResponse
-from django.db.models import Sum, Q, F
+from django.http import StreamingHttpResponse
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
 import csv
+from analytics.models import DailySales, DailyProductSales
+from backend.async_views import run_queries
+from backend.cache import cached_summary
+from backend.dates import DateRange
+from backend.pagination import KeysetPagination, keyset_rows
 from .models import Order, OrderItem
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer
 )
 
+# Rows per keyset query when streaming the CSV export
+EXPORT_CHUNK_SIZE = 2000
+
 class OrderListCreateView(generics.ListCreateAPIView):
-    queryset = Order.objects.prefetch_related('order_items__product')
+    queryset = Order.objects.all()
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-order_date', '-id')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -23,238 +37,329 @@ class OrderListCreateView(generics.ListCreateAPIView):
         queryset = super().get_queryset()
         
         # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(order_date__date__gte=start_date)
-            except ValueError:
-                pass
+        dates = DateRange.from_params(self.request.query_params)
+        queryset = queryset.filter(dates.filter('order_date'))
         
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(order_date__date__lte=end_date)
-            except ValueError:
-                pass
+        # ?fields= / ?view=compact select and count only what is shown
+        fields = OrderListSerializer.requested_fields(self.request)
+        queryset = OrderListSerializer.annotate_queryset(queryset, fields)
+        queryset = OrderListSerializer.narrow_queryset(
+            queryset, fields, keep=[name.lstrip('-') for name in self.cursor_ordering]
+        )
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Read path straight from values() rows into OrderListSerializer's
+        # exact output, without model instances (see ValuesRepresentationMixin)
+        fields = OrderListSerializer.requested_fields(request)
+        rows = OrderListSerializer.values_queryset(
+            self.filter_queryset(self.get_queryset()), fields,
+            keep=[name.lstrip('-') for name in self.cursor_ordering]
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(OrderListSerializer.represent_values(rows, fields))
+        return self.get_paginated_response(OrderListSerializer.represent_values(page, fields))
 
 class OrderDetailView(generics.RetrieveDestroyAPIView):
     queryset = Order.objects.prefetch_related('order_items__product')
     serializer_class = OrderDetailSerializer
 
-@api_view(['GET'])
-def sales_summary(request):
-    """Get sales summary statistics"""
+SALES_GRANULARITIES = ('day', 'week', 'month')
+
+# Most buckets one sales summary returns (about three years of days)
+MAX_SALES_BUCKETS = 1100
+
+def _first_bucket(start_date, granularity):
+    """Start of the bucket holding start_date, matching Trunc(granularity)"""
+    if granularity == 'week':
+        return start_date - timedelta(days=start_date.weekday())
+    if granularity == 'month':
+        return start_date.replace(day=1)
+    return start_date
+
+def _bucket_count(start_date, end_date, granularity):
+    first = _first_bucket(start_date, granularity)
+    if granularity == 'week':
+        return (end_date - first).days // 7 + 1
+    if granularity == 'month':
+        return (end_date.year - first.year) * 12 + end_date.month - first.month + 1
+    return (end_date - first).days + 1
+
+def _sales_buckets(start_date, end_date, granularity):
+    """Every bucket start from start_date to end_date, matching Trunc(granularity)"""
+    bucket = _first_bucket(start_date, granularity)
+    while bucket <= end_date:
+        yield bucket
+        try:
+            if granularity == 'week':
+                bucket += timedelta(days=7)
+            elif granularity == 'month':
+                bucket = (bucket + timedelta(days=32)).replace(day=1)
+            else:
+                bucket += timedelta(days=1)
+        except OverflowError:
+            # The last bucket before date.max
+            return
+
+def sales_summary_queries(params):
+    """
+    The independent queries behind the sales summary, as zero-argument
+    callables, and the function assembling their results into the response
+    data. The analytics app runs the same queries concurrently.
+    """
     # Get date range from query params (default to last 30 days)
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
+    start_date, end_date = DateRange.from_params(params, default_days=30)
     
-    if request.query_params.get('start_date'):
-        try:
-            start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
+    granularity = params.get('granularity', 'day')
+    if granularity not in SALES_GRANULARITIES:
+        granularity = 'day'
     
-    if request.query_params.get('end_date'):
-        try:
-            end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
+    # Every bucket is zero-filled, so the span decides the response size
+    if _bucket_count(start_date, end_date, granularity) > MAX_SALES_BUCKETS:
+        raise ValidationError({
+            'granularity': f'More than {MAX_SALES_BUCKETS} {granularity} buckets from {start_date} to '
+                           f'{end_date}; narrow the dates or use a coarser granularity.'
+        })
     
-    # Get orders in date range
-    orders = Order.objects.filter(
-        order_date__date__range=[start_date, end_date]
+    # One grouped query over the daily rollups gives every bucket; the
+    # period totals are exact Decimal sums of those buckets
+    rows = (
+        DailySales.objects
+        .filter(day__range=[start_date, end_date])
+        .annotate(bucket=Trunc('day', granularity, output_field=DateField()))
+        .values('bucket')
+        .annotate(revenue_sum=Sum('revenue'), profit_sum=Sum('profit'), orders_sum=Sum('order_count'))
+        .order_by('bucket')
     )
     
-    # Calculate totals
-    total_orders = orders.count()
-    total_revenue = orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_profit = orders.aggregate(Sum('total_profit'))['total_profit__sum'] or 0
-    
-    # Daily sales data for charts
-    daily_sales = {}
-    daily_profits = {}
-    
-    for order in orders:
-        date_key = order.order_date.date().isoformat()
-        daily_sales[date_key] = daily_sales.get(date_key, 0) + float(order.total_amount)
-        daily_profits[date_key] = daily_profits.get(date_key, 0) + float(order.total_profit)
-    
     # Top selling products
     top_products = (
-        OrderItem.objects
-        .filter(order__order_date__date__range=[start_date, end_date])
+        DailyProductSales.objects
+        .filter(day__range=[start_date, end_date])
         .values('product__name')
         .annotate(
             total_quantity=Sum('quantity'),
-            total_revenue=Sum(F('unit_price') * F('quantity')),
-            total_profit=Sum((F('unit_price') - F('unit_cost')) * F('quantity'))
+            total_revenue=Sum('revenue'),
+            total_profit=Sum('profit')
         )
         .order_by('-total_quantity')[:10]
     )
     
-    return Response({
-        'period': {
-            'start_date': start_date,
-            'end_date': end_date
-        },
-        'summary': {
-            'total_orders': total_orders,
-            'total_revenue': total_revenue,
-            'total_profit': total_profit,
-            'profit_margin': (float(total_profit) / float(total_revenue) * 100) if total_revenue > 0 else 0
-        },
-        'daily_sales': [
-            {'date': date, 'revenue': revenue} 
-            for date, revenue in sorted(daily_sales.items())
-        ],
-        'daily_profits': [
-            {'date': date, 'profit': profit} 
-            for date, profit in sorted(daily_profits.items())
-        ],
-        'top_products': list(top_products)
-    })
+    def build(results):
+        zero = Decimal('0.00')
+        buckets = {
+            bucket: {'date': bucket.isoformat(), 'revenue': zero, 'profit': zero, 'orders': 0}
+            for bucket in _sales_buckets(start_date, end_date, granularity)
+        }
+        for row in results['rows']:
+            buckets[row['bucket']].update(
+                revenue=row['revenue_sum'], profit=row['profit_sum'], orders=row['orders_sum']
+            )
+        buckets = list(buckets.values())
+        
+        total_orders = sum(bucket['orders'] for bucket in buckets)
+        total_revenue = sum((bucket['revenue'] for bucket in buckets), zero)
+        total_profit = sum((bucket['profit'] for bucket in buckets), zero)
+        
+        return {
+            'period': {
+                'start_date': start_date,
+                'end_date': end_date
+            },
+            'granularity': granularity,
+            'summary': {
+                'total_orders': total_orders,
+                'total_revenue': total_revenue,
+                'total_profit': total_profit,
+                'profit_margin': (total_profit / total_revenue * 100) if total_revenue > 0 else 0
+            },
+            'sales': buckets,
+            'daily_sales': [
+                {'date': bucket['date'], 'revenue': bucket['revenue']} 
+                for bucket in buckets
+            ],
+            'daily_profits': [
+                {'date': bucket['date'], 'profit': bucket['profit']} 
+                for bucket in buckets
+            ],
+            'top_products': results['top_products']
+        }
+    
+    return {'rows': partial(list, rows), 'top_products': partial(list, top_products)}, build
+
+@api_view(['GET'])
+@cached_summary
+def sales_summary(request):
+    """Get sales summary statistics"""
+    queries, build = sales_summary_queries(request.query_params)
+    return Response(build(run_queries(queries)))
 
 @api_view(['GET'])
 def export_sales_csv(request):
     """Export sales data as CSV"""
-    # Get date range
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
-    
-    if request.query_params.get('start_date'):
-        try:
-            start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    
-    if request.query_params.get('end_date'):
-        try:
-            end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
+    # Get date range from query params (default to last 30 days)
+    dates = DateRange.from_params(request.query_params, default_days=30)
     
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="sales_report_{start_date}_to_{end_date}.csv"'
+    # Plain tuples, no model instances per row, read in keyset chunks
+    rows = keyset_rows(
+        OrderItem.objects.filter(dates.filter('order__order_date')),
+        ('-order__order_date', '-order_id', 'id'),
+        ('order_id', 'order__order_date', 'product__name', 'product__category__name',
+         'quantity', 'unit_price', 'unit_cost'),
+        EXPORT_CHUNK_SIZE
+    )
     
-    writer = csv.writer(response)
+    response = StreamingHttpResponse(_sales_csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="sales_report_{dates.start}_to_{dates.end}.csv"'
+    return response
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back"""
+    def write(self, value):
+        return value
+
+def _sales_csv_lines(rows):
+    writer = csv.writer(_Echo())
     
-    # Write header
-    writer.writerow([
+    yield writer.writerow([
         'Order ID', 'Date', 'Product', 'Category', 'Quantity', 
         'Unit Price', 'Unit Cost', 'Subtotal', 'Profit'
     ])
     
-    # Get order items in date range
-    order_items = (
-        OrderItem.objects
-        .select_related('order', 'product', 'product__category')
-        .filter(order__order_date__date__range=[start_date, end_date])
-        .order_by('-order__order_date')
-    )
-    
-    # Write data rows
-    for item in order_items:
-        writer.writerow([
-            item.order.id,
-            item.order.order_date.strftime('%Y-%m-%d %H:%M'),
-            item.product.name,
-            item.product.category.name,
-            item.quantity,
-            item.unit_price,
-            item.unit_cost,
-            item.subtotal,
-            item.profit
+    for order_id, order_date, product_name, category_name, quantity, unit_price, unit_cost in rows:
+        yield writer.writerow([
+            order_id,
+            order_date.strftime('%Y-%m-%d %H:%M'),
+            product_name,
+            category_name,
+            quantity,
+            unit_price,
+            unit_cost,
+            unit_price * quantity,
+            (unit_price - unit_cost) * quantity
         ])
-    
-    return response
 
-@api_view(['GET'])
-def today_orders(request):
-    """Get today's orders summary"""
-    today = timezone.now().date()
-    orders = Order.objects.filter(order_date__date=today)
+def today_orders_queries(params):
+    """The independent queries behind today's orders summary (see sales_summary_queries)"""
+    today = timezone.localdate()
+    orders = Order.objects.filter(DateRange.day(today).filter('order_date'))
+    fields = OrderListSerializer.requested_fields_from_params(params)
+    orders = OrderListSerializer.narrow_queryset(OrderListSerializer.annotate_queryset(orders, fields), fields)
+    orders = OrderListSerializer.values_queryset(orders, fields)
+    totals = DailySales.objects.filter(day=today)
 
-    total_orders = orders.count()
-    total_revenue = orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_profit = orders.aggregate(Sum('total_profit'))['total_profit__sum'] or 0
+    def build(results):
+        totals = results['totals']
+        total_orders = totals.order_count if totals else 0
+        total_revenue = totals.revenue if totals else 0
+        total_profit = totals.profit if totals else 0
+
+        return {
+            'date': today,
+            'total_orders': total_orders,
+            'total_revenue': total_revenue,
+            'total_profit': total_profit,
+            'orders': OrderListSerializer.represent_values(results['orders'], fields)
+        }
 
-    return Response({
-        'date': today,
-        'total_orders': total_orders,
-        'total_revenue': total_revenue,
-        'total_profit': total_profit,
-        'orders': OrderListSerializer(orders, many=True).data
-    })
+    return {'orders': partial(list, orders), 'totals': totals.first}, build
 
 @api_view(['GET'])
-def category_sales_summary(request):
-    """Get sales summary by category"""
-    # Get date range from query params (default to last 30 days)
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
+@cached_summary
+def today_orders(request):
+    """Get today's orders summary"""
+    queries, build = today_orders_queries(request.query_params)
+    return Response(build(run_queries(queries)))
 
-    if request.query_params.get('start_date'):
-        try:
-            start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
+def category_sales_queries(params):
+    """The independent queries behind the category sales summary (see sales_summary_queries)"""
+    # Get date range from query params (default to last 30 days)
+    start_date, end_date = DateRange.from_params(params, default_days=30)
 
-    if request.query_params.get('end_date'):
-        try:
-            end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
-        except ValueError:
-            pass
+    sales = DailyProductSales.objects.filter(day__range=[start_date, end_date])
+    category_id = params.get('category')
+    try:
+        category_id = int(category_id) if category_id else None
+    except ValueError:
+        category_id = None
+    if category_id is not None:
+        sales = sales.filter(category_id=category_id)
 
-    # Get order items in date range with category information
-    order_items = (
-        OrderItem.objects
-        .select_related('product', 'product__category', 'order')
-        .filter(order__order_date__date__range=[start_date, end_date])
+    # One GROUP BY over the daily product rollups; a product sold on several
+    # days is still one product
+    category_rows = (
+        sales
+        .values('category_id', 'category__name')
+        .annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum('revenue'),
+            total_profit=Sum('profit'),
+            products_sold=Count('product', distinct=True)
+        )
+        .order_by('-total_quantity', 'category_id')
     )
+    queries = {'category_rows': partial(list, category_rows)}
 
-    # Calculate sales by category
-    category_sales = {}
-    total_sold = 0
-
-    for item in order_items:
-        category_id = item.product.category.id if item.product.category else None
-        category_name = item.product.category.name if item.product.category else 'Uncategorized'
+    # ?category=<id> drills down to the products sold in that category
+    if category_id is not None:
+        product_rows = (
+            sales
+            .values('product_id', 'product__name', 'product__sku')
+            .annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum('revenue'),
+                total_profit=Sum('profit'),
+                order_count=Sum('order_count')
+            )
+            .order_by('-total_quantity', 'product_id')
+        )
+        queries['product_rows'] = partial(list, product_rows)
 
-        if category_id not in category_sales:
-            category_sales[category_id] = {
-                'category_id': category_id,
-                'category_name': category_name,
-                'total_quantity': 0,
-                'total_revenue': 0,
-                'total_profit': 0,
-                'products_sold': 0
-            }
+    def build(results):
+        # Convert to list format for frontend
+        category_sales_list = [
+            {
+                'category_id': row['category_id'],
+                'category_name': row['category__name'],
+                'total_quantity': row['total_quantity'],
+                'total_revenue': float(row['total_revenue']),
+                'total_profit': float(row['total_profit']),
+                'products_sold': row['products_sold']
+            } for row in results['category_rows']
+        ]
+        total_sold = sum(row['total_quantity'] for row in category_sales_list)
 
-        # Update category totals
-        category_sales[category_id]['total_quantity'] += item.quantity
-        category_sales[category_id]['total_revenue'] += float(item.subtotal)
-        category_sales[category_id]['total_profit'] += float(item.profit)
-        category_sales[category_id]['products_sold'] += 1
+        data = {
+            'period': {
+                'start_date': start_date,
+                'end_date': end_date
+            },
+            'total_sold': total_sold,
+            'category_sales': category_sales_list
+        }
 
-        total_sold += item.quantity
+        if 'product_rows' in results:
+            data['products'] = [
+                {
+                    'product_id': row['product_id'],
+                    'product_name': row['product__name'],
+                    'product_sku': row['product__sku'],
+                    'total_quantity': row['total_quantity'],
+                    'total_revenue': float(row['total_revenue']),
+                    'total_profit': float(row['total_profit']),
+                    'order_count': row['order_count']
+                } for row in results['product_rows']
+            ]
 
-    # Convert to list format for frontend
-    category_sales_list = list(category_sales.values())
+        return data
 
-    # Sort by total quantity sold (descending)
-    category_sales_list.sort(key=lambda x: x['total_quantity'], reverse=True)
+    return queries, build
 
-    return Response({
-        'period': {
-            'start_date': start_date,
-            'end_date': end_date
-        },
-        'total_sold': total_sold,
-        'category_sales': category_sales_list
-    })
\ No newline at end of file
+@api_view(['GET'])
+@cached_summary
+def category_sales_summary(request):
+    """Get sales summary by category"""
+    queries, build = category_sales_queries(request.query_params)
+    return Response(build(run_queries(queries)))